@@ -0,0 +1,74 @@
+"""
+Tabela "Alertas em Tempo Real" paginada no servidor.
+
+Filtros (período, tipo, status) e ordenação são aplicados na consulta SQL e apenas a página visível
+é lida e formatada, de modo que o custo não cresce com o total de alertas.
+"""
+import pandas as pd
+
+from db import epoch_bounds
+from formatting import brl
+
+PAGE_SIZE = 50
+
+# Rótulo exibido -> ORDER BY (alert_id desempata para a paginação ser estável)
+SORT_OPTIONS = {
+    "Maior valor em risco": "risk_value DESC, alert_id DESC",
+    "Menor valor em risco": "risk_value ASC, alert_id ASC",
+    "Mais recentes": "created_at_epoch DESC, alert_id DESC",
+    "Mais antigos": "created_at_epoch ASC, alert_id ASC",
+}
+
+COLUMNS = ["Nome", "Descrição", "Status", "Criado em", "Valor em risco (BRL)"]
+
+
+def _where(alert_types=(), statuses=(), start_date=None, end_date=None):
+    clauses = []
+    params = []
+    if start_date is not None and end_date is not None:
+        clauses.append("created_at_epoch >= ? AND created_at_epoch < ?")
+        params.extend(epoch_bounds(start_date, end_date))
+    if alert_types:
+        clauses.append(f"alert_type IN ({', '.join('?' * len(alert_types))})")
+        params.extend(alert_types)
+    if statuses:
+        clauses.append(f"alert_status IN ({', '.join('?' * len(statuses))})")
+        params.extend(statuses)
+    return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+
+def filter_options(conn):
+    """Tipos e status disponíveis, lidos da tabela agregada."""
+    types = [row[0] for row in conn.execute("SELECT DISTINCT alert_type FROM alerts_daily ORDER BY 1")]
+    statuses = [row[0] for row in conn.execute("SELECT DISTINCT alert_status FROM alerts_daily ORDER BY 1")]
+    return types, statuses
+
+
+def count_alerts(conn, alert_types=(), statuses=(), start_date=None, end_date=None):
+    where, params = _where(alert_types, statuses, start_date, end_date)
+    return conn.execute(f"SELECT COUNT(*) FROM alerts {where}", params).fetchone()[0]
+
+
+def fetch_alerts_page(conn, page=1, page_size=PAGE_SIZE, sort=next(iter(SORT_OPTIONS)),
+                      alert_types=(), statuses=(), start_date=None, end_date=None):
+    """Retorna a página pedida (começando em 1) já formatada para exibição."""
+    where, params = _where(alert_types, statuses, start_date, end_date)
+    rows = conn.execute(
+        f"""
+        SELECT alert_type, description, alert_status, created_at, risk_value
+        FROM alerts
+        {where}
+        ORDER BY {SORT_OPTIONS[sort]}
+        LIMIT ? OFFSET ?
+        """,
+        [*params, page_size, (page - 1) * page_size],
+    ).fetchall()
+    return format_page(rows)
+
+
+def format_page(rows, columns=COLUMNS):
+    """Monta o dataframe de exibição; a última coluna de cada linha é o valor em risco."""
+    df = pd.DataFrame(rows, columns=columns)
+    money = columns[-1]
+    df[money] = [brl(value) for value in df[money]]
+    return df
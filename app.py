@@ -1,17 +1,29 @@
 import streamlit as st
-import pandas as pd
-import sqlite3
-import matplotlib.pyplot as plt
-import plotly.graph_objects as go
 from pandasai import SmartDataframe
-from pandasai.llm import OpenAI
 from pandasai.responses.response_parser import ResponseParser
 import os
-from datetime import datetime, timedelta
-import json
-import re
-from functools import lru_cache
-import time
+import sqlite3
+from datetime import date, timedelta
+from functools import partial
+from alerts_table import PAGE_SIZE, SORT_OPTIONS, count_alerts, fetch_alerts_page, filter_options, format_page
+from backends import analytics_connection
+from charts import create_alert_distribution_chart
+from data import get_data
+from db import get_data_version, is_writable, read_connection, write_connection
+from figures import normalize_figure
+from formatting import real_br_money_mask
+from insights import InsightsStore, InsightsWorker, get_insights
+from intents import route_question, run_intent
+from kpi_snapshots import PRESETS, refresh_kpi_snapshots, snapshot_kpis
+from kpis import compute_kpis, previous_period
+from live_feed import FEED_COLUMNS, POLL_SECONDS, fetch_changes, initial_feed, merge_feed
+from llm_cache import AnswerCache, make_key
+from llm_context import CONTEXT_COLUMNS, build_context_tables, compact_datalake, needs_full_data
+from llm_stream import STAGE_LABELS, AnswerStream, ResultParser, StreamingOpenAI
+from rollup import refresh_alerts_daily
+from sandbox import FrameSource, isolate, snapshot_source
+from snapshot import load_alerts, read_manifest, refresh_snapshot
+from timing import cache_miss, finish_trace, is_admin, recent_traces, start_trace, summarize, timed, traced_rerun, traces_table
 
 # Classe personalizada para exibir gráficos no Streamlit
 class StreamlitResponse(ResponseParser):
@@ -23,147 +35,93 @@ class StreamlitResponse(ResponseParser):
         return result
     
     def format_plot(self, result):
-        if isinstance(result["value"], plt.Figure):
-            # Convert matplotlib figure to Plotly figure
-            import io
-            import base64
-            
-            # Save matplotlib figure to a buffer
-            buf = io.BytesIO()
-            result["value"].savefig(buf, format='png', transparent=True)
-            buf.seek(0)
-            
-            # Display as image
-            st.image(buf, use_column_width=True)
-        elif isinstance(result["value"], str) and result["value"].startswith("data:image"):
-            # Handle base64 encoded images
-            st.image(result["value"])
-        elif isinstance(result["value"], str):
-            # Check for Plotly JSON in the string
-            match = re.search(r'<plotly>(.*?)</plotly>', result["value"], re.DOTALL)
-            if match:
-                try:
-                    fig_json = json.loads(match.group(1))
-                    fig = go.Figure(fig_json)
-                    st.plotly_chart(fig, use_container_width=True)
-                except Exception as e:
-                    st.error(f"Error parsing Plotly figure: {e}")
-                    # Fallback: display the raw content
-                    st.write(result["value"])
-            elif result["value"].endswith(".html") or "temp_chart" in result["value"]:
-                # Handle HTML files, especially temp_chart.html
-                try:
-                    # Check if it's a file path
-                    if os.path.exists(result["value"]):
-                        with open(result["value"], 'r') as f:
-                            html_content = f.read()
-                        # Render HTML content
-                        st.components.v1.html(html_content, height=400)
-                    else:
-                        # If not a file path, try to render as HTML directly
-                        st.components.v1.html(result["value"], height=400)
-                except Exception as e:
-                    st.error(f"Error rendering HTML: {e}")
-                    st.write(result["value"])
-            else:
-                # For any other string output
-                try:
-                    # Try to interpret the string as JSON (may contain a Plotly figure)
-                    try:
-                        json_data = json.loads(result["value"])
-                        if isinstance(json_data, dict) and "data" in json_data and "layout" in json_data:
-                            # This looks like a Plotly figure
-                            fig = go.Figure(json_data)
-                            st.plotly_chart(fig, use_container_width=True)
-                            return result
-                    except json.JSONDecodeError:
-                        pass
-                    
-                    # Try to display as an image
-                    try:
-                        st.image(result["value"])
-                    except:
-                        # Fall back to displaying as text
-                        st.write(result["value"])
-                except Exception as e:
-                    st.write(result["value"])
-        else:
-            # For other types like Plotly figures
-            try:
-                if hasattr(result["value"], "to_html") or hasattr(result["value"], "update_layout"):
-                    # This is likely a Plotly figure
-                    st.plotly_chart(result["value"], use_container_width=True)
-                else:
-                    # For anything else, use the generic write method
-                    st.write(result["value"])
-            except Exception as e:
-                st.error(f"Error displaying plot: {e}")
-                st.write(result["value"])
+        # Qualquer formato de gráfico (Plotly, matplotlib, JSON, HTML, imagem) passa por
+        # figures.normalize_figure; matplotlib é exibido como PNG
+        render_figure(normalize_figure(result["value"]))
         return result
     
     def format_other(self, result):
-        # Check if the result might be a Plotly figure
-        try:
-            if isinstance(result["value"], str):
-                # Try to extract Plotly JSON if enclosed in tags
-                match = re.search(r'<plotly>(.*?)</plotly>', result["value"], re.DOTALL)
-                if match:
-                    try:
-                        fig_json = json.loads(match.group(1))
-                        fig = go.Figure(fig_json)
-                        st.plotly_chart(fig, use_container_width=True)
-                        return result
-                    except Exception:
-                        # If extraction fails, continue with normal display
-                        pass
-        except Exception:
-            pass
-        
-        # Default display
-        st.write(result["value"])
+        # Respostas de texto podem trazer um gráfico Plotly entre tags <plotly></plotly>
+        figure = normalize_figure(result["value"])
+        if figure.kind == "plotly":
+            render_figure(figure)
+        else:
+            st.write(result["value"])
         return result
 
 
-def real_br_money_mask(my_value):
-    a = '{:,.2f}'.format(float(my_value))
-    b = a.replace(',','v')
-    c = b.replace('.',',')
-    return c.replace('v','.')
-
-# Função para conectar ao banco de dados SQLite
-def get_data():
-    conn = sqlite3.connect("medical_data.db")
-    query = """
-    SELECT a.*, 
-           p.name AS provider_name, p.type AS provider_type, 
-           pt.name AS patient_name, pt.age AS patient_age,
-           pr.code AS procedure_code, pr.name AS procedure_name,
-           m.code AS material_code, m.name AS material_name, 
-           md.code AS medication_code, md.name AS medication_name, 
-           hs.admission_date, hs.discharge_date, hs.department,
-           ptc.name AS protocol_name, r.score AS recommendation_score
-    FROM alerts a
-    LEFT JOIN providers p ON a.provider_id = p.provider_id
-    LEFT JOIN patients pt ON a.patient_id = pt.patient_id
-    LEFT JOIN procedures pr ON a.procedure_id = pr.procedure_id
-    LEFT JOIN materials m ON a.material_id = m.material_id
-    LEFT JOIN medications md ON a.medication_id = md.medication_id
-    LEFT JOIN hospitalizations hs ON a.hospitalization_id = hs.hospitalization_id
-    LEFT JOIN protocols ptc ON pr.protocol_id = ptc.protocol_id
-    LEFT JOIN recommendations r ON a.patient_id = r.patient_id 
-                                AND a.provider_id = r.provider_id 
-                                AND a.hospital_id = r.hospital_id
-    """  # Ajuste conforme necessário
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
-
-# Carregar dados
-df = get_data()
+def render_figure(figure):
+    if figure.kind == "plotly":
+        st.plotly_chart(figure.data, use_container_width=True)
+    elif figure.kind == "image":
+        st.image(figure.data, use_container_width=True)
+    elif figure.kind == "html":
+        st.components.v1.html(figure.data, height=400)
+    else:
+        st.write(figure.data)
+
+
+# TTL de segurança: mesmo sem mudança detectada, o cache é recarregado periodicamente
+DATA_CACHE_TTL = 15 * 60
+
+@st.cache_resource(ttl=DATA_CACHE_TTL, max_entries=8, show_spinner=False)
+def load_shared_data(data_version, start_date, end_date, columns=None):
+    """
+    Carrega o dataframe de alertas do período uma única vez por processo e o compartilha entre
+    as sessões. data_version, o período e as colunas fazem parte da chave do cache: o dataframe
+    só é recarregado quando o banco ou o período mudam (ou quando o TTL expira). O resultado é
+    somente leitura: nunca modifique-o in-place, crie uma cópia.
+    A leitura vem do snapshot Arrow (snapshot.py), atualizado quando o banco muda; columns
+    (tupla) limita as colunas lidas.
+    """
+    cache_miss()
+    columns = list(columns) if columns is not None else None
+    try:
+        refresh_snapshot()
+        return load_alerts(columns=columns, start_date=start_date, end_date=end_date)
+    except OSError:
+        # Sem permissão de escrita para o snapshot: lê direto do SQLite
+        df = get_data(start_date=start_date, end_date=end_date)
+        return df[columns] if columns is not None else df
+
+@st.cache_resource(ttl=DATA_CACHE_TTL, max_entries=8, show_spinner=False)
+def load_context_tables(data_version, start_date, end_date):
+    """
+    Tabelas de resumo do contexto compacto do LLM (llm_context.py), calculadas uma vez por
+    versão do banco e período a partir do dataframe compartilhado.
+    """
+    cache_miss()
+    return build_context_tables(load_shared_data(data_version, start_date, end_date, columns=CONTEXT_COLUMNS))
+
+@st.cache_resource(ttl=DATA_CACHE_TTL, max_entries=2, show_spinner=False)
+def refresh_rollups(data_version):
+    """
+    Atualiza incrementalmente a tabela agregada alerts_daily, no máximo uma vez por versão do banco,
+    e em seguida os KPIs pré-calculados dos presets de período (kpi_snapshots.py).
+    Retorna False quando a escrita falhou: as tabelas derivadas podem estar desatualizadas e os
+    KPIs são calculados na hora. Um banco somente leitura (immutable=1) não muda e não é tocado.
+    """
+    cache_miss()
+    if not is_writable():
+        return True
+    try:
+        conn = write_connection()
+        try:
+            refresh_alerts_daily(conn)
+            refresh_kpi_snapshots(conn)
+        finally:
+            conn.close()
+    except sqlite3.OperationalError:
+        # Banco bloqueado por outro escritor ou sem permissão: a página segue com as consultas ao vivo
+        return False
+    return True
 
 # Configuração da página
 st.set_page_config(page_title="Dashboard Unimed", layout="wide")
 
+# Trace de tempo desta execução (timing.py); gravado no fim do script
+start_trace("pagina")
+
 # Custom CSS to match the corporate design
 st.markdown("""
 <style>
@@ -483,6 +441,107 @@ with st.sidebar:
     </div>
     """, unsafe_allow_html=True)
 
+# Define session state for date selection
+if "start_date" not in st.session_state:
+    st.session_state.start_date = date.today() - timedelta(days=7)
+if "end_date" not in st.session_state:
+    st.session_state.end_date = date.today()
+# Valores dos date_input (podem estar inválidos); os presets os alteram pela chave
+if "start_input" not in st.session_state:
+    st.session_state.start_input = st.session_state.start_date
+if "end_input" not in st.session_state:
+    st.session_state.end_input = st.session_state.end_date
+
+st.markdown(
+    """
+    <style>
+        /* Target the date input box */
+        [data-testid="stSidebar"] [data-baseweb="input"] {
+            background-color: var(--light-gray) !important;
+            border-radius: 5px;
+            border: 1px solid #ccc !important;
+        }
+
+        /* Change focus border color from red to green */
+        [data-testid="stSidebar"] [data-baseweb="input"]:focus {
+            border: 2px solid #009C6E !important;
+            box-shadow: 0 0 5px #009C6E !important;
+        }
+
+        /* Target the calendar popup container */
+        [role="dialog"] {
+            background-color: var(--light-gray) !important;
+            border: 1px solid #ccc !important;
+            border-radius: 8px !important;
+        }
+
+        /* Fix selected date red color */
+        [role="gridcell"][aria-selected="true"] {
+            background-color: #009C6E !important;
+            color: white !important;
+            border-radius: 50% !important;
+        }
+
+        /* Stronger override for red background */
+        [role="gridcell"][aria-selected="true"]::after {
+            background-color: #009C6E !important;
+            border-radius: 50% !important;
+        }
+
+        /* Remove red hover effect */
+        [role="gridcell"]:hover {
+            background-color: #00b482 !important;
+            color: black !important;
+            border-radius: 50% !important;
+        }
+
+        /* Fix today's date highlight color */
+        [role="gridcell"][aria-current="date"] {
+            border: 2px solid #009C6E !important;
+            border-radius: 50% !important;
+            color: black !important;
+        }
+
+        /* Ensure all text remains visible */
+        [role="gridcell"] {
+            color: #333 !important;
+        }
+
+    </style>
+    """,
+    unsafe_allow_html=True
+)
+
+def apply_preset(preset):
+    st.session_state.start_input, st.session_state.end_input = preset.period()
+
+st.sidebar.markdown("### Selecione o Período")
+# Presets com KPIs pré-calculados; o callback roda antes dos date_input, que recebem o novo período
+for column, preset in zip(st.sidebar.columns(len(PRESETS)), PRESETS):
+    column.button(preset.label, key=f"preset_{preset.key}", on_click=apply_preset, args=(preset,),
+                  use_container_width=True)
+start_date = st.sidebar.date_input("Data Inicial", key="start_input")
+end_date = st.sidebar.date_input("Data Final", key="end_input")
+
+# Ensure start_date is before end_date
+if start_date > end_date:
+    st.sidebar.error("A data inicial não pode ser maior que a data final.")
+else:
+    # Update session state
+    st.session_state.start_date = start_date
+    st.session_state.end_date = end_date
+
+# Período efetivo (o último válido): filtra o carregamento, os KPIs, o gráfico, a tabela e o contexto do LLM
+period_start = st.session_state.start_date
+period_end = st.session_state.end_date
+
+# A atualização pode escrever no banco, por isso a versão é lida novamente em seguida
+with timed("rollup", cached=True):
+    refresh_rollups(get_data_version())
+
+# Chave das respostas em cache do LLM: mesmos dados e mesmo período
+data_key = f"{get_data_version()}|{period_start}|{period_end}"
+
 # Main content
 st.markdown('<h1 style="font-size: 24px; margin-bottom: 25px; color: #2c3e50; font-weight: 600; border-bottom: 2px solid #009C6E; padding-bottom: 10px; margin-top:-20px;">Dashboard</h1>', unsafe_allow_html=True)
 
@@ -568,173 +627,251 @@ if st.session_state.selected_question is not None:
     """, unsafe_allow_html=True)
 
 # Configuração do PandasAI
-api_key = os.environ.get("OPENAI_API_KEY")
-if api_key:
-    llm = OpenAI(api_token=api_key, model="gpt-4", temperature=0,
-    system_message=("Você é um assistente de análise de dados médicos. "
+LLM_MODEL = "gpt-4"
+SYSTEM_MESSAGE = ("Você é um assistente de análise de dados médicos. "
                 "Responda SEMPRE em português brasileiro, em tom profissional mas acessível. "
                 "Não use termos em inglês a menos que sejam termos técnicos sem tradução adequada. "
                 "Dê respostas concisas e diretas, focadas nos dados. "
                 "Quando for solicitado a criar gráficos, SEMPRE use a biblioteca Plotly e não matplotlib. "
                 "Para todos os gráficos, use a cor #009C6E como cor principal. "
                 "Sempre retorne o código do gráfico Plotly dentro de tags <plotly></plotly> para que ele seja renderizado corretamente."
-            ))
-    smart_df = SmartDataframe(df, config={
-        "llm": llm,
-        "language": "pt-br",
-        "response_parser": StreamlitResponse  # Adicionando o novo parser
-    })
-    
-    
-    if user_query and (search_button or st.session_state.execute_query):
-        st.markdown("""
-        <div class="section">
-            <div class="section-header" style="background-color: white; padding: 12px; border-radius: 6px; box-shadow: 0 2px 8px rgba(0,0,0,0.08); margin-bottom: 15px; display: flex; align-items: center;">
-                <i class="fas fa-robot" style="color: #009C6E; font-size: 16px; margin-right: 10px;"></i>
-                <span style="font-size: 16px; font-weight: 600; color: #2c3e50;">Resposta da IA</span>
-            </div>
-      """, unsafe_allow_html=True)
-        
-        with st.spinner("Processando sua pergunta..."):
-            try:
-                # Modify the query to ensure Plotly is used for charts
-                if "gráfico" in st.session_state.query.lower() or "grafico" in st.session_state.query.lower() or "visualização" in st.session_state.query.lower() or "visualizacao" in st.session_state.query.lower():
-                    st.session_state.query += " Use Plotly para criar o gráfico com a cor #009C6E como cor principal e retorne o código dentro de tags <plotly></plotly>. Certifique-se de que o gráfico seja completo e contenha todos os elementos necessários."
-                
-                # Enviar pergunta ao PandasAI
-                # Com o StreamlitResponse configurado, ele já irá renderizar o resultado apropriadamente
-                smart_df.chat(f"""Responda em portugues: {st.session_state.query}
-- **Para valores financeiros**, utilize a formatação BRL, exemplo: R$ 11.279.589,75
-""")
-                # Não precisamos fazer nada adicional aqui, pois o parser já trata a exibição
-            except Exception as e:
-                st.error(f"Erro ao processar a pergunta: {str(e)}")
-            
-        st.markdown("</div></div>", unsafe_allow_html=True)
-        
-        # Reset the execute_query flag after processing
-        st.session_state.execute_query = False
-else:
-    st.error("API Key não encontrada. Configure a variável de ambiente OPENAI_API_KEY.")
+            )
 
-# Function to query SQLite database
-def query_db(query, params=()):
-    conn = sqlite3.connect("medical_data.db")
-    result = conn.execute(query, params).fetchone()[0]
-    conn.close()
-    return result if result else 0  # Avoid None values
+@st.cache_resource(show_spinner=False)
+def get_answer_cache():
+    return AnswerCache()
 
-# Define session state for date selection
-if "start_date" not in st.session_state:
-    st.session_state.start_date = datetime.today() - timedelta(days=7)
-if "end_date" not in st.session_state:
-    st.session_state.end_date = datetime.today()
+# Intervalo de atualização do código exibido enquanto a resposta é gerada
+STREAM_POLL_SECONDS = 0.3
 
-st.markdown(
+def stream_answer(context, prompt, key):
     """
-    <style>
-        /* Target the date input box */
-        [data-testid="stSidebar"] [data-baseweb="input"] {
-            background-color: var(--light-gray) !important;
-            border-radius: 5px;
-            border: 1px solid #ccc !important;
-        }
-
-        /* Change focus border color from red to green */
-        [data-testid="stSidebar"] [data-baseweb="input"]:focus {
-            border: 2px solid #009C6E !important;
-            box-shadow: 0 0 5px #009C6E !important;
-        }
-
-        /* Target the calendar popup container */
-        [role="dialog"] {
-            background-color: var(--light-gray) !important;
-            border: 1px solid #ccc !important;
-            border-radius: 8px !important;
-        }
-
-        /* Fix selected date red color */
-        [role="gridcell"][aria-selected="true"] {
-            background-color: #009C6E !important;
-            color: white !important;
-            border-radius: 50% !important;
-        }
-
-        /* Stronger override for red background */
-        [role="gridcell"][aria-selected="true"]::after {
-            background-color: #009C6E !important;
-            border-radius: 50% !important;
-        }
-
-        /* Remove red hover effect */
-        [role="gridcell"]:hover {
-            background-color: #00b482 !important;
-            color: black !important;
-            border-radius: 50% !important;
-        }
+    Executa a pergunta em segundo plano (llm_stream.AnswerStream) e mostra o código gerado
+    enquanto ele chega, com um botão de cancelamento. A resposta em andamento fica na
+    sessão: se o script for reexecutado antes do fim, a mesma execução é retomada.
+    Retorna o resultado do PandasAI ou None quando a resposta foi cancelada.
+    """
+    streams = st.session_state.setdefault("answer_streams", {})
+    answer = streams.get(key)
+    if answer is None or (answer.done and answer.result is None):
+        answer = AnswerStream(key, prompt, on_result=partial(get_answer_cache().set, key))
+        answer.start(context.chat)
+        streams[key] = answer
+
+    with st.status(STAGE_LABELS[answer.stage], expanded=True) as status:
+        code_area = st.empty()
+        cancel_area = st.empty()
+        cancel_area.button("Cancelar resposta", key=f"cancel_{key}")
+        while not answer.wait(STREAM_POLL_SECONDS):
+            if answer.expired:
+                answer.cancel()
+                break
+            if answer.code:
+                code_area.code(answer.code, language="python")
+            status.update(label=STAGE_LABELS[answer.stage])
+        cancel_area.empty()
+        if answer.code:
+            code_area.code(answer.code, language="python")
+        if answer.cancelled:
+            status.update(label=STAGE_LABELS["cancelada"], state="error", expanded=False)
+        elif answer.stage == "concluida":
+            status.update(label=STAGE_LABELS["concluida"], state="complete", expanded=False)
+        else:
+            status.update(label=STAGE_LABELS["erro"], state="error", expanded=False)
+
+    streams.pop(key, None)
+    if answer.cancelled:
+        st.info("Resposta cancelada." if not answer.expired else "Resposta cancelada: tempo limite excedido.")
+        return None
+    if answer.error:
+        raise RuntimeError(answer.error)
+    return answer.result
+
+def cancel_requested_answers():
+    """Cancela as respostas cujo botão foi clicado (o clique reexecuta o script)."""
+    cancelled = False
+    for key, answer in list(st.session_state.get("answer_streams", {}).items()):
+        if st.session_state.get(f"cancel_{key}"):
+            answer.cancel()
+            del st.session_state.answer_streams[key]
+            cancelled = True
+    return cancelled
+
+def cached_chat(context, prompt, data_key):
+    """
+    Envia o prompt ao contexto do PandasAI (SmartDataframe ou SmartDatalake), reaproveitando
+    respostas anteriores para a mesma pergunta sobre os mesmos dados (data_key: versão do
+    banco + período + contexto). Respostas novas chegam por stream_answer; em cache ou não,
+    o resultado é exibido pelo StreamlitResponse.
+    """
+    answer_cache = get_answer_cache()
+    key = make_key(prompt, data_key, LLM_MODEL, SYSTEM_MESSAGE)
+    with timed("chat_llm", cached=True) as span:
+        cached = answer_cache.get(key)
+        if cached is not None:
+            return StreamlitResponse(None).parse(cached)
+        span.cache = "miss"
+        # A resposta é gravada no cache pela própria thread (AnswerStream.on_result)
+        result = stream_answer(context, prompt, key)
+        if result is None:
+            return None
+        # Em caso de erro o PandasAI retorna uma mensagem (str) em vez do dicionário do parser
+        if not isinstance(result, dict):
+            st.warning(result)
+            return result
+        if hasattr(result["value"], "__len__") and not isinstance(result["value"], str):
+            span.rows = len(result["value"])
+        return StreamlitResponse(None).parse(result)
+
+INSIGHTS_QUERY = """
 
-        /* Fix today's date highlight color */
-        [role="gridcell"][aria-current="date"] {
-            border: 2px solid #009C6E !important;
-            border-radius: 50% !important;
-            color: black !important;
-        }
+**"Liste os 6 principais insights dos dados de alertas médicos em português, formatando a resposta em Markdown. Não utilize gráficos.**  
 
-        /* Ensure all text remains visible */
-        [role="gridcell"] {
-            color: #333 !important;
-        }
+- **Para valores financeiros**, utilize a seguinte formatação:  
+  ```python
+  a = '{:,.2f}'.format(float(valor_financeiro))  
+  b = a.replace(',', 'v')  
+  c = b.replace('.', ',')  
+  return c.replace('v', '.')  
+  ```  
+- **Inclua informações sobre os alertas ativos, destacando quais pacientes e provedores possuem a maior quantidade de alertas ativos.**"  
 
-    </style>
-    """,
-    unsafe_allow_html=True
-)
 
 
+"""
 
-st.sidebar.markdown("### Selecione o Período")
-start_date = st.sidebar.date_input("Data Inicial", st.session_state.start_date)
-end_date = st.sidebar.date_input("Data Final", st.session_state.end_date)
+@st.cache_resource(show_spinner=False)
+def get_insights_worker():
+    return InsightsWorker(InsightsStore())
 
-# Ensure start_date is before end_date
-if start_date > end_date:
-    st.sidebar.error("A data inicial não pode ser maior que a data final.")
-else:
-    # Update session state
-    st.session_state.start_date = start_date
-    st.session_state.end_date = end_date
-
-    # Convert dates to datetime format for database queries
-    start_date_dt = datetime.combine(start_date, datetime.min.time())
-    end_date_dt = datetime.combine(end_date, datetime.max.time())
+def generate_llm_insights(context_tables, llm):
+    """
+    Gera os insights com o PandasAI sobre as tabelas de resumo (os insights pedem totais por
+    paciente e provedor, não alertas individuais). Roda na thread do InsightsWorker, por isso
+    usa o parser padrão (sem chamadas ao Streamlit) e devolve o Markdown como texto.
+    """
+    lake = compact_datalake(context_tables, {"llm": llm, "language": "pt-br"})
+    isolate(lake, [FrameSource(table.frame) for table in context_tables])
+    answer = lake.chat(INSIGHTS_QUERY)
+    if lake.last_error:
+        raise RuntimeError(lake.last_error)
+    return answer
+
+def chat_context(question):
+    """
+    Contexto do PandasAI para a pergunta: as tabelas de resumo de llm_context.py por padrão,
+    o dataframe completo só quando a pergunta cita colunas do nível do alerta.
+    Retorna o contexto e seu nome, que entra na chave do cache de respostas.
+    """
+    if needs_full_data(question):
+        return isolate(smart_df, [full_data_source()]), "completo"
+    context_tables = load_context_tables(get_data_version(), period_start, period_end)
+    lake = compact_datalake(context_tables, chat_config)
+    return isolate(lake, [FrameSource(table.frame) for table in context_tables]), "compacto"
 
-    # Previous period calculation (same duration before start_date)
-    period_duration = end_date_dt - start_date_dt
-    start_date_previous = start_date_dt - period_duration
-    end_date_previous = start_date_dt
+def full_data_source():
+    """
+    O código gerado roda em outro processo (sandbox.py), que relê o período do snapshot
+    Arrow quando ele está em dia com o banco; caso contrário recebe o dataframe serializado.
+    """
+    manifest = read_manifest()
+    if manifest is not None and manifest["data_version"] == get_data_version():
+        return snapshot_source(period_start, period_end)
+    return FrameSource(df)
 
-    # Queries
-    queries = {
-        "Alertas Ativos": "SELECT COUNT(*) FROM alerts WHERE created_at BETWEEN ? AND ? AND alert_status = 'Ativo'",
-        "Alertas Ativos (Last Period)": "SELECT COUNT(*) FROM alerts WHERE created_at BETWEEN ? AND ? AND alert_status = 'Ativo'",
-        "Taxa de Confirmação": "SELECT ROUND(AVG(is_anomaly) * 100, 2) FROM alerts WHERE created_at BETWEEN ? AND ? AND alert_status = 'Ativo'",
-        "Taxa de Confirmação (Last Period)": "SELECT ROUND(AVG(is_anomaly) * 100, 2) FROM alerts WHERE created_at BETWEEN ? AND ? AND alert_status = 'Ativo'",
-        "Risco Total": "SELECT ROUND(SUM(risk_value), 2) FROM alerts WHERE created_at BETWEEN ? AND ? AND alert_status = 'Ativo'",
-        "Risco Total (Last Period)": "SELECT ROUND(SUM(risk_value), 2) FROM alerts WHERE created_at BETWEEN ? AND ? AND alert_status = 'Ativo'"
+api_key = os.environ.get("OPENAI_API_KEY")
+if api_key:
+    # Dataframe do período com todas as colunas (compartilhado entre sessões, invalidado pela
+    # versão do banco): só o PandasAI o usa; KPIs, gráfico e tabela consultam o SQLite
+    with timed("carga_dados", cached=True) as span:
+        df = load_shared_data(get_data_version(), period_start, period_end)
+        span.rows = len(df)
+    llm = StreamingOpenAI(api_token=api_key, model=LLM_MODEL, temperature=0,
+    system_message=SYSTEM_MESSAGE)
+    chat_config = {
+        "llm": llm,
+        "language": "pt-br",
+        # A resposta é gerada em outra thread; a exibição (StreamlitResponse) acontece em cached_chat
+        "response_parser": ResultParser
     }
+    smart_df = SmartDataframe(df, config=chat_config)
+else:
+    st.error("API Key não encontrada. Configure a variável de ambiente OPENAI_API_KEY.")
 
-    # Fetch data dynamically
-    current_alerts = query_db(queries["Alertas Ativos"], (start_date_dt, end_date_dt))
-    previous_alerts = query_db(queries["Alertas Ativos (Last Period)"], (start_date_previous, end_date_previous))
-    alerts_delta = current_alerts - previous_alerts
+# O botão "Cancelar resposta" reexecuta o script: a resposta é cancelada e a pergunta não é refeita
+if cancel_requested_answers():
+    st.session_state.execute_query = False
+    st.info("Resposta cancelada.")
 
-    current_confirmation = query_db(queries["Taxa de Confirmação"], (start_date_dt, end_date_dt))
-    previous_confirmation = query_db(queries["Taxa de Confirmação (Last Period)"], (start_date_previous, end_date_previous))
-    confirmation_delta = round(current_confirmation - previous_confirmation, 2)
+if user_query and (search_button or st.session_state.execute_query):
+    st.markdown("""
+    <div class="section">
+        <div class="section-header" style="background-color: white; padding: 12px; border-radius: 6px; box-shadow: 0 2px 8px rgba(0,0,0,0.08); margin-bottom: 15px; display: flex; align-items: center;">
+            <i class="fas fa-robot" style="color: #009C6E; font-size: 16px; margin-right: 10px;"></i>
+            <span style="font-size: 16px; font-weight: 600; color: #2c3e50;">Resposta da IA</span>
+        </div>
+  """, unsafe_allow_html=True)
+    
+    try:
+        # Perguntas conhecidas são respondidas localmente com SQL pré-compilado, sem chamar o LLM
+        routed = route_question(st.session_state.query, period_start=period_start, period_end=period_end)
+        if routed is not None:
+            with timed("pergunta_sql") as span:
+                with analytics_connection() as conn:
+                    result = run_intent(routed, conn)
+                if hasattr(result["value"], "__len__"):
+                    span.rows = len(result["value"])
+            StreamlitResponse(None).parse(result)
+        elif api_key:
+            # Modify the query to ensure Plotly is used for charts
+            if "gráfico" in st.session_state.query.lower() or "grafico" in st.session_state.query.lower() or "visualização" in st.session_state.query.lower() or "visualizacao" in st.session_state.query.lower():
+                st.session_state.query += " Use Plotly para criar o gráfico com a cor #009C6E como cor principal e retorne o código dentro de tags <plotly></plotly>. Certifique-se de que o gráfico seja completo e contenha todos os elementos necessários."
+            
+            # Enviar pergunta ao PandasAI: o código gerado aparece enquanto chega e a
+            # resposta é exibida pelo StreamlitResponse assim que a execução termina
+            context, context_kind = chat_context(st.session_state.query)
+            cached_chat(context, f"""Responda em portugues: {st.session_state.query}
+- **Para valores financeiros**, utilize a formatação BRL, exemplo: R$ 11.279.589,75
+""", f"{data_key}|{context_kind}")
+        else:
+            st.warning("Pergunta não reconhecida. Configure a variável de ambiente OPENAI_API_KEY para perguntas livres.")
+    except Exception as e:
+        st.error(f"Erro ao processar a pergunta: {str(e)}")
+    
+    st.markdown("</div></div>", unsafe_allow_html=True)
+    
+    # Reset the execute_query flag after processing
+    st.session_state.execute_query = False
 
-    current_risk = query_db(queries["Risco Total"], (start_date_dt, end_date_dt))
-    previous_risk = query_db(queries["Risco Total (Last Period)"], (start_date_previous, end_date_previous))
-    risk_delta = round(current_risk - previous_risk, 2)
+# Os cartões são recalculados periodicamente sem reexecutar o script inteiro
+@st.fragment(run_every=POLL_SECONDS)
+@traced_rerun("fragmento_kpis")
+def render_kpis(start_date, end_date):
+    # Se o banco mudou desde a última execução, atualiza a tabela agregada antes de ler
+    with timed("rollup", cached=True):
+        rollups_current = refresh_rollups(get_data_version())
+
+    # Períodos dos presets vêm de kpi_snapshots; os demais, com o período anterior de mesmo
+    # tamanho, em uma única consulta sobre alerts_daily
+    with timed("kpis", cached=True) as span:
+        kpis = None
+        if rollups_current:
+            with read_connection() as conn:
+                kpis = snapshot_kpis(conn, start_date, end_date)
+        if kpis is None:
+            cache_miss()
+            with analytics_connection() as conn:
+                kpis = compute_kpis(conn, (start_date, end_date), previous_period(start_date, end_date))
+        span.rows = len(kpis)
+
+    current_alerts = kpis["alertas_ativos"].current
+    alerts_delta = kpis["alertas_ativos"].delta
+
+    current_confirmation = kpis["taxa_confirmacao"].current
+    confirmation_delta = kpis["taxa_confirmacao"].delta
+
+    current_risk = kpis["risco_total"].current
+    risk_delta = kpis["risco_total"].delta
 
     # KPI Cards in a simpler style with dynamic data
     col1, col2, col3 = st.columns(3)
@@ -767,13 +904,15 @@ else:
     vs período anterior
 </div>
 
-        
+    
         """, unsafe_allow_html=True)
 
+render_kpis(period_start, period_end)
+
 # Create two columns for side-by-side layout
 col1, col2 = st.columns(2)
 
-# First container with insights - using PandasAI
+# First container with insights - SQL, with optional PandasAI explanation
 with col1:
     st.markdown("""
     <div class="section-header" style="background-color: white; padding: 12px; border-radius: 6px; box-shadow: 0 2px 8px rgba(0,0,0,0.08); margin-bottom: 15px;">
@@ -782,82 +921,39 @@ with col1:
     </div>
     """, unsafe_allow_html=True)
     
-    if api_key:
-        try:
-            insights_query = """
-
-**"Liste os 6 principais insights dos dados de alertas médicos em português, formatando a resposta em Markdown. Não utilize gráficos.**  
-
-- **Para valores financeiros**, utilize a seguinte formatação:  
-  ```python
-  a = '{:,.2f}'.format(float(valor_financeiro))  
-  b = a.replace(',', 'v')  
-  c = b.replace('.', ',')  
-  return c.replace('v', '.')  
-  ```  
-- **Inclua informações sobre os alertas ativos, destacando quais pacientes e provedores possuem a maior quantidade de alertas ativos.**"  
-
-
-
-"""
-            # Não precisamos armazenar o resultado, pois o parser já trata a exibição
-            smart_df.chat(insights_query)
-        except Exception as e:
-            st.error(f"Erro ao gerar insights: {str(e)}")
-
-# Função para criar gráfico de distribuição de alertas com cache
-@lru_cache(maxsize=10)
-def create_alert_distribution_chart(df_json):
-    """
-    Cria um gráfico de distribuição de alertas por tipo com cache para melhor desempenho.
-    O parâmetro df_json é uma string JSON do dataframe para permitir o cache.
-    """
-    start_time = time.time()
-    
-    # Converter JSON para DataFrame
-    df = pd.read_json(df_json)
-    
-    # Calcular a distribuição
-    alert_counts = df['alert_type'].value_counts().reset_index()
-    alert_counts.columns = ['Tipo de Alerta', 'Contagem']
-    total = alert_counts['Contagem'].sum()
-    alert_counts['Porcentagem'] = (alert_counts['Contagem'] / total * 100).round(1)
-    
-    # Criar gráfico otimizado
-    fig = go.Figure()
-    fig.add_trace(go.Bar(
-        x=alert_counts['Tipo de Alerta'],
-        y=alert_counts['Porcentagem'],
-        marker_color='#009C6E',
-        text=alert_counts['Porcentagem'].apply(lambda x: f'{x}%'),
-        textposition='auto'
-    ))
-    
-    # Otimizar layout para melhor desempenho
-    fig.update_layout(
-        title='Distribuição de Alertas por Tipo (%)',
-        xaxis_title='Tipo de Alerta',
-        yaxis_title='Porcentagem (%)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        height=400,
-        margin=dict(l=20, r=20, t=40, b=20),
-        hovermode='closest',
-        xaxis=dict(tickangle=-45),
-        yaxis=dict(range=[0, max(alert_counts['Porcentagem']) * 1.1])
-    )
-    
-    # Otimizar configuração para renderização mais rápida
-    config = {
-        'staticPlot': True,  # Modo estático para melhor desempenho
-        'displayModeBar': False,
-        'responsive': True
-    }
-    
-    end_time = time.time()
-    print(f"Tempo para gerar gráfico: {end_time - start_time:.2f} segundos")
-    
-    return fig, config
+    try:
+        # Insights determinísticos (SQL) do período, sem depender do LLM
+        with timed("insights", cached=True):
+            insights_markdown = get_insights(get_data_version(), period_start, period_end)
+        st.markdown(insights_markdown)
+    except Exception as e:
+        st.error(f"Erro ao gerar insights: {str(e)}")
+
+    # Explicação adicional via LLM: opcional e gerada em segundo plano
+    if api_key and st.toggle("Explicar mais com IA", key="explain_insights"):
+        worker = get_insights_worker()
+        context_tables = load_context_tables(get_data_version(), period_start, period_end)
+        worker.request(data_key, partial(generate_llm_insights, context_tables, llm))
+
+        @st.fragment(run_every=5 if worker.is_running else None)
+        def render_llm_insights():
+            latest = worker.store.latest(data_key) or worker.store.newest()
+            if latest is not None:
+                st.markdown(latest.markdown)
+                st.caption(f"Gerado em {latest.generated_at:%d/%m/%Y %H:%M}")
+                if latest.data_version != data_key:
+                    st.caption("Estes insights são de outro período ou versão dos dados.")
+            elif worker.is_running:
+                st.info("Gerando insights em segundo plano...")
+            if worker.last_error:
+                st.error(f"Erro ao gerar insights: {worker.last_error}")
+            if worker.is_running and latest is not None:
+                st.caption("Atualizando insights em segundo plano...")
+            elif st.button("Atualizar insights", key="refresh_insights"):
+                worker.request(data_key, partial(generate_llm_insights, context_tables, llm), force=True)
+                st.rerun()
+
+        render_llm_insights()
 
 # Second container with distribution chart - using cached function
 with col2:
@@ -871,9 +967,10 @@ with col2:
     try:
         # Usar a função com cache para melhor desempenho
         with st.spinner("Gerando gráfico..."):
-            # Converter DataFrame para JSON para permitir cache
-            df_json = df.to_json()
-            fig, config = create_alert_distribution_chart(df_json)
+            # Cache indexado pela versão do banco e pelo período: renderização "quente" é só uma consulta ao dicionário
+            with timed("grafico", cached=True) as span:
+                fig, config = create_alert_distribution_chart(get_data_version(), period_start, period_end)
+                span.rows = len(fig.data[0].x) if fig.data else 0
             st.plotly_chart(fig, use_container_width=True, config=config)
     except Exception as e:
         st.error(f"Erro ao gerar gráfico: {str(e)}")
@@ -882,7 +979,8 @@ with col2:
         if api_key:
             try:
                 chart_query = "Crie um gráfico de barras simples usando Plotly mostrando a distribuição em porcentagem dos tipos de alertas. Use a cor #009C6E para as barras. Coloque os elementos do gráfico em português e use background transparente. Retorne o código do gráfico dentro de tags <plotly></plotly>"
-                smart_df.chat(chart_query)
+                context, context_kind = chat_context(chart_query)
+                cached_chat(context, chart_query, f"{data_key}|{context_kind}")
             except Exception as e2:
                 st.error(f"Erro ao gerar gráfico alternativo: {str(e2)}")
 
@@ -894,23 +992,73 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# Use real data from the database
-alertas = df[["alert_type", "description", "risk_value"]].rename(
-    columns={"alert_type": "Nome", "description": "Descrição", "risk_value": "Valor em risco"}
-)
-
-# Format 'Valor em risco' for display
-alertas["Valor em risco (BRL)"] = alertas["Valor em risco"].apply(
-    lambda x: f"R$ {x:,.2f}".replace(",", "v").replace(".", ",").replace("v", ".")
-)
-
-# Ensure numerical sorting by keeping the original float column
-alertas = alertas[["Nome", "Descrição", "Valor em risco", "Valor em risco (BRL)"]]
-
-
-st.dataframe(alertas, column_config={"Valor em risco": None}) 
+# Feed incremental: a cada POLL_SECONDS só os alertas alterados depois da marca d'água são lidos
+@st.fragment(run_every=POLL_SECONDS)
+@traced_rerun("fragmento_alertas")
+def render_live_alerts(start_date, end_date):
+    with timed("feed") as span:
+        if "feed_rows" not in st.session_state:
+            with read_connection() as conn:
+                st.session_state.feed_rows, st.session_state.feed_watermark = initial_feed(conn)
+            span.rows = len(st.session_state.feed_rows)
+        else:
+            with read_connection() as conn:
+                changes, st.session_state.feed_watermark = fetch_changes(conn, st.session_state.feed_watermark)
+            span.rows = len(changes)
+            if changes:
+                st.session_state.feed_rows = merge_feed(st.session_state.feed_rows, changes)
+                st.toast(f"{len(changes)} alerta(s) novo(s) ou atualizado(s)")
+
+    st.markdown("**Últimas atualizações**")
+    feed = format_page([row[1:1 + len(FEED_COLUMNS)] for row in st.session_state.feed_rows], FEED_COLUMNS)
+    st.dataframe(feed, hide_index=True, use_container_width=True)
+
+    # Período, filtros e ordenação são aplicados no SQL; só a página visível é carregada e formatada
+    with read_connection() as conn:
+        alert_types, alert_statuses = filter_options(conn)
+    filter_cols = st.columns([2, 2, 2, 1])
+    with filter_cols[0]:
+        selected_types = st.multiselect("Tipo", alert_types, key="table_types")
+    with filter_cols[1]:
+        selected_statuses = st.multiselect("Status", alert_statuses, key="table_statuses")
+    with filter_cols[2]:
+        sort_by = st.selectbox("Ordenar por", list(SORT_OPTIONS), key="table_sort")
+
+    with timed("tabela_contagem"):
+        with read_connection() as conn:
+            total_alerts = count_alerts(conn, selected_types, selected_statuses, start_date, end_date)
+    total_pages = max(1, -(-total_alerts // PAGE_SIZE))
+    # A página vive só no session_state (o widget não recebe value=); um período ou filtro
+    # menor pode ter menos páginas que a página selecionada
+    if "table_page" not in st.session_state:
+        st.session_state.table_page = 1
+    elif st.session_state.table_page > total_pages:
+        st.session_state.table_page = total_pages
+    with filter_cols[3]:
+        page = st.number_input("Página", min_value=1, max_value=total_pages, step=1, key="table_page")
+
+    with timed("tabela") as span:
+        with read_connection() as conn:
+            alertas = fetch_alerts_page(
+                conn, page, PAGE_SIZE, sort_by, selected_types, selected_statuses, start_date, end_date
+            )
+        span.rows = len(alertas)
+    st.dataframe(alertas, hide_index=True, use_container_width=True)
+    st.caption(f"Página {page} de {total_pages} · {total_alerts} alertas")
+
+render_live_alerts(period_start, period_end)
 
 # Add Font Awesome
 st.markdown("""
 <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css">
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+finish_trace()
+
+# Painel de desempenho (somente com DASHBOARD_ADMIN=1): últimas execuções e p50/p95 por fase
+if is_admin():
+    with st.sidebar.expander("Desempenho"):
+        last_runs = st.number_input("Últimas execuções", min_value=5, max_value=200, value=20, step=5, key="perf_runs")
+        traces = recent_traces(last_runs)
+        st.dataframe(summarize(traces), hide_index=True, use_container_width=True)
+        st.dataframe(traces_table(traces), hide_index=True, use_container_width=True)
\ No newline at end of file
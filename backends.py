@@ -0,0 +1,195 @@
+"""
+Backend das consultas analíticas (KPIs, distribuição por tipo, rankings e insights).
+
+O backend é escolhido pela variável de ambiente DASHBOARD_QUERY_BACKEND:
+
+- "sqlite" (padrão): usa as conexões somente leitura do pool de db.read_connection.
+- "duckdb": executa as mesmas consultas no DuckDB embutido, vetorizado e em várias
+  threads. O banco é anexado com a extensão sqlite do DuckDB; quando ela não está
+  disponível (sem rede para INSTALL, por exemplo), as tabelas usadas pelas agregações são
+  copiadas para o DuckDB e recopiadas quando a versão do banco muda.
+
+Em qualquer falha do DuckDB (módulo ausente, extensão, dialeto) a consulta é executada no
+SQLite; o aviso vai para o logger dashboard.backends uma única vez por tipo de falha.
+A tabela paginada e as escritas continuam sempre no SQLite: são buscas pontuais, em que o
+armazenamento por linhas é a melhor escolha.
+"""
+from contextlib import contextmanager
+import logging
+import os
+import re
+import threading
+
+import pandas as pd
+
+from db import DB_PATH, get_data_version, read_connection
+
+QUERY_BACKEND = os.environ.get("DASHBOARD_QUERY_BACKEND", "sqlite").lower()
+
+# Tabelas copiadas para o DuckDB quando a extensão sqlite não está disponível
+MIRROR_TABLES = ("alerts", "alerts_daily", "providers", "patients", "procedures", "hospitalizations")
+MIRROR_CHUNK_SIZE = 200_000
+
+# Parâmetros nomeados: :nome (SQLite) -> $nome (DuckDB)
+_NAMED_PARAM = re.compile(r"(?<![:\w]):([A-Za-z_]\w*)")
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+logger = logging.getLogger("dashboard.backends")
+_warned = set()
+_warned_lock = threading.Lock()
+
+
+def _warn_once(key, message, *args):
+    """Avisa só na primeira ocorrência de cada tipo de problema; as seguintes vão para debug."""
+    with _warned_lock:
+        first = key not in _warned
+        _warned.add(key)
+    logger.log(logging.WARNING if first else logging.DEBUG, message, *args)
+
+
+class SqliteBackend:
+    name = "sqlite"
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+
+    def connection(self):
+        return read_connection(self.db_path)
+
+
+class _DuckDBConnection:
+    """
+    Interface mínima de conexão/cursor DB-API (execute, fetch*, iteração) sobre um cursor
+    DuckDB, com fallback para SQLite.
+    """
+
+    def __init__(self, cursor, fallback, error_type):
+        self.cursor = cursor
+        self.fallback = fallback
+        self.error_type = error_type
+
+    def execute(self, sql, params=()):
+        if isinstance(params, dict):
+            duck_sql, duck_params = _NAMED_PARAM.sub(r"$\1", sql), params
+        else:
+            duck_sql, duck_params = sql, list(params)
+        try:
+            self.cursor.execute(duck_sql, duck_params)
+        except self.error_type as e:
+            _warn_once("fallback", "DuckDB falhou (%s); consultas com erro são executadas no SQLite", e)
+            return self.fallback.execute(sql, params)
+        return self
+
+    @property
+    def description(self):
+        return self.cursor.description
+
+    def fetchone(self):
+        return self.cursor.fetchone()
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    def __iter__(self):
+        # Como no sqlite3, o resultado de execute pode ser percorrido diretamente
+        return iter(self.cursor.fetchall())
+
+
+class DuckDBBackend:
+    name = "duckdb"
+
+    def __init__(self, db_path=DB_PATH, threads=None):
+        import duckdb
+
+        self.db_path = db_path
+        self.error_type = duckdb.Error
+        self._db = duckdb.connect(":memory:")
+        self._db.execute(f"SET threads TO {int(threads or os.cpu_count() or 1)}")
+        self._local = threading.local()
+        self._sync_lock = threading.Lock()
+        self._version = None
+        self.mode = "attach" if self._attach() else "mirror"
+
+    def _attach(self):
+        try:
+            try:
+                self._db.execute("LOAD sqlite")
+            except self.error_type:
+                self._db.execute("INSTALL sqlite")
+                self._db.execute("LOAD sqlite")
+            path = os.path.abspath(self.db_path).replace("'", "''")
+            self._db.execute(f"ATTACH '{path}' AS medical (TYPE SQLITE, READ_ONLY)")
+            with read_connection(self.db_path) as conn:
+                tables = [row[0] for row in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+                )]
+            # Views com os nomes originais: o mesmo SQL roda nos dois backends
+            for table in tables:
+                self._db.execute(f"CREATE OR REPLACE VIEW {table} AS SELECT * FROM medical.{table}")
+            return True
+        except self.error_type:
+            return False
+
+    def _mirror(self):
+        with read_connection(self.db_path) as conn:
+            for table in MIRROR_TABLES:
+                self._db.execute(f"DROP TABLE IF EXISTS {table}")
+                created = False
+                for chunk in pd.read_sql(f"SELECT * FROM {table}", conn, chunksize=MIRROR_CHUNK_SIZE):
+                    self._db.register("_chunk", chunk)
+                    if created:
+                        self._db.execute(f"INSERT INTO {table} SELECT * FROM _chunk")
+                    else:
+                        self._db.execute(f"CREATE TABLE {table} AS SELECT * FROM _chunk")
+                        created = True
+                    self._db.unregister("_chunk")
+
+    def sync(self):
+        """No modo mirror, recopia as tabelas quando a versão do banco muda."""
+        if self.mode != "mirror":
+            return
+        version = get_data_version(self.db_path)
+        if version == self._version:
+            return
+        with self._sync_lock:
+            if version != self._version:
+                self._mirror()
+                self._version = version
+
+    @contextmanager
+    def connection(self):
+        self.sync()
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            # Cada thread usa o próprio cursor (conexões DuckDB não são compartilháveis entre threads)
+            cursor = self._local.cursor = self._db.cursor()
+        with read_connection(self.db_path) as fallback:
+            yield _DuckDBConnection(cursor, fallback, self.error_type)
+
+
+def get_backend(db_path=DB_PATH, name=None):
+    """Backend configurado para o banco (um por processo); DuckDB indisponível cai no SQLite."""
+    name = name or QUERY_BACKEND
+    with _backends_lock:
+        backend = _backends.get((db_path, name))
+        if backend is None:
+            if name == "duckdb":
+                try:
+                    backend = DuckDBBackend(db_path)
+                except Exception as e:
+                    _warn_once("unavailable", "Backend DuckDB indisponível (%s); usando SQLite", e)
+                    backend = SqliteBackend(db_path)
+            else:
+                backend = SqliteBackend(db_path)
+            _backends[(db_path, name)] = backend
+    return backend
+
+
+def analytics_connection(db_path=DB_PATH):
+    """
+    Conexão para consultas de agregação no backend configurado, usada em um bloco
+    `with analytics_connection() as conn:`.
+    """
+    return get_backend(db_path).connection()
@@ -0,0 +1,232 @@
+"""
+Benchmark das consultas do dashboard em bancos de qualquer escala.
+
+Mede get_data e o snapshot Arrow (período e histórico completo), os KPIs, o gráfico de
+distribuição, a tabela paginada e os insights SQL. Cada caso é executado --repeat vezes (após --warmup execuções
+descartadas) e o resultado sai em JSON com percentis de latência, número de linhas e pico de
+memória Python (tracemalloc, medido em uma execução separada para não distorcer os tempos).
+
+Com --baseline, compara a mediana de cada caso com um JSON anterior e termina com código 1
+se algum caso ficar mais lento que a tolerância.
+
+Uso:
+    python synthetic_data.py --alerts 1000000 --out synthetic_data.db
+    python benchmark.py --db synthetic_data.db --repeat 10 --out resultado.json
+    python benchmark.py --alerts 100000                 # gera o banco se ainda não existir
+    python benchmark.py --db synthetic_data.db --baseline resultado.json --tolerance 0.2
+"""
+import argparse
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+from functools import partial
+import json
+import os
+import platform
+import resource
+import sqlite3
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from alerts_table import PAGE_SIZE, count_alerts, fetch_alerts_page
+import backends
+from charts import create_alert_distribution_chart
+from data import get_data
+from db import DB_PATH, get_data_version, read_connection
+from insights import build_insights
+from kpis import compute_kpis
+from llm_context import CONTEXT_COLUMNS
+from snapshot import load_alerts, refresh_snapshot
+
+DEFAULT_PERIOD_DAYS = 30
+
+
+def _rows(result):
+    if isinstance(result, tuple):
+        result = result[0]
+    if isinstance(result, pd.DataFrame):
+        return len(result)
+    if isinstance(result, dict):
+        return len(result)
+    return None
+
+
+def _using(connection, func):
+    """Caso que retira a conexão do pool a cada execução, como o dashboard faz."""
+    def run():
+        with connection() as conn:
+            return func(conn)
+    return run
+
+
+def build_cases(db_path, start_date, end_date, snapshot_dir):
+    """Casos de benchmark: nome -> função sem argumentos."""
+    sqlite = partial(read_connection, db_path)
+    # Agregações no backend escolhido (backends.py); tabela e get_data sempre no SQLite
+    analytics = partial(backends.analytics_connection, db_path)
+    version = get_data_version(db_path)
+    days = (end_date - start_date).days + 1
+    previous = (start_date - timedelta(days=days), start_date - timedelta(days=1))
+
+    def table(conn):
+        total = count_alerts(conn, start_date=start_date, end_date=end_date)
+        return fetch_alerts_page(conn, 1, PAGE_SIZE, start_date=start_date, end_date=end_date), total
+
+    return {
+        "get_data_periodo": _using(sqlite, lambda conn: get_data(conn, start_date, end_date)),
+        "get_data_completo": _using(sqlite, get_data),
+        "snapshot_periodo": lambda: load_alerts(start_date=start_date, end_date=end_date, snapshot_dir=snapshot_dir),
+        "snapshot_completo": lambda: load_alerts(snapshot_dir=snapshot_dir),
+        # Colunas do contexto compacto do LLM, como em app.load_context_tables
+        "snapshot_contexto": lambda: load_alerts(
+            list(CONTEXT_COLUMNS), start_date=start_date, end_date=end_date, snapshot_dir=snapshot_dir
+        ),
+        "kpis": _using(analytics, lambda conn: compute_kpis(conn, (start_date, end_date), previous)),
+        # __wrapped__ ignora o lru_cache: mede a geração, não a consulta ao cache
+        "grafico_distribuicao": lambda: create_alert_distribution_chart.__wrapped__(
+            version, start_date, end_date, db_path
+        ),
+        "tabela": _using(sqlite, table),
+        "insights": _using(analytics, lambda conn: build_insights(conn, start_date, end_date)),
+    }
+
+
+def run_case(func, repeat, warmup):
+    for _ in range(warmup):
+        func()
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+    return {
+        "p50_ms": round(p50, 2),
+        "p95_ms": round(p95, 2),
+        "p99_ms": round(p99, 2),
+        "min_ms": round(min(timings), 2),
+        "max_ms": round(max(timings), 2),
+        "mean_ms": round(sum(timings) / len(timings), 2),
+        "rows": _rows(result),
+        "peak_memory_mb": round(peak / 1024 ** 2, 2),
+    }
+
+
+def default_period(db_path, days=DEFAULT_PERIOD_DAYS):
+    """Últimos `days` dias até o alerta mais recente do banco."""
+    with read_connection(db_path) as conn:
+        last = conn.execute("SELECT MAX(created_at) FROM alerts").fetchone()[0]
+    end_date = date.fromisoformat(last[:10]) if last else date.today()
+    return end_date - timedelta(days=days - 1), end_date
+
+
+def run_benchmark(db_path, repeat=5, warmup=1, start_date=None, end_date=None, cases=None, backend=None):
+    if start_date is None or end_date is None:
+        start_date, end_date = default_period(db_path)
+    # Snapshot próprio do banco medido, ao lado dele
+    snapshot_dir = f"{db_path}.snapshot"
+    started = time.perf_counter()
+    refresh_snapshot(db_path, snapshot_dir)
+    snapshot_refresh_ms = round((time.perf_counter() - started) * 1000, 2)
+    if backend:
+        # Vale também para o gráfico, que usa backends.analytics_connection internamente
+        backends.QUERY_BACKEND = backend
+    selected = build_cases(db_path, start_date, end_date, snapshot_dir)
+    if cases:
+        selected = {name: selected[name] for name in cases}
+
+    results = {}
+    for name, func in selected.items():
+        results[name] = run_case(func, repeat, warmup)
+
+    with read_connection(db_path) as conn:
+        alerts = conn.execute("SELECT COUNT(*) FROM alerts").fetchone()[0]
+    return {
+        "db": os.path.abspath(db_path),
+        "db_size_mb": round(os.path.getsize(db_path) / 1024 ** 2, 1),
+        "alerts": alerts,
+        "period": {"start": start_date.isoformat(), "end": end_date.isoformat()},
+        "repeat": repeat,
+        "warmup": warmup,
+        "backend": backends.get_backend(db_path).name,
+        "environment": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+        },
+        "cases": results,
+        "snapshot_refresh_ms": snapshot_refresh_ms,
+        # ru_maxrss é em KiB no Linux
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Casos cuja mediana piorou mais que `tolerance` (fração) em relação à baseline."""
+    regressions = {}
+    for name, current in report["cases"].items():
+        previous = baseline.get("cases", {}).get(name)
+        if previous and previous["p50_ms"] > 0 and current["p50_ms"] > previous["p50_ms"] * (1 + tolerance):
+            regressions[name] = {"baseline_p50_ms": previous["p50_ms"], "p50_ms": current["p50_ms"]}
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das consultas do dashboard")
+    parser.add_argument("--db", default=None, help=f"banco SQLite (padrão: {DB_PATH})")
+    parser.add_argument("--alerts", type=int, help="gera um banco sintético com N alertas se --db não existir")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--start", type=date.fromisoformat, help="início do período (AAAA-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, help="fim do período (AAAA-MM-DD)")
+    parser.add_argument("--backend", choices=["sqlite", "duckdb"], help="backend das agregações (padrão: DASHBOARD_QUERY_BACKEND)")
+    parser.add_argument("--case", action="append", dest="cases", help="executa apenas este caso (repetível)")
+    parser.add_argument("--out", help="grava o JSON neste arquivo em vez de stdout")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para detectar regressões")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="piora aceitável da mediana (fração)")
+    args = parser.parse_args()
+
+    db_path = args.db or (f"synthetic_data_{args.alerts}.db" if args.alerts else DB_PATH)
+    if not os.path.exists(db_path):
+        if not args.alerts:
+            parser.error(f"banco {db_path} não encontrado")
+        from synthetic_data import build_database
+        # O progresso da geração vai para stderr: stdout é reservado para o JSON
+        with redirect_stdout(sys.stderr):
+            build_database(db_path, args.alerts, verbose=True)
+
+    report = run_benchmark(db_path, args.repeat, args.warmup, args.start, args.end, args.cases, args.backend)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        report["regressions"] = regressions
+        if regressions:
+            print(f"Regressões acima de {args.tolerance:.0%}: {', '.join(regressions)}", file=sys.stderr)
+            exit_code = 1
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
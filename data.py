@@ -0,0 +1,129 @@
+"""
+Carregamento do dataframe desnormalizado de alertas.
+
+O join seleciona apenas as colunas usadas pelo dashboard e pelo PandasAI, e o resultado
+recebe o schema declarado em COLUMN_TYPES: categorias para colunas de baixa cardinalidade,
+datetime64 para datas e inteiros anuláveis reduzidos para IDs.
+"""
+import logging
+
+import pandas as pd
+
+from db import epoch_bounds, read_connection
+
+ALERTS_QUERY = """
+    -- Alertas selecionados primeiro: as recomendações são agregadas só para as chaves
+    -- (paciente, provedor, hospital) desses alertas, pelo índice idx_recommendations_key
+    WITH selected AS (
+        SELECT * FROM alerts a {where}
+    ),
+    recommendation_keys AS (
+        SELECT DISTINCT patient_id, provider_id, hospital_id FROM selected
+    ),
+    -- Recomendações agregadas por chave antes do join: várias recomendações para o mesmo
+    -- paciente/provedor/hospital não podem duplicar a linha do alerta
+    r AS (
+        SELECT k.patient_id, k.provider_id, k.hospital_id,
+               AVG(rec.score) AS recommendation_score,
+               COUNT(*) AS recommendation_count,
+               MAX(rec.date_submitted) AS last_recommendation_date
+        FROM recommendation_keys k
+        JOIN recommendations rec ON rec.patient_id = k.patient_id
+                                AND rec.provider_id = k.provider_id
+                                AND rec.hospital_id = k.hospital_id
+        GROUP BY k.patient_id, k.provider_id, k.hospital_id
+    )
+    SELECT a.alert_id, a.alert_type, a.alert_status, a.description, a.created_at,
+           a.risk_value, a.provider_id, a.patient_id, a.hospital_id,
+           a.is_anomaly, a.anomaly_percentage,
+           p.name AS provider_name, p.type AS provider_type, 
+           pt.name AS patient_name, pt.age AS patient_age,
+           pr.code AS procedure_code, pr.name AS procedure_name,
+           m.code AS material_code, m.name AS material_name, 
+           md.code AS medication_code, md.name AS medication_name, 
+           hs.admission_date, hs.discharge_date, hs.department,
+           ptc.name AS protocol_name, r.recommendation_score,
+           r.recommendation_count, r.last_recommendation_date
+    FROM selected a
+    LEFT JOIN providers p ON a.provider_id = p.provider_id
+    LEFT JOIN patients pt ON a.patient_id = pt.patient_id
+    LEFT JOIN procedures pr ON a.procedure_id = pr.procedure_id
+    LEFT JOIN materials m ON a.material_id = m.material_id
+    LEFT JOIN medications md ON a.medication_id = md.medication_id
+    LEFT JOIN hospitalizations hs ON a.hospitalization_id = hs.hospitalization_id
+    LEFT JOIN protocols ptc ON pr.protocol_id = ptc.protocol_id
+    LEFT JOIN r ON a.patient_id = r.patient_id 
+               AND a.provider_id = r.provider_id 
+               AND a.hospital_id = r.hospital_id
+"""
+
+# Schema declarado do dataframe (colunas fora daqui mantêm o tipo lido do SQLite)
+COLUMN_TYPES = {
+    "alert_id": "Int32",
+    "alert_type": "category",
+    "alert_status": "category",
+    "description": "category",
+    "created_at": "datetime64[ns]",
+    # risk_value continua float64: float32 perde centavos a partir de ~R$ 100 mil
+    "risk_value": "float64",
+    "provider_id": "Int32",
+    "patient_id": "Int32",
+    "hospital_id": "Int32",
+    "is_anomaly": "Int8",
+    "anomaly_percentage": "float32",
+    "provider_type": "category",
+    "patient_age": "Int16",
+    "procedure_code": "category",
+    "procedure_name": "category",
+    "protocol_name": "category",
+    "admission_date": "datetime64[ns]",
+    "discharge_date": "datetime64[ns]",
+    "department": "category",
+    "recommendation_score": "float32",
+    "recommendation_count": "Int16",
+    "last_recommendation_date": "datetime64[ns]",
+}
+
+logger = logging.getLogger("dashboard.data")
+
+
+def convert_column(series, dtype):
+    """Converte uma coluna para o tipo declarado em COLUMN_TYPES."""
+    if dtype.startswith("datetime64"):
+        return pd.to_datetime(series, errors="coerce")
+    if dtype.startswith("Int"):
+        return pd.to_numeric(series, errors="coerce").astype(dtype)
+    return series.astype(dtype)
+
+
+def apply_schema(df, column_types=COLUMN_TYPES):
+    """Converte as colunas para os tipos declarados."""
+    converted = {
+        column: convert_column(df[column], dtype)
+        for column, dtype in column_types.items()
+        if column in df.columns
+    }
+    return df.assign(**converted)
+
+
+def get_data(conn=None, start_date=None, end_date=None):
+    """
+    Carrega o dataframe de alertas. Com start_date/end_date (datas inclusivas), apenas os
+    alertas criados no período são lidos, usando o índice de created_at_epoch.
+    """
+    where, params = "", ()
+    if start_date is not None and end_date is not None:
+        where = "WHERE a.created_at_epoch >= ? AND a.created_at_epoch < ?"
+        params = epoch_bounds(start_date, end_date)
+    if conn is None:
+        with read_connection() as conn:
+            df = pd.read_sql(ALERTS_QUERY.format(where=where), conn, params=params)
+    else:
+        df = pd.read_sql(ALERTS_QUERY.format(where=where), conn, params=params)
+    # Invariante: exatamente uma linha por alerta (coberta por tests/test_data.py)
+    duplicated = df["alert_id"].duplicated()
+    if duplicated.any():
+        logger.warning("get_data() retornou %d linha(s) duplicada(s) por alert_id; mantendo a primeira", duplicated.sum())
+        df = df[~duplicated].reset_index(drop=True)
+
+    return apply_schema(df)
@@ -0,0 +1,192 @@
+"""
+Camada de conexões SQLite do dashboard.
+
+Leituras usam um pool de conexões somente leitura por processo (ConnectionPool), com
+check_same_thread=False: a conexão é retirada do pool durante um bloco
+`with read_connection() as conn:` e devolvida no fim, de modo que o cache de prepared
+statements e o cache de páginas sobrevivem às reexecuções do Streamlit (cada reexecução
+roda em uma thread nova). Abrir conexões nunca altera o arquivo: o medical_data.db versionado
+fica em journal_mode=DELETE, e o modo WAL (leituras não bloqueadas durante cargas de dados)
+é um passo explícito da implantação, `python migrations.py --wal`. Só os caches locais, fora
+do git (llm_cache.db), pedem WAL ao abrir a conexão de escrita. Em um diretório sem
+permissão de escrita o banco é aberto com immutable=1. Todas as conexões recebem
+busy_timeout, mmap_size e cache_size.
+"""
+import calendar
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import os
+import sqlite3
+import threading
+from urllib.parse import quote
+
+DB_PATH = "medical_data.db"
+
+BUSY_TIMEOUT_MS = 5000
+MMAP_SIZE = 256 * 1024 * 1024
+CACHE_SIZE_KIB = 64 * 1024
+STATEMENT_CACHE_SIZE = 256
+# Conexões de leitura simultâneas por banco; além disso as threads esperam uma ser devolvida
+POOL_SIZE = int(os.environ.get("DASHBOARD_DB_POOL_SIZE", "8"))
+
+_pools = {}
+_pools_lock = threading.Lock()
+_wal_lock = threading.Lock()
+_wal_enabled = set()
+
+
+def _configure(conn):
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    # Valor negativo = tamanho em KiB
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+    return conn
+
+
+def is_writable(db_path=DB_PATH):
+    """True quando o banco e o seu diretório (arquivos de journal) aceitam escrita."""
+    return os.access(os.path.dirname(os.path.abspath(db_path)), os.W_OK) and os.access(db_path, os.W_OK)
+
+
+def enable_wal(db_path=DB_PATH):
+    """
+    Grava journal_mode=WAL no arquivo (passo de implantação) e retorna o modo resultante.
+    Bancos sem permissão de escrita continuam no modo atual.
+    """
+    if not is_writable(db_path):
+        return None
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+    try:
+        return conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def connect_read_only(db_path=DB_PATH):
+    """
+    Abre uma conexão somente leitura configurada. Prefira read_connection, que reaproveita
+    as conexões do pool; quem chama esta função deve fechar a conexão.
+    """
+    uri = f"file:{quote(os.path.abspath(db_path))}?mode=ro"
+    if not is_writable(db_path):
+        # Sem escrita no diretório o SQLite não cria os arquivos de lock/WAL: o banco é lido como imutável
+        uri += "&immutable=1"
+    conn = sqlite3.connect(
+        uri,
+        uri=True,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False,
+    )
+    return _configure(conn)
+
+
+class ConnectionPool:
+    """
+    Conexões somente leitura de um banco, compartilhadas entre threads. Cada conexão é usada
+    por uma thread de cada vez (entre a retirada e a devolução); no máximo size ficam abertas.
+    """
+
+    def __init__(self, db_path, size=POOL_SIZE):
+        self.db_path = db_path
+        self._slots = threading.BoundedSemaphore(size)
+        # Pilha: a conexão devolvida por último, com o cache de páginas mais quente, sai primeiro
+        self._idle = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        conn = None
+        try:
+            with self._lock:
+                if self._idle:
+                    conn = self._idle.pop()
+            if conn is None:
+                conn = connect_read_only(self.db_path)
+            yield conn
+        finally:
+            if conn is not None:
+                with self._lock:
+                    self._idle.append(conn)
+            self._slots.release()
+
+
+def get_pool(db_path=DB_PATH):
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _pools[db_path] = ConnectionPool(db_path)
+    return pool
+
+
+def read_connection(db_path=DB_PATH):
+    """
+    Retira uma conexão somente leitura do pool do banco: `with read_connection() as conn:`.
+    A conexão volta ao pool no fim do bloco; não a guarde nem a feche.
+    """
+    return get_pool(db_path).connection()
+
+
+def write_connection(db_path=DB_PATH, wal=False):
+    """
+    Abre uma conexão de escrita de curta duração; quem chama deve fechá-la.
+    wal=True ativa o modo WAL na primeira conexão do processo: use apenas em arquivos locais
+    fora do git, como o cache do LLM.
+    """
+    conn = sqlite3.connect(
+        db_path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    if wal:
+        with _wal_lock:
+            if db_path not in _wal_enabled:
+                # journal_mode=WAL fica gravado no arquivo: basta uma vez por processo
+                conn.execute("PRAGMA journal_mode = WAL")
+                _wal_enabled.add(db_path)
+    return _configure(conn)
+
+
+def get_data_version(db_path=DB_PATH):
+    """
+    Retorna uma impressão digital barata da versão do banco de dados.
+    Usa mtime e tamanho do arquivo principal e do WAL (se existir), que mudam a cada escrita.
+    Um WAL vazio é ignorado: ele é recriado ao abrir conexões, sem alterar os dados.
+    """
+    parts = []
+    for path in (db_path, f"{db_path}-wal"):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        if path != db_path and stat.st_size == 0:
+            continue
+        parts.append(f"{stat.st_mtime_ns}:{stat.st_size}")
+    return "|".join(parts)
+
+
+def period_bounds(start, end):
+    """
+    Converte um período de datas inclusivo em limites ISO semiabertos [início, fim + 1 dia),
+    usados no filtro de created_at do snapshot Arrow. Consultas SQL usam epoch_bounds.
+    """
+    return start.isoformat(), (end + timedelta(days=1)).isoformat()
+
+
+def to_epoch(value):
+    """
+    Segundos desde 1970-01-01 de uma date ou datetime sem fuso, na mesma convenção das
+    colunas <coluna>_epoch (migração 5): o horário gravado é convertido como está.
+    """
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    return calendar.timegm(value.timetuple())
+
+
+def epoch_bounds(start, end):
+    """
+    period_bounds para as colunas epoch: limites inteiros [início, fim + 1 dia) para
+    created_at_epoch >= ? AND created_at_epoch < ?, uma varredura de intervalo no índice.
+    """
+    return to_epoch(start), to_epoch(end + timedelta(days=1))
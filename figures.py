@@ -0,0 +1,187 @@
+"""
+Normalização dos gráficos devolvidos pelo PandasAI.
+
+Qualquer resultado de gráfico (figura Plotly, figura matplotlib, JSON Plotly puro ou entre
+tags <plotly></plotly>, caminho ou conteúdo HTML, imagem) vira um NormalizedFigure com um
+único formato por tipo. Sempre que possível o formato é uma figura Plotly:
+
+- figuras matplotlib viram um PNG (data URI), gerado uma vez por figura: converter com
+  plotly.tools.mpl_to_plotly custa quase o dobro do PNG já aquecido e mais de um segundo
+  na primeira chamada, e o prompt já pede gráficos Plotly ao PandasAI;
+- traces de dispersão com mais de WEBGL_THRESHOLD pontos viram Scattergl (WebGL);
+- listas numéricas viram arrays numpy, que o Plotly envia ao navegador como arrays
+  tipados em base64 em vez de listas JSON;
+- templates padrão expandidos voltam a ser referenciados pelo nome.
+
+O JSON de figuras é interpretado uma vez por conteúdo: o resultado fica em um cache LRU
+indexado pelo hash SHA-256 do texto, de modo que reexibir a mesma resposta (cache de
+respostas, reexecuções do script) não repete o parse e a validação do Plotly. As figuras
+em cache são compartilhadas: nunca modifique-as in-place.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+import base64
+import hashlib
+import io
+import json
+import os
+import threading
+import weakref
+
+import numpy as np
+import plotly.graph_objects as go
+from plotly.basedatatypes import BaseFigure
+import plotly.io as pio
+
+# Mesmo limite do plotly.express para passar a dispersão para WebGL
+WEBGL_THRESHOLD = 1000
+MAX_CACHED_FIGURES = 64
+# Atributos de trace com os dados de cada ponto
+DATA_ATTRIBUTES = ("x", "y", "z", "values", "lat", "lon", "open", "high", "low", "close")
+
+PLOTLY_OPEN_TAG, PLOTLY_CLOSE_TAG = "<plotly>", "</plotly>"
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_templates = None
+# PNG de cada figura matplotlib: a resposta é exibida e serializada para o cache de respostas
+_png_cache = weakref.WeakKeyDictionary()
+
+
+@dataclass
+class NormalizedFigure:
+    # "plotly" (go.Figure), "image" (data URI ou caminho), "html" (conteúdo) ou "text"
+    kind: str
+    data: object
+
+
+def _length(values):
+    if values is None:
+        return 0
+    if isinstance(values, dict) and "bdata" in values:
+        # Array tipado do JSON do Plotly: {"dtype": "f8", "bdata": "<base64>"}
+        return len(base64.b64decode(values["bdata"])) // np.dtype(values["dtype"]).itemsize
+    return len(values)
+
+
+def _registered_templates():
+    global _templates
+    with _cache_lock:
+        if _templates is None:
+            _templates = {name: pio.templates[name].to_plotly_json() for name in pio.templates}
+    return _templates
+
+
+def _template_name(template):
+    """Nome do template registrado igual ao template expandido da figura, se houver."""
+    for name, registered in _registered_templates().items():
+        if registered == template:
+            return name
+    return None
+
+
+def _build(spec):
+    """
+    go.Figure a partir do dicionário da figura, com dispersões grandes em WebGL e listas
+    numéricas como arrays numpy. Um template padrão expandido (como sai do to_json) é
+    trocado pelo nome: validar o template expandido é a parte mais cara de montar a figura.
+    """
+    layout = spec.setdefault("layout", {})
+    if isinstance(layout.get("template"), dict):
+        name = _template_name(layout["template"])
+        if name is not None:
+            layout["template"] = name
+
+    webgl = []
+    for trace in spec.get("data", []):
+        for attribute in DATA_ATTRIBUTES:
+            values = trace.get(attribute)
+            if isinstance(values, list) and values:
+                array = np.asarray(values)
+                if array.dtype.kind in "iuf":
+                    trace[attribute] = array
+        if trace.get("type", "scatter") == "scatter" and max(_length(trace.get("x")), _length(trace.get("y"))) > WEBGL_THRESHOLD:
+            trace["type"] = "scattergl"
+            webgl.append(trace)
+    try:
+        return go.Figure(spec)
+    except ValueError:
+        if not webgl:
+            raise
+        # Algum atributo do trace não existe no Scattergl (line.shape="spline", por exemplo)
+        for trace in webgl:
+            trace["type"] = "scatter"
+        return go.Figure(spec)
+
+
+def _content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def plotly_from_json(text):
+    """go.Figure a partir do JSON Plotly, interpretado uma vez por conteúdo (cache LRU)."""
+    key = _content_hash(text)
+    with _cache_lock:
+        fig = _cache.get(key)
+        if fig is not None:
+            _cache.move_to_end(key)
+            return fig
+    fig = _build(json.loads(text))
+    with _cache_lock:
+        _cache[key] = fig
+        while len(_cache) > MAX_CACHED_FIGURES:
+            _cache.popitem(last=False)
+    return fig
+
+
+def _png_data_uri(figure):
+    """PNG da figura matplotlib como data URI, gerado uma vez por figura."""
+    with _cache_lock:
+        uri = _png_cache.get(figure)
+    if uri is None:
+        buf = io.BytesIO()
+        figure.savefig(buf, format="png", transparent=True)
+        uri = "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode("ascii")
+        with _cache_lock:
+            _png_cache[figure] = uri
+    return uri
+
+
+def _is_html(text):
+    return text.lstrip().lower().startswith(("<html", "<!doctype"))
+
+
+def _normalize_string(value):
+    start, end = value.find(PLOTLY_OPEN_TAG), value.rfind(PLOTLY_CLOSE_TAG)
+    if start != -1 and end > start:
+        try:
+            return NormalizedFigure("plotly", plotly_from_json(value[start + len(PLOTLY_OPEN_TAG):end]))
+        except ValueError:
+            return NormalizedFigure("text", value)
+    if value.startswith("data:image"):
+        return NormalizedFigure("image", value)
+    if _is_html(value):
+        return NormalizedFigure("html", value)
+    if value.lstrip().startswith("{") and '"data"' in value:
+        try:
+            return NormalizedFigure("plotly", plotly_from_json(value))
+        except ValueError:
+            return NormalizedFigure("text", value)
+    if "\n" not in value and os.path.isfile(value):
+        # temp_chart.html/png do PandasAI: o arquivo é sobrescrito a cada gráfico
+        if value.endswith(".html"):
+            with open(value, "r") as f:
+                return NormalizedFigure("html", f.read())
+        return NormalizedFigure("image", value)
+    return NormalizedFigure("text", value)
+
+
+def normalize_figure(value):
+    """NormalizedFigure para o valor de um resultado do PandasAI."""
+    if isinstance(value, BaseFigure):
+        return NormalizedFigure("plotly", _build(value.to_dict()))
+    if hasattr(value, "savefig"):
+        return NormalizedFigure("image", _png_data_uri(value))
+    if isinstance(value, str):
+        return _normalize_string(value)
+    return NormalizedFigure("text", value)
@@ -0,0 +1,15 @@
+"""
+Formatação de valores para exibição no dashboard.
+"""
+
+
+def real_br_money_mask(my_value):
+    a = '{:,.2f}'.format(float(my_value))
+    b = a.replace(',','v')
+    c = b.replace('.',',')
+    return c.replace('v','.')
+
+
+def brl(value):
+    """Valor em reais com o prefixo R$; None vira R$ 0,00."""
+    return f"R$ {real_br_money_mask(value or 0)}"
@@ -0,0 +1,260 @@
+"""
+Insights do painel.
+
+O caminho padrão é build_insights: agregações SQL determinísticas sobre alerts, providers
+e patients, renderizadas em Markdown sem chamar o LLM.
+
+A explicação adicional via LLM é opcional e roda em segundo plano: InsightsWorker gera o
+texto em uma thread separada e grava o resultado em InsightsStore, por chave (versão dos
+dados e período). O script do Streamlit apenas lê o resultado salvo da sua chave, sem
+bloquear a página; uma nova geração é disparada quando a chave ainda não tem resultado,
+quando ele fica mais velho que INSIGHTS_MAX_AGE ou quando o usuário pede uma atualização.
+Sessões em períodos diferentes têm chaves diferentes e não invalidam uma à outra.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+import threading
+import time
+
+from backends import analytics_connection
+from db import epoch_bounds, write_connection
+from formatting import brl
+from llm_cache import CACHE_PATH
+from timing import cache_miss
+
+INSIGHTS_MAX_AGE = 6 * 60 * 60
+# Após uma falha, novas tentativas automáticas esperam este intervalo
+RETRY_AFTER_ERROR = 5 * 60
+# Chaves (versão dos dados e período) mantidas no histórico
+INSIGHTS_HISTORY = 20
+
+
+TOP_N = 3
+
+
+def _period_filter(start_date, end_date, column="created_at_epoch"):
+    """Predicado (AND ...) e parâmetros do período; vazio quando não há período."""
+    if start_date is None or end_date is None:
+        return "", ()
+    return f"AND {column} >= ? AND {column} < ?", epoch_bounds(start_date, end_date)
+
+
+def _top_by_active_alerts(conn, table, key, period, limit=TOP_N):
+    period_sql, period_params = period
+    return conn.execute(
+        f"""
+        SELECT COALESCE(t.name, 'ID ' || a.{key}), COUNT(*), COALESCE(SUM(a.risk_value), 0)
+        FROM alerts a
+        LEFT JOIN {table} t ON t.{key} = a.{key}
+        WHERE a.alert_status = 'Ativo' {period_sql}
+        GROUP BY a.{key}, t.name
+        ORDER BY 2 DESC, 3 DESC
+        LIMIT ?
+        """,
+        (*period_params, limit),
+    ).fetchall()
+
+
+def build_insights(conn, start_date=None, end_date=None):
+    """
+    Calcula os seis insights fixos do painel com SQL e retorna o Markdown.
+    Com start_date/end_date, apenas os alertas criados no período são considerados.
+    """
+    period_sql, period_params = _period_filter(start_date, end_date)
+    total, active, active_risk, active_anomalies, total_anomalies = conn.execute(f"""
+        SELECT COUNT(*),
+               COUNT(CASE WHEN alert_status = 'Ativo' THEN 1 END),
+               COALESCE(SUM(CASE WHEN alert_status = 'Ativo' THEN risk_value END), 0),
+               COALESCE(SUM(CASE WHEN alert_status = 'Ativo' THEN is_anomaly END), 0),
+               COALESCE(SUM(is_anomaly), 0)
+        FROM alerts
+        WHERE 1 = 1 {period_sql}
+    """, period_params).fetchone()
+    if not total:
+        return "Nenhum alerta encontrado no período." if start_date else "Nenhum alerta encontrado."
+
+    lines = []
+    lines.append(
+        f"1. **Alertas ativos:** {active} de {total} alertas ({active / total * 100:.1f}%) estão ativos, "
+        f"somando {brl(active_risk)} em risco."
+    )
+
+    aliased_period = _period_filter(start_date, end_date, "a.created_at_epoch")
+    patients = _top_by_active_alerts(conn, "patients", "patient_id", aliased_period)
+    lines.append(
+        "2. **Pacientes com mais alertas ativos:** "
+        + "; ".join(f"{name} ({count} alertas, {brl(risk)})" for name, count, risk in patients)
+        + "."
+    )
+
+    providers = _top_by_active_alerts(conn, "providers", "provider_id", aliased_period)
+    lines.append(
+        "3. **Provedores com mais alertas ativos:** "
+        + "; ".join(f"{name} ({count} alertas, {brl(risk)})" for name, count, risk in providers)
+        + "."
+    )
+
+    # Concentração de risco: participação dos 10% de provedores com maior risco ativo
+    provider_risks = [
+        row[0]
+        for row in conn.execute(f"""
+            SELECT SUM(risk_value) FROM alerts
+            WHERE alert_status = 'Ativo' {period_sql}
+            GROUP BY provider_id
+            ORDER BY 1 DESC
+        """, period_params)
+    ]
+    if provider_risks and active_risk:
+        top_count = max(1, len(provider_risks) // 10)
+        share = sum(provider_risks[:top_count]) / active_risk * 100
+        lines.append(
+            f"4. **Concentração de risco:** os {top_count} provedores de maior risco (10% dos provedores com alertas ativos) "
+            f"concentram {share:.1f}% do valor em risco ativo ({brl(sum(provider_risks[:top_count]))})."
+        )
+    else:
+        lines.append("4. **Concentração de risco:** não há valor em risco ativo.")
+
+    active_rate = active_anomalies / active * 100 if active else 0
+    lines.append(
+        f"5. **Taxa de anomalias:** {active_rate:.1f}% dos alertas ativos foram confirmados como anomalia "
+        f"({total_anomalies / total * 100:.1f}% considerando todos os alertas)."
+    )
+
+    types = conn.execute(f"""
+        SELECT alert_type, COUNT(*), COALESCE(SUM(risk_value), 0)
+        FROM alerts
+        WHERE alert_status = 'Ativo' {period_sql}
+        GROUP BY alert_type
+        ORDER BY 3 DESC
+    """, period_params).fetchall()
+    if types:
+        mix = "; ".join(
+            f"{alert_type} {count / active * 100:.1f}% ({brl(risk)})" for alert_type, count, risk in types
+        )
+        lines.append(f"6. **Mix de tipos de alerta ativos:** {mix}. O tipo de maior risco é **{types[0][0]}**.")
+    else:
+        lines.append("6. **Mix de tipos de alerta ativos:** não há alertas ativos.")
+
+    return "\n".join(lines)
+
+
+@lru_cache(maxsize=8)
+def get_insights(data_version, start_date=None, end_date=None):
+    """Insights determinísticos, em cache por versão do banco e período."""
+    cache_miss()
+    with analytics_connection() as conn:
+        return build_insights(conn, start_date, end_date)
+
+
+@dataclass(frozen=True)
+class Insights:
+    markdown: str
+    data_version: str
+    generated_at: datetime
+
+
+class InsightsStore:
+    """Guarda os insights gerados no mesmo arquivo SQLite do cache de respostas."""
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        conn = write_connection(path, wal=True)
+        try:
+            with conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS insights (
+                        data_version TEXT PRIMARY KEY,
+                        markdown TEXT NOT NULL,
+                        generated_at REAL NOT NULL
+                    )
+                """)
+        finally:
+            conn.close()
+
+    def _fetch(self, where="", params=()):
+        conn = write_connection(self.path, wal=True)
+        try:
+            row = conn.execute(
+                f"SELECT markdown, data_version, generated_at FROM insights {where} "
+                "ORDER BY generated_at DESC LIMIT 1",
+                params,
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return Insights(row[0], row[1], datetime.fromtimestamp(row[2]))
+
+    def latest(self, data_version):
+        """Insights gerados para a chave (versão dos dados e período), ou None."""
+        return self._fetch("WHERE data_version = ?", (data_version,))
+
+    def newest(self):
+        """Insights mais recentes de qualquer chave, exibidos enquanto a chave atual é gerada."""
+        return self._fetch()
+
+    def save(self, data_version, markdown):
+        conn = write_connection(self.path, wal=True)
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO insights (data_version, markdown, generated_at) VALUES (?, ?, ?)",
+                    (data_version, markdown, time.time()),
+                )
+                # Apenas o histórico recente é útil
+                conn.execute(
+                    "DELETE FROM insights WHERE data_version NOT IN "
+                    "(SELECT data_version FROM insights ORDER BY generated_at DESC LIMIT ?)",
+                    (INSIGHTS_HISTORY,),
+                )
+        finally:
+            conn.close()
+
+
+class InsightsWorker:
+    """
+    Executa a geração de insights em uma thread de fundo, uma de cada vez.
+    job é uma função sem argumentos que retorna o Markdown dos insights.
+    """
+
+    def __init__(self, store, max_age=INSIGHTS_MAX_AGE):
+        self.store = store
+        self.max_age = max_age
+        self.last_error = None
+        self._failed_at = 0.0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def is_stale(self, data_version):
+        latest = self.store.latest(data_version)
+        if latest is None:
+            return True
+        return (datetime.now() - latest.generated_at).total_seconds() > self.max_age
+
+    def request(self, data_version, job, force=False):
+        """Dispara a geração se necessário; retorna True se uma nova execução foi iniciada."""
+        with self._lock:
+            if self.is_running:
+                return False
+            if not force and (
+                time.time() - self._failed_at < RETRY_AFTER_ERROR or not self.is_stale(data_version)
+            ):
+                return False
+            self._thread = threading.Thread(
+                target=self._run, args=(data_version, job), name="insights-worker", daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def _run(self, data_version, job):
+        try:
+            self.store.save(data_version, str(job()))
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            self._failed_at = time.time()
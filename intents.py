@@ -0,0 +1,241 @@
+"""
+Roteador de intenções para perguntas conhecidas.
+
+Antes de enviar uma pergunta ao PandasAI, ela é comparada com um registro de intenções
+(expressões regulares ancoradas sobre o texto normalizado). A pergunta só é roteada quando
+a expressão consome o texto inteiro: um pedido de abertura ("me mostre", "liste", "quais"),
+a frase da intenção, o top-N e o período opcionais. Qualquer qualificador a mais ("do tipo
+Hospital", "de OPME", "em 2024", um nome de paciente) faz a pergunta seguir para o LLM, em vez
+de ser respondida por uma consulta que o ignoraria. Os parâmetros (top-N, período) vêm dos
+grupos da própria expressão e a consulta SQL pré-compilada é executada localmente, junto com
+o template de gráfico quando houver. Sem período na pergunta vale o período selecionado no
+painel.
+
+O resultado tem o mesmo formato do PandasAI ({"type", "value"}) para ser exibido pelo
+StreamlitResponse.
+"""
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+import re
+import unicodedata
+
+import pandas as pd
+import plotly.graph_objects as go
+
+from db import epoch_bounds
+from formatting import brl
+
+
+def normalize(text):
+    """Minúsculas e sem acentos, para casar as expressões independentemente da digitação."""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def _canonical(text):
+    """normalize sem pontuação e com um espaço entre as palavras, para as expressões ancoradas."""
+    return " ".join(re.sub(r"[^\w\s]", " ", normalize(text)).split())
+
+
+# Trechos comuns das expressões: {ASK} abre a pergunta, {TOP} é o top-N opcional antes do
+# substantivo e {PERIOD} o período opcional no fim. Cada expressão usa cada trecho uma vez.
+_ASK = (
+    r"(?:(?:me\s+)?(?:mostre|mostra|liste|listar|exiba|exibir|quais(?:\s+sao)?|qual\s+e|"
+    r"gere|faca|crie)(?:\s+me)?\s+)?"
+)
+_TOP = r"(?:(?:os|as)\s+)?(?:top\s*(?P<top>\d{1,3})\s+|(?P<count>\d{1,3})\s+)?(?:principais\s+|maiores\s+)?"
+_PERIOD = (
+    r"(?:\s+(?:n[oa]s?\s+|d[oa]s?\s+|em\s+)?(?:ultim[oa]s\s+(?P<days>\d{1,4})\s+dias|"
+    r"(?P<month>(?:este|esse|neste|nesse)\s+mes|mes\s+atual)))?"
+)
+
+
+def _pattern(template):
+    return re.compile(template.replace("{ASK}", _ASK).replace("{TOP}", _TOP).replace("{PERIOD}", _PERIOD))
+
+
+def extract_slots(match, today=None):
+    """Extrai top_n e o período (start, end, datas inclusivas) dos grupos da expressão que casou."""
+    today = today or date.today()
+    groups = match.groupdict()
+    slots = {}
+    if groups.get("top") or groups.get("count"):
+        slots["top_n"] = int(groups.get("top") or groups.get("count"))
+    if groups.get("days"):
+        slots["start"], slots["end"] = today - timedelta(days=int(groups["days"])), today
+    elif groups.get("month"):
+        slots["start"], slots["end"] = today.replace(day=1), today
+    return slots
+
+
+def _revenue_loss_table(rows):
+    df = pd.DataFrame(rows, columns=["Tipo de Alerta", "Descrição", "Alertas", "Valor em risco"])
+    df["Valor em risco"] = df["Valor em risco"].map(brl)
+    return df
+
+
+def _patients_table(rows):
+    df = pd.DataFrame(rows, columns=["Paciente", "Alertas", "Valor em risco"])
+    df["Valor em risco"] = df["Valor em risco"].map(brl)
+    return df
+
+
+def _providers_table(rows):
+    df = pd.DataFrame(rows, columns=["Provedor", "Alertas", "Valor em risco"])
+    df["Valor em risco"] = df["Valor em risco"].map(brl)
+    return df
+
+
+def _providers_chart(rows):
+    names = [row[0] for row in rows]
+    counts = [row[1] for row in rows]
+    fig = go.Figure(go.Bar(x=names, y=counts, marker_color="#009C6E", text=counts, textposition="auto"))
+    fig.update_layout(
+        title=f"Top {len(rows)} provedores com mais alertas",
+        xaxis_title="Provedor",
+        yaxis_title="Quantidade de alertas",
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)",
+        height=400,
+        margin=dict(l=20, r=20, t=40, b=20),
+        xaxis=dict(tickangle=-45),
+    )
+    return fig
+
+
+@dataclass(frozen=True)
+class Intent:
+    """
+    Uma pergunta conhecida. patterns são expressões compiladas por _pattern e casadas com
+    fullmatch. sql recebe :limit e, quando há período (da pergunta ou do painel), o
+    predicado de data em {date_filter}. build converte as linhas no valor exibido.
+    """
+    name: str
+    patterns: tuple
+    sql: str
+    build: object
+    result_type: str = "dataframe"
+    defaults: dict = field(default_factory=dict)
+
+    def match(self, text):
+        """Primeira expressão que consome o texto canônico inteiro, ou None."""
+        for pattern in self.patterns:
+            match = pattern.fullmatch(text)
+            if match:
+                return match
+        return None
+
+
+INTENTS = (
+    Intent(
+        name="top_provedores_grafico",
+        patterns=(
+            _pattern(r"{ASK}(?:um\s+)?(?:grafico|visualizacao)(?:\s+de\s+barras)?\s+(?:com|dos|de)\s+{TOP}"
+                     r"(?:provedores|prestadores)\s+com\s+mais\s+alertas{PERIOD}"),
+        ),
+        sql="""
+            SELECT COALESCE(p.name, 'ID ' || a.provider_id), COUNT(*), COALESCE(SUM(a.risk_value), 0)
+            FROM alerts a
+            LEFT JOIN providers p ON p.provider_id = a.provider_id
+            WHERE 1 = 1 {date_filter}
+            GROUP BY a.provider_id, p.name
+            ORDER BY 2 DESC, 3 DESC
+            LIMIT :limit
+        """,
+        build=_providers_chart,
+        result_type="plot",
+        defaults={"top_n": 5},
+    ),
+    Intent(
+        name="top_provedores",
+        patterns=(
+            _pattern(r"{ASK}{TOP}(?:provedores|prestadores)\s+(?:com|(?:que\s+)?(?:tem|geram|possuem))\s+"
+                     r"mais\s+alertas{PERIOD}"),
+        ),
+        sql="""
+            SELECT COALESCE(p.name, 'ID ' || a.provider_id), COUNT(*), COALESCE(SUM(a.risk_value), 0)
+            FROM alerts a
+            LEFT JOIN providers p ON p.provider_id = a.provider_id
+            WHERE 1 = 1 {date_filter}
+            GROUP BY a.provider_id, p.name
+            ORDER BY 2 DESC, 3 DESC
+            LIMIT :limit
+        """,
+        build=_providers_table,
+        defaults={"top_n": 10},
+    ),
+    Intent(
+        name="perda_receita",
+        patterns=(
+            _pattern(r"{ASK}onde\s+(?:eu\s+)?(?:estou|estamos)\s+perdendo\s+(?:mais\s+)?receita{PERIOD}"),
+            _pattern(r"{ASK}{TOP}(?:(?:maior(?:es)?\s+)?perdas?|alertas)\s+(?:de|com\s+(?:mais|maior)\s+perda\s+de)"
+                     r"\s+receita{PERIOD}"),
+        ),
+        sql="""
+            SELECT a.alert_type, a.description, COUNT(*), COALESCE(SUM(a.risk_value), 0)
+            FROM alerts a
+            WHERE a.alert_status = 'Ativo' {date_filter}
+            GROUP BY a.alert_type, a.description
+            ORDER BY 4 DESC
+            LIMIT :limit
+        """,
+        build=_revenue_loss_table,
+        defaults={"top_n": 10},
+    ),
+    Intent(
+        name="usuarios_maior_valor",
+        patterns=(
+            _pattern(r"{ASK}{TOP}(?:usuarios|pacientes|beneficiarios)\s+(?:que\s+geram\s+(?:os\s+)?alertas\s+de|"
+                     r"com\s+(?:os\s+)?alertas\s+de|(?:de|com))\s+(?:maior(?:es)?\s+valor(?:es)?|maior\s+risco)"
+                     r"{PERIOD}"),
+            _pattern(r"{ASK}{TOP}(?:usuarios|pacientes|beneficiarios)\s+mais\s+caros{PERIOD}"),
+        ),
+        sql="""
+            SELECT COALESCE(pt.name, 'ID ' || a.patient_id), COUNT(*), COALESCE(SUM(a.risk_value), 0)
+            FROM alerts a
+            LEFT JOIN patients pt ON pt.patient_id = a.patient_id
+            WHERE 1 = 1 {date_filter}
+            GROUP BY a.patient_id, pt.name
+            ORDER BY 3 DESC
+            LIMIT :limit
+        """,
+        build=_patients_table,
+        defaults={"top_n": 10},
+    ),
+)
+
+
+@dataclass(frozen=True)
+class RoutedQuestion:
+    intent: Intent
+    slots: dict
+
+
+def route_question(question, intents=INTENTS, today=None, period_start=None, period_end=None):
+    """
+    Retorna a intenção cuja expressão consome a pergunta inteira (com os parâmetros
+    extraídos) ou None, e a pergunta segue para o LLM.
+    period_start/period_end (o período do painel) são o filtro de data padrão; um período
+    citado na pergunta ("últimos 30 dias", "este mês") tem precedência.
+    """
+    text = _canonical(question)
+    period = {}
+    if period_start is not None and period_end is not None:
+        period = {"start": period_start, "end": period_end}
+    for intent in intents:
+        match = intent.match(text)
+        if match:
+            slots = {**intent.defaults, **period, **extract_slots(match, today)}
+            return RoutedQuestion(intent, slots)
+    return None
+
+
+def run_intent(routed, conn):
+    """Executa a consulta da intenção e devolve o resultado no formato do PandasAI."""
+    params = {"limit": routed.slots.get("top_n", 10)}
+    date_filter = ""
+    if "start" in routed.slots and "end" in routed.slots:
+        date_filter = "AND a.created_at_epoch >= :start AND a.created_at_epoch < :end"
+        params["start"], params["end"] = epoch_bounds(routed.slots["start"], routed.slots["end"])
+    rows = conn.execute(routed.intent.sql.format(date_filter=date_filter), params).fetchall()
+    return {"type": routed.intent.result_type, "value": routed.intent.build(rows)}
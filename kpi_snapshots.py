@@ -0,0 +1,119 @@
+"""
+KPIs pré-calculados para os períodos mais usados.
+
+Os presets (últimos 7, 30 e 90 dias e mês atual) e seus períodos anteriores são calculados
+quando os dados mudam, logo depois da atualização de alerts_daily (rollup.py), e gravados
+na tabela kpi_snapshots (migração 6) com as datas de cada período. A leitura é uma busca
+pela chave (início, fim): qualquer período igual ao de um preset, inclusive escolhido à mão
+no calendário, usa o snapshot; os demais períodos são calculados na hora por compute_kpis.
+
+O recálculo só acontece quando o estado de alerts_daily (a marca d'água de updated_at_epoch
+e a posição em alerts_day_changes, que registra exclusões e mudanças de created_at) ou o dia
+mudam, de modo que gravar os snapshots (que muda a versão do banco) não dispara um novo
+recálculo.
+
+Uso:
+    python kpi_snapshots.py [--db medical_data.db]
+"""
+import argparse
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from db import DB_PATH, write_connection
+from kpis import KPI_METRICS, KpiValue, compute_kpis, previous_period
+from rollup import CHANGES_NAME, get_watermark
+
+STATE_NAME = "kpi_snapshots"
+
+
+@dataclass(frozen=True)
+class Preset:
+    key: str
+    label: str
+    # Últimos N dias (mesma convenção de intents.py); None = mês atual
+    days: int = None
+
+    def period(self, today=None):
+        today = today or date.today()
+        if self.days is None:
+            return today.replace(day=1), today
+        return today - timedelta(days=self.days), today
+
+
+PRESETS = (
+    Preset("7d", "7 dias", 7),
+    Preset("30d", "30 dias", 30),
+    Preset("90d", "90 dias", 90),
+    Preset("mes", "Mês atual"),
+)
+
+
+def _state(conn, today):
+    # Exclusões e mudanças de created_at só avançam a posição de alerts_day_changes
+    return f"{today.isoformat()}|{get_watermark(conn)}|{get_watermark(conn, CHANGES_NAME)}"
+
+
+def refresh_kpi_snapshots(conn, today=None, presets=PRESETS):
+    """
+    Recalcula os snapshots se o estado de alerts_daily ou o dia mudaram.
+    Retorna o número de presets recalculados (0 quando nada foi escrito).
+    """
+    today = today or date.today()
+    state = _state(conn, today)
+    row = conn.execute("SELECT watermark FROM rollup_state WHERE name = ?", (STATE_NAME,)).fetchone()
+    if row is not None and row[0] == state:
+        return 0
+
+    rows = []
+    for preset in presets:
+        current = preset.period(today)
+        previous = previous_period(*current)
+        for key, value in compute_kpis(conn, current, previous).items():
+            rows.append((current[0].isoformat(), current[1].isoformat(), preset.key, key, value.current, value.previous))
+    with conn:
+        conn.execute("DELETE FROM kpi_snapshots")
+        # Dois presets podem cobrir o mesmo período (mês atual no dia 8 = últimos 7 dias)
+        conn.executemany(
+            "INSERT OR REPLACE INTO kpi_snapshots (start_day, end_day, preset, metric, current, previous) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        conn.execute("INSERT OR REPLACE INTO rollup_state (name, watermark) VALUES (?, ?)", (STATE_NAME, state))
+    return len(presets)
+
+
+def snapshot_kpis(conn, start_date, end_date, metrics=KPI_METRICS):
+    """
+    KPIs do período lidos de kpi_snapshots, no formato de compute_kpis, ou None se o
+    período não tiver snapshot (período personalizado ou snapshots ainda não recalculados).
+    """
+    values = {
+        metric: (current, previous)
+        for metric, current, previous in conn.execute(
+            "SELECT metric, current, previous FROM kpi_snapshots WHERE start_day = ? AND end_day = ?",
+            (start_date.isoformat(), end_date.isoformat()),
+        )
+    }
+    if any(metric.key not in values for metric in metrics):
+        return None
+    return {
+        metric.key: KpiValue(*(metric.kind(value) for value in values[metric.key]), decimals=metric.decimals)
+        for metric in metrics
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalcula os KPIs pré-calculados dos presets de período")
+    parser.add_argument("--db", default=DB_PATH, help="caminho do banco SQLite")
+    args = parser.parse_args()
+
+    conn = write_connection(args.db)
+    try:
+        refreshed = refresh_kpi_snapshots(conn)
+    finally:
+        conn.close()
+    print(f"kpi_snapshots: {refreshed} preset(s) recalculado(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Motor de KPIs dos cartões do dashboard.
+
+Todas as métricas dos dois períodos (atual e anterior) são calculadas em uma única
+varredura da tabela agregada alerts_daily (rollup.py) usando agregação condicional.
+Os períodos são intervalos de dias inclusivos. Para adicionar um novo cartão basta
+declarar um novo Metric em KPI_METRICS; nenhum SQL adicional é necessário.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+
+# Predicados de cada período; {period} nas expressões das métricas é substituído por eles
+PERIODS = {
+    "current": "day BETWEEN :current_start AND :current_end",
+    "previous": "day BETWEEN :previous_start AND :previous_end",
+}
+
+
+@dataclass(frozen=True)
+class Metric:
+    """
+    Definição de uma métrica de KPI.
+    expression é uma agregação SQL sobre alerts_daily em que {period} é o predicado do período,
+    por exemplo "SUM(CASE WHEN {period} THEN risk_sum END)".
+    """
+    key: str
+    expression: str
+    kind: type = float
+    decimals: int = 2
+
+
+@dataclass(frozen=True)
+class KpiValue:
+    current: float
+    previous: float
+    decimals: int = 2
+
+    @property
+    def delta(self):
+        if isinstance(self.current, int) and isinstance(self.previous, int):
+            return self.current - self.previous
+        return round(self.current - self.previous, self.decimals)
+
+
+KPI_METRICS = (
+    Metric("alertas_ativos", "SUM(CASE WHEN {period} THEN alert_count END)", kind=int, decimals=0),
+    Metric(
+        "taxa_confirmacao",
+        "ROUND(SUM(CASE WHEN {period} THEN anomaly_sum END) * 100.0"
+        " / SUM(CASE WHEN {period} THEN alert_count END), 2)",
+    ),
+    Metric("risco_total", "ROUND(SUM(CASE WHEN {period} THEN risk_sum END), 2)"),
+)
+
+# Filtro comum a todos os KPIs
+KPI_FILTER = "alert_status = 'Ativo'"
+
+
+def build_kpi_query(metrics=KPI_METRICS):
+    columns = [
+        f"{metric.expression.format(period=predicate)} AS {metric.key}_{period}"
+        for metric in metrics
+        for period, predicate in PERIODS.items()
+    ]
+    # O intervalo externo cobre os dois períodos para que o índice (alert_status, day) seja usado
+    return (
+        f"SELECT {', '.join(columns)} FROM alerts_daily "
+        f"WHERE {KPI_FILTER} AND day BETWEEN :range_start AND :range_end"
+    )
+
+
+def previous_period(start_date, end_date):
+    """Período anterior com o mesmo número de dias, terminando na véspera de start_date."""
+    period_days = (end_date - start_date).days + 1
+    return start_date - timedelta(days=period_days), start_date - timedelta(days=1)
+
+
+def compute_kpis(conn, current, previous, metrics=KPI_METRICS):
+    """
+    Calcula todas as métricas para os períodos atual e anterior.
+    current e previous são tuplas de datas (início, fim), inclusivas. Retorna {metric.key: KpiValue},
+    com valores já convertidos para o tipo da métrica (None vira 0).
+    """
+    params = {
+        "current_start": current[0].isoformat(),
+        "current_end": current[1].isoformat(),
+        "previous_start": previous[0].isoformat(),
+        "previous_end": previous[1].isoformat(),
+        "range_start": min(current[0], previous[0]).isoformat(),
+        "range_end": max(current[1], previous[1]).isoformat(),
+    }
+    cursor = conn.execute(build_kpi_query(metrics), params)
+    row = dict(zip([column[0] for column in cursor.description], cursor.fetchone()))
+
+    results = {}
+    for metric in metrics:
+        values = [metric.kind(row[f"{metric.key}_{period}"] or 0) for period in PERIODS]
+        results[metric.key] = KpiValue(*values, decimals=metric.decimals)
+    return results
@@ -0,0 +1,49 @@
+"""
+Feed incremental de alertas para a seção "Alertas em Tempo Real".
+
+A cada consulta são lidos apenas os alertas com (updated_at_epoch, alert_id) maior que a
+última marca d'água vista pela sessão, uma varredura de intervalo no índice de
+updated_at_epoch (migração 8); as linhas novas são mescladas ao feed exibido, sem recarregar
+o dataframe completo.
+"""
+FEED_SIZE = 20
+POLL_SECONDS = 10
+MAX_CHANGES_PER_POLL = 500
+
+_FEED_SELECT = "alert_id, alert_type, description, alert_status, updated_at, risk_value, updated_at_epoch"
+# Colunas exibidas (as linhas do feed sem o alert_id e sem updated_at_epoch, a última)
+FEED_COLUMNS = ["Nome", "Descrição", "Status", "Atualizado em", "Valor em risco (BRL)"]
+
+
+def initial_feed(conn, size=FEED_SIZE):
+    """Últimos alertas alterados e a marca d'água (updated_at_epoch, alert_id) correspondente."""
+    rows = conn.execute(
+        f"SELECT {_FEED_SELECT} FROM alerts ORDER BY updated_at_epoch DESC, alert_id DESC LIMIT ?",
+        (size,),
+    ).fetchall()
+    watermark = (rows[0][6], rows[0][0]) if rows else (0, 0)
+    return rows, watermark
+
+
+def fetch_changes(conn, watermark, limit=MAX_CHANGES_PER_POLL):
+    """Alertas criados ou alterados depois da marca d'água, em ordem crescente."""
+    updated_at, alert_id = watermark
+    rows = conn.execute(
+        f"""
+        SELECT {_FEED_SELECT} FROM alerts
+        WHERE updated_at_epoch > :updated_at OR (updated_at_epoch = :updated_at AND alert_id > :alert_id)
+        ORDER BY updated_at_epoch, alert_id
+        LIMIT :limit
+        """,
+        {"updated_at": updated_at, "alert_id": alert_id, "limit": limit},
+    ).fetchall()
+    if rows:
+        watermark = (rows[-1][6], rows[-1][0])
+    return rows, watermark
+
+
+def merge_feed(feed, changes, size=FEED_SIZE):
+    """Mescla as alterações no feed (uma linha por alert_id, mais recentes primeiro)."""
+    by_id = {row[0]: row for row in feed}
+    by_id.update((row[0], row) for row in changes)
+    return sorted(by_id.values(), key=lambda row: (row[6] or 0, row[0]), reverse=True)[:size]
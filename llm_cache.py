@@ -0,0 +1,158 @@
+"""
+Cache persistente (SQLite) das respostas do PandasAI.
+
+A chave combina a pergunta normalizada, a versão dos dados e o modelo/prompt de sistema,
+de forma que perguntas repetidas sobre os mesmos dados não chamam o LLM novamente.
+O valor é o resultado já renderizável (dataframe, figura Plotly em JSON, imagem, HTML ou
+texto), que pode ser reexibido pelo StreamlitResponse. As entradas expiram por TTL e o
+cache é limitado em número de entradas e em bytes (as menos usadas são removidas).
+"""
+import base64
+import hashlib
+import io
+import json
+import os
+import re
+import time
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from db import write_connection
+from figures import normalize_figure, plotly_from_json
+
+CACHE_PATH = "llm_cache.db"
+DEFAULT_TTL = 24 * 60 * 60
+MAX_ENTRIES = 500
+MAX_BYTES = 50 * 1024 * 1024
+
+
+def normalize_question(question):
+    """Normaliza unicode, caixa e espaços para que variações triviais usem a mesma entrada."""
+    text = unicodedata.normalize("NFKC", question).casefold()
+    return re.sub(r"\s+", " ", text).strip().rstrip("?!. ")
+
+
+def make_key(question, data_version, model, system_prompt):
+    payload = json.dumps([normalize_question(question), data_version, model, system_prompt])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _file_as_payload(path):
+    if path.endswith(".html"):
+        with open(path, "r") as f:
+            return "html", f.read()
+    with open(path, "rb") as f:
+        encoded = base64.b64encode(f.read()).decode("ascii")
+    return "image", f"data:image/png;base64,{encoded}"
+
+
+def serialize_result(result):
+    """
+    Converte o resultado do PandasAI ({"type", "value"}) em (tipo, JSON).
+    Retorna None quando o valor não pode ser reproduzido fora do processo.
+    """
+    value = result["value"]
+    if isinstance(value, pd.DataFrame):
+        kind, data = "dataframe", value.to_json(orient="split", date_format="iso")
+    elif hasattr(value, "to_plotly_json") or hasattr(value, "savefig"):
+        # Figura normalizada: template pelo nome e arrays tipados deixam o JSON menor
+        figure = normalize_figure(value)
+        kind, data = ("plotly", figure.data.to_json()) if figure.kind == "plotly" else ("image", figure.data)
+    elif result["type"] == "plot" and isinstance(value, str) and os.path.isfile(value):
+        # Gráficos salvos em arquivo (temp_chart) são sobrescritos: guardamos o conteúdo
+        kind, data = _file_as_payload(value)
+    elif isinstance(value, np.generic):
+        # Escalares numpy (np.int64 de um sum(), por exemplo) não são serializáveis em JSON
+        kind, data = "text", value.item()
+    elif isinstance(value, (str, int, float, bool)) or value is None:
+        kind, data = "text", value
+    else:
+        return None
+    return json.dumps({"type": result["type"], "kind": kind, "data": data})
+
+
+def deserialize_result(payload):
+    entry = json.loads(payload)
+    kind, data = entry["kind"], entry["data"]
+    if kind == "dataframe":
+        value = pd.read_json(io.StringIO(data), orient="split")
+    elif kind == "plotly":
+        # Mesma resposta reexibida: o JSON é interpretado uma vez (cache por conteúdo)
+        value = plotly_from_json(data)
+    else:
+        value = data
+    return {"type": entry["type"], "value": value}
+
+
+class AnswerCache:
+    def __init__(self, path=CACHE_PATH, ttl=DEFAULT_TTL, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        conn = write_connection(path, wal=True)
+        try:
+            with conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS answers (
+                        key TEXT PRIMARY KEY,
+                        payload TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        created_at REAL NOT NULL,
+                        last_access REAL NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_last_access ON answers(last_access)")
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """Retorna o resultado em cache ({"type", "value"}) ou None se ausente/expirado."""
+        now = time.time()
+        conn = write_connection(self.path, wal=True)
+        try:
+            with conn:
+                row = conn.execute("SELECT payload, created_at FROM answers WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                if row[1] + self.ttl < now:
+                    conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+                    return None
+                conn.execute("UPDATE answers SET last_access = ? WHERE key = ?", (now, key))
+        finally:
+            conn.close()
+        return deserialize_result(row[0])
+
+    def set(self, key, result):
+        """Guarda o resultado; retorna False quando ele não é serializável."""
+        payload = serialize_result(result)
+        if payload is None:
+            return False
+        now = time.time()
+        conn = write_connection(self.path, wal=True)
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO answers (key, payload, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                    (key, payload, len(payload), now, now),
+                )
+                self._evict(conn, now)
+        finally:
+            conn.close()
+        return True
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM answers WHERE created_at < ?", (now - self.ttl,))
+        conn.execute(
+            "DELETE FROM answers WHERE key IN "
+            "(SELECT key FROM answers ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        conn.execute(
+            "DELETE FROM answers WHERE key IN (SELECT key FROM "
+            "(SELECT key, SUM(size) OVER (ORDER BY last_access DESC) AS running FROM answers) "
+            "WHERE running > ?)",
+            (self.max_bytes,),
+        )
@@ -0,0 +1,158 @@
+"""
+Contexto compacto para o PandasAI.
+
+Em vez do dataframe desnormalizado inteiro, o LLM recebe tabelas pequenas calculadas uma
+vez por versão do banco e período: resumo por provedor, por paciente, por tipo de alerta e
+por dia, além de uma amostra estratificada por tipo e status. A descrição de cada tabela
+traz o schema das colunas, e o código gerado roda sobre algumas centenas de linhas em vez
+de todos os alertas do período.
+
+Perguntas que dependem de colunas que só existem no nível do alerta (descrição,
+procedimento, medicamento, internação, listagens de alertas) continuam usando o dataframe
+completo; needs_full_data decide qual contexto usar.
+"""
+from dataclasses import dataclass
+import re
+
+import pandas as pd
+from pandasai import SmartDatalake, SmartDataframe
+
+from intents import normalize
+
+# Linhas por combinação tipo x status na amostra estratificada
+SAMPLE_PER_STRATUM = 5
+SAMPLE_SEED = 42
+# Colunas do dataframe do período lidas por build_context_tables
+CONTEXT_COLUMNS = (
+    "alert_id", "alert_type", "alert_status", "created_at", "risk_value",
+    "provider_id", "provider_name", "provider_type", "patient_id", "patient_name",
+)
+ACTIVE_STATUS = "Ativo"
+
+# Termos (sem acentos) que exigem o dataframe completo
+FULL_DATA_TERMS = (
+    "alert_id", "id do alerta", "descricao", "procedimento", "medicamento", "material",
+    "internacao", "departamento", "protocolo", "recomendacao", "hospital", "idade",
+    "anomalia", "liste os alertas", "listar os alertas", "quais alertas", "ultimos alertas",
+)
+
+
+@dataclass
+class ContextTable:
+    name: str
+    description: str
+    frame: pd.DataFrame
+
+
+def needs_full_data(question):
+    """True quando a pergunta cita colunas que só existem no dataframe completo."""
+    normalized = normalize(question)
+    return any(re.search(rf"\b{re.escape(term)}", normalized) for term in FULL_DATA_TERMS)
+
+
+def _schema(frame, columns):
+    return "; ".join(f"{column} ({frame[column].dtype}): {columns[column]}" for column in frame.columns)
+
+
+def _summary(df, keys):
+    """Contagens e valores de risco por chave, com as colunas de ativos separadas."""
+    active = df["alert_status"] == ACTIVE_STATUS
+    work = df[keys + ["alert_id", "risk_value"]].assign(
+        active=active.astype("int32"),
+        active_risk=df["risk_value"].where(active, 0.0),
+    )
+    grouped = work.groupby(keys, observed=True, dropna=False)
+    return pd.DataFrame({
+        "total_alertas": grouped["alert_id"].count(),
+        "alertas_ativos": grouped["active"].sum(),
+        "valor_risco_total": grouped["risk_value"].sum().round(2),
+        "valor_risco_ativo": grouped["active_risk"].sum().round(2),
+        "valor_risco_medio": grouped["risk_value"].mean().round(2),
+    }).reset_index()
+
+
+_SUMMARY_COLUMNS = {
+    "total_alertas": "número de alertas",
+    "alertas_ativos": f"alertas com status '{ACTIVE_STATUS}'",
+    "valor_risco_total": "soma de risk_value em R$",
+    "valor_risco_ativo": "soma de risk_value dos alertas ativos em R$",
+    "valor_risco_medio": "média de risk_value em R$",
+}
+
+
+def build_context_tables(df):
+    """Tabelas do contexto compacto a partir do dataframe do período (schema de data.py)."""
+    providers = _summary(df, ["provider_id", "provider_name", "provider_type"])
+    providers = providers.sort_values("alertas_ativos", ascending=False, ignore_index=True)
+    patients = _summary(df, ["patient_id", "patient_name"])
+    patients = patients.sort_values("alertas_ativos", ascending=False, ignore_index=True)
+
+    types = _summary(df, ["alert_type", "alert_status"])
+
+    days = _summary(df.assign(dia=df["created_at"].dt.normalize()), ["dia"])
+
+    # Amostra estratificada: até SAMPLE_PER_STRATUM alertas de cada combinação tipo x status
+    sample = (
+        df.groupby(["alert_type", "alert_status"], observed=True, group_keys=False)
+        .apply(lambda group: group.sample(min(len(group), SAMPLE_PER_STRATUM), random_state=SAMPLE_SEED))
+        [["alert_id", "alert_type", "alert_status", "created_at", "risk_value",
+          "provider_name", "provider_type", "patient_name"]]
+        .reset_index(drop=True)
+    )
+
+    total = len(df)
+    return [
+        ContextTable(
+            "resumo_provedores",
+            "Um registro por provedor no período, ordenado por alertas ativos. Colunas: "
+            + _schema(providers, {
+                "provider_id": "id do provedor", "provider_name": "nome do provedor",
+                "provider_type": "tipo do provedor", **_SUMMARY_COLUMNS,
+            }),
+            providers,
+        ),
+        ContextTable(
+            "resumo_pacientes",
+            "Um registro por paciente no período, ordenado por alertas ativos. Colunas: "
+            + _schema(patients, {
+                "patient_id": "id do paciente", "patient_name": "nome do paciente", **_SUMMARY_COLUMNS,
+            }),
+            patients,
+        ),
+        ContextTable(
+            "resumo_tipos",
+            "Um registro por tipo e status de alerta no período; some as linhas para totais por tipo "
+            "ou por status. Colunas: "
+            + _schema(types, {
+                "alert_type": "tipo do alerta", "alert_status": "status do alerta", **_SUMMARY_COLUMNS,
+            }),
+            types,
+        ),
+        ContextTable(
+            "resumo_dias",
+            "Um registro por dia de criação dos alertas no período. Colunas: "
+            + _schema(days, {"dia": "data de criação", **_SUMMARY_COLUMNS}),
+            days,
+        ),
+        ContextTable(
+            "amostra_alertas",
+            f"Amostra estratificada por tipo e status de {len(sample)} dos {total} alertas do período, "
+            "apenas para exemplos; use as tabelas de resumo para totais. Colunas: "
+            + _schema(sample, {
+                "alert_id": "id do alerta", "alert_type": "tipo do alerta", "alert_status": "status do alerta",
+                "created_at": "data e hora de criação", "risk_value": "valor de risco em R$",
+                "provider_name": "nome do provedor", "provider_type": "tipo do provedor",
+                "patient_name": "nome do paciente",
+            }),
+            sample,
+        ),
+    ]
+
+
+def compact_datalake(tables, config):
+    """SmartDatalake com as tabelas do contexto compacto, cada uma com nome e descrição."""
+    return SmartDatalake(
+        [SmartDataframe(table.frame, name=table.name, description=table.description, config=config)
+         for table in tables],
+        config=config,
+    )
@@ -0,0 +1,161 @@
+"""
+Respostas do PandasAI em segundo plano, exibidas enquanto são geradas.
+
+O PandasAI pede ao LLM um código Python e só responde depois de executá-lo: o que chega
+token a token é o código, não o texto final. StreamingOpenAI chama o LLM em modo stream
+e repassa cada trecho para a AnswerStream da thread atual; o script mostra o código
+conforme ele chega, e a tabela, o gráfico ou o texto aparecem assim que a execução
+termina.
+
+A pergunta roda em uma thread própria (AnswerStream.start), guardada na sessão entre as
+execuções do script. cancel() interrompe a transmissão do LLM no próximo trecho e encerra
+o processo que executa o código gerado (sandbox.py); um resultado que chegue depois do
+cancelamento é descartado.
+"""
+import threading
+import time
+
+from pandasai.llm import OpenAI
+from pandasai.responses.response_parser import ResponseParser
+
+# Tempo máximo de uma resposta antes do cancelamento automático
+ANSWER_TIMEOUT = 120
+
+STAGE_LABELS = {
+    "aguardando": "Preparando a pergunta...",
+    "gerando": "Gerando o código da resposta...",
+    "executando": "Executando o código gerado...",
+    "concluida": "Resposta pronta",
+    "cancelada": "Resposta cancelada",
+    "erro": "Erro ao gerar a resposta",
+}
+
+_local = threading.local()
+
+
+def current_answer():
+    """AnswerStream executada pela thread atual (None fora de uma resposta)."""
+    return getattr(_local, "answer", None)
+
+
+class AnswerCancelled(Exception):
+    pass
+
+
+class ResultParser(ResponseParser):
+    """Devolve o dicionário {"type", "value"} sem renderizar: a thread da resposta não pode chamar o Streamlit."""
+
+    def parse(self, result):
+        return result
+
+
+class StreamingOpenAI(OpenAI):
+    """
+    OpenAI do PandasAI com a resposta do chat em modo stream. Fora de uma AnswerStream
+    (thread de insights, por exemplo) a chamada é a original, sem stream.
+    """
+
+    def chat_completion(self, value):
+        answer = current_answer()
+        if answer is None:
+            return super().chat_completion(value)
+
+        params = {
+            **self._invocation_params,
+            "messages": [{"role": "system", "content": value}],
+            "stream": True,
+        }
+        if self.stop is not None:
+            params["stop"] = [self.stop]
+
+        # Em uma nova tentativa (código com erro) o PandasAI chama o LLM de novo
+        answer.begin_generation()
+        stream = self.client.create(**params)
+        try:
+            for chunk in stream:
+                if answer.cancelled:
+                    raise AnswerCancelled()
+                if chunk.choices and chunk.choices[0].delta.content:
+                    answer.append(chunk.choices[0].delta.content)
+        finally:
+            stream.close()
+        answer.stage = "executando"
+        return answer.code
+
+
+class AnswerStream:
+    """
+    Uma pergunta ao PandasAI em andamento. O contexto deve usar ResultParser; o resultado
+    ({"type", "value"} ou a mensagem de erro do PandasAI) fica em result. on_result é
+    chamado na thread da resposta com os resultados válidos (para gravar no cache mesmo
+    que o usuário saia da página antes do fim).
+    """
+
+    def __init__(self, key, prompt, on_result=None, timeout=ANSWER_TIMEOUT):
+        self.key = key
+        self.prompt = prompt
+        self.on_result = on_result
+        self.timeout = timeout
+        self.stage = "aguardando"
+        self.code = ""
+        self.result = None
+        self.error = None
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+        self._thread = None
+
+    def start(self, chat):
+        self._thread = threading.Thread(target=self._run, args=(chat,), name="answer-stream", daemon=True)
+        self._thread.start()
+
+    def _run(self, chat):
+        _local.answer = self
+        try:
+            result = chat(self.prompt)
+            if self.cancelled:
+                return
+            self.result = result
+            if isinstance(result, dict):
+                self.stage = "concluida"
+                if self.on_result is not None:
+                    self.on_result(result)
+            else:
+                self.stage = "erro"
+        except Exception as e:
+            if not self.cancelled:
+                self.error = str(e)
+                self.stage = "erro"
+        finally:
+            _local.answer = None
+            self._done.set()
+
+    def begin_generation(self):
+        with self._lock:
+            self.code = ""
+        self.stage = "gerando"
+
+    def append(self, text):
+        with self._lock:
+            self.code += text
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def expired(self):
+        return time.time() - self.started_at > self.timeout
+
+    def cancel(self):
+        self._cancel.set()
+        self.stage = "cancelada"
+
+    def wait(self, timeout):
+        """Espera até timeout segundos pelo fim; retorna True se a resposta terminou."""
+        return self._done.wait(timeout)
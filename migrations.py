@@ -0,0 +1,416 @@
+"""
+Migrações versionadas do schema de medical_data.db.
+
+As tabelas foram criadas por DataFrame.to_sql, sem chaves primárias nem índices.
+Cada migração é aplicada uma única vez e a versão atual fica gravada em PRAGMA user_version.
+
+Uso:
+    python migrations.py                 # aplica as migrações pendentes
+    python migrations.py --explain       # mostra os planos de consulta antes e depois
+    python migrations.py --db outro.db   # usa outro arquivo de banco
+    python migrations.py --wal           # implantação: grava journal_mode=WAL no banco
+
+O arquivo versionado no git fica em journal_mode=DELETE; --wal é um passo da implantação,
+para que leituras não sejam bloqueadas durante cargas de dados.
+"""
+import argparse
+import sqlite3
+
+from db import DB_PATH, enable_wal
+
+# Chave primária de cada tabela
+PRIMARY_KEYS = {
+    "alerts": "alert_id",
+    "providers": "provider_id",
+    "patients": "patient_id",
+    "procedures": "procedure_id",
+    "materials": "material_id",
+    "medications": "medication_id",
+    "hospitalizations": "hospitalization_id",
+    "protocols": "protocol_id",
+    "recommendations": "recommendation_id",
+}
+
+INDEXES = {
+    # Cobre as consultas de KPI (filtro por status + período, agregando is_anomaly e risk_value)
+    "idx_alerts_status_created": "alerts(alert_status, created_at, is_anomaly, risk_value)",
+    "idx_alerts_provider": "alerts(provider_id)",
+    "idx_alerts_patient": "alerts(patient_id)",
+    "idx_alerts_procedure": "alerts(procedure_id)",
+    "idx_alerts_material": "alerts(material_id)",
+    "idx_alerts_medication": "alerts(medication_id)",
+    "idx_alerts_hospitalization": "alerts(hospitalization_id)",
+    "idx_recommendations_key": "recommendations(patient_id, provider_id, hospital_id)",
+}
+
+# Colunas de data/hora gravadas como TEXT; a migração 5 adiciona <coluna>_epoch (INTEGER)
+DATE_COLUMNS = {
+    "alerts": ("created_at", "updated_at"),
+    "patients": ("enrollment_date",),
+    "procedures": ("date_performed",),
+    "materials": ("date_used",),
+    "medications": ("date_administered",),
+    "hospitalizations": ("admission_date", "discharge_date"),
+    "protocols": ("last_updated",),
+    "recommendations": ("date_submitted",),
+}
+
+# Filtros de período usam as colunas epoch; substituem os índices de created_at em TEXT
+EPOCH_INDEXES = {
+    "idx_alerts_status_created_epoch": "alerts(alert_status, created_at_epoch, is_anomaly, risk_value)",
+    "idx_alerts_created_epoch": "alerts(created_at_epoch)",
+    "idx_hospitalizations_admission_epoch": "hospitalizations(admission_date_epoch)",
+    "idx_procedures_performed_epoch": "procedures(date_performed_epoch)",
+}
+
+# Tabelas juntadas a alerts em data.get_data: alterá-las invalida o snapshot (snapshot.py)
+JOINED_TABLES = (
+    "providers", "patients", "procedures", "materials", "medications",
+    "hospitalizations", "protocols", "recommendations",
+)
+
+# Consultas representativas usadas para comparar os planos antes e depois da migração.
+# As variantes em TEXT e em epoch mostram a troca de índices da migração 5.
+CHECK_QUERIES = {
+    "kpi_alertas_ativos": (
+        "SELECT COUNT(*), AVG(is_anomaly), SUM(risk_value) FROM alerts "
+        "WHERE created_at BETWEEN '2025-01-01' AND '2025-12-31' AND alert_status = 'Ativo'"
+    ),
+    "kpi_alertas_ativos_epoch": (
+        "SELECT COUNT(*), AVG(is_anomaly), SUM(risk_value) FROM alerts "
+        "WHERE created_at_epoch >= 1735689600 AND created_at_epoch < 1767225600 AND alert_status = 'Ativo'"
+    ),
+    "marca_dagua_epoch": (
+        "SELECT DISTINCT date(created_at) FROM alerts WHERE updated_at_epoch > 1735689600"
+    ),
+    "join_provedores": (
+        "SELECT a.alert_id, p.name FROM alerts a "
+        "LEFT JOIN providers p ON a.provider_id = p.provider_id"
+    ),
+    "join_recomendacoes": (
+        "SELECT a.alert_id, r.score FROM alerts a "
+        "LEFT JOIN recommendations r ON a.patient_id = r.patient_id "
+        "AND a.provider_id = r.provider_id AND a.hospital_id = r.hospital_id"
+    ),
+}
+
+
+class MigrationError(Exception):
+    pass
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _rebuild_with_primary_key(conn, table, pk):
+    """Recria a tabela com INTEGER PRIMARY KEY, preservando colunas e dados."""
+    columns = conn.execute(f"PRAGMA table_info({_quote(table)})").fetchall()
+    if not columns:
+        return
+    column_defs = []
+    column_names = []
+    for _, name, col_type, _, _, _ in columns:
+        column_names.append(_quote(name))
+        if name == pk:
+            column_defs.append(f"{_quote(name)} INTEGER PRIMARY KEY")
+        elif name.endswith("_id") and col_type.upper() == "REAL":
+            # IDs gravados como REAL por causa de NaN no pandas voltam a ser inteiros
+            column_defs.append(f"{_quote(name)} INTEGER")
+        else:
+            column_defs.append(f"{_quote(name)} {col_type}")
+
+    duplicates = conn.execute(
+        f"SELECT COUNT(*) FROM (SELECT {_quote(pk)} FROM {_quote(table)} "
+        f"GROUP BY {_quote(pk)} HAVING COUNT(*) > 1 OR {_quote(pk)} IS NULL)"
+    ).fetchone()[0]
+    if duplicates:
+        raise MigrationError(f"{table}.{pk} possui {duplicates} valores duplicados ou nulos")
+
+    new_table = _quote(f"{table}__new")
+    cols = ", ".join(column_names)
+    conn.execute(f"CREATE TABLE {new_table} ({', '.join(column_defs)})")
+    conn.execute(f"INSERT INTO {new_table} ({cols}) SELECT {cols} FROM {_quote(table)}")
+    conn.execute(f"DROP TABLE {_quote(table)}")
+    conn.execute(f"ALTER TABLE {new_table} RENAME TO {_quote(table)}")
+
+
+def migration_001_primary_keys(conn):
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table, pk in PRIMARY_KEYS.items():
+        if table in tables:
+            _rebuild_with_primary_key(conn, table, pk)
+
+
+def migration_002_indexes(conn):
+    for name, target in INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+    conn.execute("ANALYZE")
+
+
+def migration_003_alerts_daily(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS alerts_daily (
+            day TEXT NOT NULL,
+            alert_status TEXT,
+            alert_type TEXT,
+            provider_id INTEGER,
+            alert_count INTEGER NOT NULL,
+            risk_sum REAL NOT NULL,
+            anomaly_sum INTEGER NOT NULL,
+            PRIMARY KEY (day, alert_status, alert_type, provider_id)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_daily_status_day ON alerts_daily(alert_status, day)")
+    conn.execute("CREATE TABLE IF NOT EXISTS rollup_state (name TEXT PRIMARY KEY, watermark TEXT)")
+    # Marca d'água incremental e recálculo por dia
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_updated ON alerts(updated_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_created ON alerts(created_at)")
+
+
+def migration_004_alerts_sort(conn):
+    # Ordenação da tabela paginada por valor em risco
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_risk ON alerts(risk_value, alert_id)")
+
+
+def epoch_expression(column):
+    """
+    Segundos desde 1970-01-01 do texto ISO-8601 (data ou data e hora, com espaço ou T).
+    O horário gravado não tem fuso e é convertido como está, o mesmo que db.to_epoch faz
+    com date/datetime sem fuso. Textos em outro formato resultam em NULL.
+    """
+    return f"CAST(strftime('%s', {column}) AS INTEGER)"
+
+
+def migration_005_epoch_columns(conn):
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table, columns in DATE_COLUMNS.items():
+        if table not in tables:
+            continue
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({_quote(table)})")}
+        columns = [column for column in columns if column in existing]
+        if not columns:
+            continue
+        for column in columns:
+            conn.execute(f"ALTER TABLE {_quote(table)} ADD COLUMN {_quote(column + '_epoch')} INTEGER")
+        assignments = ", ".join(f"{_quote(column + '_epoch')} = {epoch_expression(_quote(column))}" for column in columns)
+        conn.execute(f"UPDATE {_quote(table)} SET {assignments}")
+
+        # Gatilhos mantêm as colunas epoch em inserções e alterações feitas por qualquer escritor
+        new_assignments = ", ".join(
+            f"{_quote(column + '_epoch')} = {epoch_expression('NEW.' + _quote(column))}" for column in columns
+        )
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {_quote(f"trg_{table}_epoch_insert")} AFTER INSERT ON {_quote(table)}
+            BEGIN
+                UPDATE {_quote(table)} SET {new_assignments} WHERE rowid = NEW.rowid;
+            END
+        """)
+        for column in columns:
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {_quote(f"trg_{table}_{column}_epoch_update")}
+                AFTER UPDATE OF {_quote(column)} ON {_quote(table)}
+                BEGIN
+                    UPDATE {_quote(table)} SET {_quote(column + '_epoch')} = {epoch_expression('NEW.' + _quote(column))}
+                    WHERE rowid = NEW.rowid;
+                END
+            """)
+
+    for name, target in EPOCH_INDEXES.items():
+        if target.split("(")[0] in tables:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+    conn.execute("DROP INDEX IF EXISTS idx_alerts_status_created")
+    conn.execute("DROP INDEX IF EXISTS idx_alerts_created")
+    conn.execute("ANALYZE")
+
+
+def migration_006_kpi_snapshots(conn):
+    # KPIs pré-calculados dos presets de período (kpi_snapshots.py); estado em rollup_state
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS kpi_snapshots (
+            start_day TEXT NOT NULL,
+            end_day TEXT NOT NULL,
+            preset TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            current REAL,
+            previous REAL,
+            PRIMARY KEY (start_day, end_day, metric)
+        )
+    """)
+
+
+def _log_day_change(day_expression):
+    # Um registro por dia (upsert), com a sequência da alteração mais recente
+    return f"""
+        INSERT INTO alerts_day_changes (day, seq)
+        VALUES (COALESCE({day_expression}, ''), (SELECT COALESCE(MAX(seq), 0) + 1 FROM alerts_day_changes))
+        ON CONFLICT (day) DO UPDATE SET seq = excluded.seq;
+    """
+
+
+def migration_007_alerts_day_changes(conn):
+    # Dias que perderam alertas (created_at alterado ou alerta excluído): a marca d'água de
+    # updated_at só encontra o dia atual de cada alerta. Dia '' = created_at nulo.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS alerts_day_changes (
+            day TEXT PRIMARY KEY,
+            seq INTEGER NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_day_changes_seq ON alerts_day_changes(seq)")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_alerts_created_at_moved AFTER UPDATE OF created_at ON alerts
+        WHEN date(OLD.created_at) IS NOT date(NEW.created_at)
+        BEGIN
+            {_log_day_change("date(OLD.created_at)")}
+            {_log_day_change("date(NEW.created_at)")}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_alerts_deleted AFTER DELETE ON alerts
+        BEGIN
+            {_log_day_change("date(OLD.created_at)")}
+        END
+    """)
+
+
+def migration_008_updated_at_epoch(conn):
+    # Marcas d'água de rollup.py, snapshot.py e live_feed.py em updated_at_epoch
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_updated_epoch ON alerts(updated_at_epoch)")
+    conn.execute("DROP INDEX IF EXISTS idx_alerts_updated")
+    # Marca d'água de alerts_daily (rollup.ROLLUP_NAME) já gravada como texto ISO
+    conn.execute(f"UPDATE rollup_state SET watermark = {epoch_expression('watermark')} WHERE name = 'alerts_daily'")
+    conn.execute("ANALYZE")
+
+
+def migration_009_table_versions(conn):
+    # Versão de cada tabela juntada em get_data, incrementada por gatilhos a cada escrita: o
+    # snapshot reconstrói tudo quando ela muda (o nome de um provedor aparece em vários meses)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    """)
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table in JOINED_TABLES:
+        if table not in tables:
+            continue
+        conn.execute("INSERT OR IGNORE INTO table_versions (name, version) VALUES (?, 0)", (table,))
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {_quote(f"trg_{table}_version_{event.lower()}")}
+                AFTER {event} ON {_quote(table)}
+                BEGIN
+                    UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+                END
+            """)
+
+
+# Lista ordenada de migrações: (versão, descrição, função)
+MIGRATIONS = [
+    (1, "chaves primárias INTEGER em todas as tabelas", migration_001_primary_keys),
+    (2, "índices para KPIs, chaves estrangeiras de alerts e recomendações", migration_002_indexes),
+    (3, "tabela agregada alerts_daily e estado da marca d'água", migration_003_alerts_daily),
+    (4, "índice para ordenar alertas por valor em risco", migration_004_alerts_sort),
+    (5, "colunas epoch (INTEGER) indexadas para as datas gravadas como TEXT", migration_005_epoch_columns),
+    (6, "tabela kpi_snapshots com os KPIs dos presets de período", migration_006_kpi_snapshots),
+    (7, "registro dos dias que perderam alertas, para as atualizações incrementais", migration_007_alerts_day_changes),
+    (8, "índice de updated_at_epoch para as marcas d'água incrementais", migration_008_updated_at_epoch),
+    (9, "versões das tabelas juntadas aos alertas, para invalidar o snapshot", migration_009_table_versions),
+]
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(db_path=DB_PATH, verbose=False):
+    """
+    Aplica as migrações pendentes, cada uma em sua própria transação.
+    Retorna a lista de versões aplicadas.
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    applied = []
+    try:
+        current = get_schema_version(conn)
+        for version, description, func in MIGRATIONS:
+            if version <= current:
+                continue
+            if verbose:
+                print(f"Aplicando migração {version}: {description}")
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                func(conn)
+                conn.execute(f"PRAGMA user_version = {int(version)}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            applied.append(version)
+    finally:
+        conn.close()
+    return applied
+
+
+def explain(conn, query):
+    """Retorna as linhas de EXPLAIN QUERY PLAN como texto."""
+    try:
+        return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}")]
+    except sqlite3.OperationalError as e:
+        # Antes da migração a consulta pode citar colunas que ainda não existem
+        return [f"ERRO: {e}"]
+
+
+def query_plans(db_path=DB_PATH):
+    conn = sqlite3.connect(db_path)
+    try:
+        return {name: explain(conn, query) for name, query in CHECK_QUERIES.items()}
+    finally:
+        conn.close()
+
+
+def full_scans(plans):
+    """Consultas de verificação que ainda fazem varredura completa sem índice."""
+    return {
+        name: [step for step in steps if step.startswith("SCAN") and "INDEX" not in step]
+        for name, steps in plans.items()
+        if any(step.startswith("SCAN") and "INDEX" not in step for step in steps)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aplica as migrações de schema de medical_data.db")
+    parser.add_argument("--db", default=DB_PATH, help="caminho do banco SQLite")
+    parser.add_argument("--explain", action="store_true", help="mostra os planos de consulta antes e depois")
+    parser.add_argument("--wal", action="store_true", help="ativa journal_mode=WAL (passo de implantação)")
+    args = parser.parse_args()
+
+    before = query_plans(args.db) if args.explain else None
+    applied = migrate(args.db, verbose=True)
+    if not applied:
+        print("Nenhuma migração pendente.")
+    if args.wal:
+        print(f"journal_mode: {enable_wal(args.db) or 'inalterado (banco somente leitura)'}")
+    conn = sqlite3.connect(args.db)
+    try:
+        print(f"Versão do schema: {get_schema_version(conn)}")
+    finally:
+        conn.close()
+
+    if args.explain:
+        after = query_plans(args.db)
+        for name in CHECK_QUERIES:
+            print(f"\n== {name}")
+            print("  antes:  " + "\n          ".join(before[name]))
+            print("  depois: " + "\n          ".join(after[name]))
+        # A varredura de alerts no join é esperada (todas as linhas são lidas);
+        # o que importa é que as tabelas do lado direito usem a chave. As consultas em TEXT
+        # ficam sem índice depois da migração 5: só as variantes em epoch são verificadas.
+        remaining = full_scans({name: after[name] for name in ("kpi_alertas_ativos_epoch", "marca_dagua_epoch")})
+        if remaining:
+            print(f"\nATENÇÃO: consultas de KPI ainda com varredura completa: {remaining}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Tabela agregada alerts_daily, mantida de forma incremental.
+
+Cada linha resume os alertas de um dia por status, tipo e provedor (contagem, soma de
+risk_value e soma de is_anomaly). A atualização usa updated_at_epoch (indexado, migração 8)
+como marca d'água: apenas os dias que contêm alertas alterados desde a última execução são
+recalculados.
+Os dias de onde alertas saíram (created_at alterado ou alerta excluído) não aparecem pela
+marca d'água; eles vêm do registro alerts_day_changes, mantido por gatilhos (migração 7).
+Alertas sem created_at (ou com data em formato inválido) não pertencem a nenhum dia e ficam
+fora da tabela. As tabelas são criadas pelas migrações 3 e 7 (migrations.py); a migração 8 converte a marca
+d'água gravada para epoch.
+
+Uso:
+    python rollup.py [--db medical_data.db]
+"""
+import argparse
+from datetime import date
+
+from db import DB_PATH, epoch_bounds, write_connection
+
+ROLLUP_NAME = "alerts_daily"
+# Posição já processada de alerts_day_changes
+CHANGES_NAME = "alerts_daily_changes"
+
+_AGGREGATE = """
+    INSERT INTO alerts_daily (day, alert_status, alert_type, provider_id, alert_count, risk_sum, anomaly_sum)
+    SELECT date(created_at), alert_status, alert_type, provider_id,
+           COUNT(*), COALESCE(SUM(risk_value), 0), COALESCE(SUM(is_anomaly), 0)
+    FROM alerts
+    {where}
+    GROUP BY date(created_at), alert_status, alert_type, provider_id
+"""
+
+
+def get_watermark(conn, name=ROLLUP_NAME):
+    row = conn.execute("SELECT watermark FROM rollup_state WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def day_changes_since(conn, seq):
+    """
+    Dias registrados em alerts_day_changes (migração 7) depois da sequência seq e a maior
+    sequência atual. Dia None = alertas sem created_at.
+    """
+    days = [
+        row[0] or None
+        for row in conn.execute("SELECT day FROM alerts_day_changes WHERE seq > ?", (seq or 0,))
+    ]
+    latest = conn.execute("SELECT MAX(seq) FROM alerts_day_changes").fetchone()[0] or 0
+    return days, latest
+
+
+def _refresh_day(conn, day):
+    if day is None:
+        # Alertas sem data não entram em alerts_daily
+        return
+    conn.execute("DELETE FROM alerts_daily WHERE day = ?", (day,))
+    conn.execute(
+        _AGGREGATE.format(where="WHERE created_at_epoch >= :start AND created_at_epoch < :end"),
+        dict(zip(("start", "end"), epoch_bounds(date.fromisoformat(day), date.fromisoformat(day)))),
+    )
+
+
+def refresh_alerts_daily(conn):
+    """
+    Atualiza alerts_daily a partir da marca d'água de updated_at_epoch e dos dias registrados em
+    alerts_day_changes (dias de onde alertas saíram por mudança de created_at ou exclusão).
+    Na primeira execução a tabela é reconstruída inteira. Retorna o número de dias recalculados
+    (0 quando não há alterações; nesse caso nada é escrito no banco).
+    """
+    watermark = get_watermark(conn)
+    # rollup_state guarda texto; a marca d'água de updated_at_epoch é um inteiro
+    watermark = int(watermark) if watermark is not None else None
+    changes_seq = int(get_watermark(conn, CHANGES_NAME) or 0)
+    new_watermark = conn.execute("SELECT MAX(updated_at_epoch) FROM alerts").fetchone()[0]
+    moved_days, new_changes_seq = day_changes_since(conn, changes_seq)
+    updated = new_watermark is not None and (watermark is None or new_watermark > watermark)
+    if not updated and not moved_days:
+        return 0
+
+    with conn:
+        if watermark is None:
+            conn.execute("DELETE FROM alerts_daily")
+            conn.execute(_AGGREGATE.format(where="WHERE date(created_at) IS NOT NULL"))
+            refreshed = conn.execute("SELECT COUNT(DISTINCT day) FROM alerts_daily").fetchone()[0]
+        else:
+            days = set(moved_days)
+            if updated:
+                days.update(
+                    row[0]
+                    for row in conn.execute(
+                        "SELECT DISTINCT date(created_at) FROM alerts WHERE updated_at_epoch > ?", (watermark,)
+                    )
+                )
+            for day in days:
+                _refresh_day(conn, day)
+            refreshed = len(days)
+        conn.executemany(
+            "INSERT OR REPLACE INTO rollup_state (name, watermark) VALUES (?, ?)",
+            [(ROLLUP_NAME, new_watermark if updated else watermark), (CHANGES_NAME, str(new_changes_seq))],
+        )
+    return refreshed
+
+
+def alert_type_counts(conn, start_date=None, end_date=None):
+    """Contagem de alertas por tipo, lida de alerts_daily (opcionalmente em um período de dias)."""
+    where, params = "", ()
+    if start_date is not None and end_date is not None:
+        where = "WHERE day BETWEEN ? AND ?"
+        params = (start_date.isoformat(), end_date.isoformat())
+    return conn.execute(
+        f"SELECT alert_type, SUM(alert_count) FROM alerts_daily {where} GROUP BY alert_type ORDER BY 2 DESC",
+        params,
+    ).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Atualiza a tabela agregada alerts_daily")
+    parser.add_argument("--db", default=DB_PATH, help="caminho do banco SQLite")
+    args = parser.parse_args()
+
+    conn = write_connection(args.db)
+    try:
+        refreshed = refresh_alerts_daily(conn)
+    finally:
+        conn.close()
+    print(f"alerts_daily: {refreshed} dia(s) recalculado(s)")
+
+
+if __name__ == "__main__":
+    main()
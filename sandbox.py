@@ -0,0 +1,283 @@
+"""
+Execução isolada do código gerado pelo LLM.
+
+O PandasAI executa o código gerado (pandas/Plotly) com exec() no próprio processo do
+Streamlit. Um laço ruim ou um merge cartesiano prende um núcleo ou esgota a memória de
+todas as sessões. IsolatedCodeManager mantém o fluxo do PandasAI (limpeza do código,
+correção de erros pelo LLM) e troca apenas a execução: cada código roda em um processo
+Python separado, que atende um único job e termina, com:
+
+- tempo máximo de parede (SANDBOX_TIMEOUT); o processo é encerrado ao estourar;
+- limite de memória virtual (RLIMIT_AS, SANDBOX_MEMORY_MB): o Linux não aplica limite
+  de RSS, e o de espaço de endereçamento é o que faz um MemoryError acontecer no filho;
+- no máximo SANDBOX_WORKERS jobs simultâneos no servidor (os demais esperam).
+
+WorkerPool mantém SANDBOX_WORKERS processos já iniciados (com pandas, Plotly e PandasAI
+importados) esperando um job; o pool é preenchido ao montar o contexto da pergunta (as
+importações correm enquanto o LLM gera o código) e cada processo usado é substituído ao fim
+do job. Os processos são iniciados com subprocess e não com multiprocessing: o Streamlit
+executa o app.py como __main__, e o multiprocessing reexecutaria o script em cada filho.
+
+O dataframe completo não é copiado para o filho: ele relê o período do snapshot Arrow
+(snapshot.py) com memory-map. As tabelas pequenas do contexto compacto (llm_context.py)
+vão serializadas. O resultado volta no formato do cache de respostas
+(llm_cache.serialize_result) e é exibido pelo StreamlitResponse como uma resposta em cache.
+
+Erros e estouros de tempo ou memória chegam ao PandasAI como exceções, e o fluxo de
+correção dele pede ao LLM um novo código.
+"""
+from dataclasses import dataclass
+from datetime import date
+import os
+import pickle
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+import pandas as pd
+
+from llm_cache import deserialize_result, serialize_result
+from llm_stream import current_answer
+
+SANDBOX_WORKERS = int(os.environ.get("DASHBOARD_SANDBOX_WORKERS", "2"))
+SANDBOX_TIMEOUT = float(os.environ.get("DASHBOARD_SANDBOX_TIMEOUT", "30"))
+SANDBOX_MEMORY_MB = int(os.environ.get("DASHBOARD_SANDBOX_MEMORY_MB", "2048"))
+# Intervalo para verificar cancelamento da resposta enquanto o filho executa
+POLL_SECONDS = 0.2
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+WORKER_COMMAND = [sys.executable, "-c", "import sandbox; sandbox.worker_main()"]
+
+
+class SandboxError(Exception):
+    pass
+
+
+class SandboxTimeout(SandboxError):
+    pass
+
+
+@dataclass
+class FrameSource:
+    """
+    Como o processo filho obtém um dataframe: pelo snapshot Arrow do período
+    (snapshot_dir) ou pelo próprio frame serializado (tabelas pequenas).
+    """
+    frame: pd.DataFrame = None
+    snapshot_dir: str = None
+    start_date: date = None
+    end_date: date = None
+
+    def load(self):
+        if self.snapshot_dir is None:
+            return self.frame
+        from snapshot import load_alerts
+        return load_alerts(start_date=self.start_date, end_date=self.end_date, snapshot_dir=self.snapshot_dir)
+
+
+def snapshot_source(start_date, end_date, snapshot_dir=None):
+    from snapshot import SNAPSHOT_DIR
+    # Caminho absoluto: o processo filho não depende do diretório atual do servidor
+    return FrameSource(snapshot_dir=os.path.abspath(snapshot_dir or SNAPSHOT_DIR),
+                       start_date=start_date, end_date=end_date)
+
+
+def _limit_memory(memory_mb):
+    limit = memory_mb * 1024 ** 2
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _environment(dependencies):
+    """Mesmo ambiente do CodeManager do PandasAI: pd, imports permitidos e builtins da lista branca."""
+    import builtins
+    from pandasai.constants import WHITELISTED_BUILTINS
+    from pandasai.helpers.optional import import_dependency
+
+    environment = {"pd": pd}
+    for lib in dependencies:
+        module = import_dependency(lib["module"])
+        environment[lib["alias"]] = getattr(module, lib["name"]) if hasattr(module, lib["name"]) else module
+    environment["__builtins__"] = {
+        **{name: getattr(builtins, name) for name in WHITELISTED_BUILTINS},
+        "__build_class__": builtins.__build_class__,
+        "__name__": "__main__",
+    }
+    return environment
+
+
+def _payload(result):
+    """Resultado serializado para o pai; valores fora dos tipos do cache viram texto."""
+    payload = serialize_result(result)
+    if payload is None:
+        payload = serialize_result({"type": "string", "value": str(result["value"])})
+    return payload
+
+
+def run_job(code, dependencies, samples, sources, memory_mb):
+    """No processo filho: executa o código nas amostras (como o PandasAI) e depois nos dados."""
+    try:
+        _limit_memory(memory_mb)
+        environment = _environment(dependencies)
+        environment["dfs"] = samples
+        if " = analyze_data(" not in code:
+            code += "\n\nresult = analyze_data(dfs)"
+        exec(code, environment)
+        originals = [source.load() if source is not None else None for source in sources]
+        result = environment["analyze_data"](originals)
+        if not isinstance(result, dict) or "type" not in result or "value" not in result:
+            raise ValueError("analyze_data deve retornar um dicionário com 'type' e 'value'")
+        return "ok", _payload(result)
+    except MemoryError:
+        return "error", f"Limite de memória de {memory_mb} MB excedido ao executar o código"
+    except Exception as e:
+        return "error", f"{type(e).__name__}: {e}"
+
+
+def worker_main():
+    """Entrada do processo filho: lê um job (pickle) da entrada padrão e devolve o resultado."""
+    # O resultado sai por uma cópia da saída padrão; prints do código (e dos módulos) vão para stderr
+    results = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401
+    import plotly.express  # noqa: F401
+
+    try:
+        job = pickle.load(sys.stdin.buffer)
+    except EOFError:
+        # Servidor encerrado antes de enviar um job
+        return
+    pickle.dump(run_job(**job), results)
+    results.close()
+
+
+class WorkerPool:
+    """Processos de execução pré-iniciados; cada um atende um job e é substituído."""
+
+    def __init__(self, size=SANDBOX_WORKERS):
+        self.size = size
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _spawn(self):
+        return subprocess.Popen(WORKER_COMMAND, stdin=subprocess.PIPE, stdout=subprocess.PIPE, cwd=BASE_DIR)
+
+    def _take(self):
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.poll() is None:
+                    return worker
+        return self._spawn()
+
+    def fill(self):
+        """Completa os processos ociosos; cada um importa as bibliotecas em segundo plano."""
+        with self._lock:
+            self._idle = [worker for worker in self._idle if worker.poll() is None]
+            while len(self._idle) < self.size:
+                self._idle.append(self._spawn())
+
+    def run(self, job, timeout, answer=None):
+        while not self._slots.acquire(timeout=POLL_SECONDS):
+            if answer is not None and answer.cancelled:
+                raise SandboxError("Resposta cancelada")
+        try:
+            worker = self._take()
+            started = time.perf_counter()
+            data = pickle.dumps(job)
+            while True:
+                try:
+                    # Repetir communicate após o timeout continua a mesma leitura, sem perder saída;
+                    # a entrada só é passada na primeira chamada
+                    output, _ = worker.communicate(data, timeout=POLL_SECONDS)
+                    break
+                except subprocess.TimeoutExpired:
+                    data = None
+                    if answer is not None and answer.cancelled:
+                        worker.kill()
+                        raise SandboxError("Resposta cancelada")
+                    if time.perf_counter() - started > timeout:
+                        worker.kill()
+                        raise SandboxTimeout(f"O código gerado excedeu o tempo limite de {timeout:.0f} s")
+        finally:
+            self._slots.release()
+            # Reposição depois do job, para não disputar CPU com a execução
+            self.fill()
+        if not output:
+            raise SandboxError(f"O processo de execução terminou inesperadamente (código {worker.returncode})")
+        return pickle.loads(output)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WorkerPool()
+    return _pool
+
+
+def run_isolated(code, dependencies, samples, sources, timeout=SANDBOX_TIMEOUT, memory_mb=SANDBOX_MEMORY_MB):
+    """
+    Executa o código em um processo do WorkerPool e retorna o resultado ({"type", "value"}).
+    Cancelar a AnswerStream da thread encerra o processo.
+    """
+    job = {"code": code, "dependencies": dependencies, "samples": samples, "sources": sources, "memory_mb": memory_mb}
+    status, message = get_pool().run(job, timeout, current_answer())
+    if status == "error":
+        raise SandboxError(message)
+    return deserialize_result(message)
+
+
+def _code_manager_class():
+    # Importação tardia: o processo filho não precisa do CodeManager
+    from pandasai.helpers.code_manager import CodeManager
+    from pandasai.helpers.save_chart import add_save_chart
+    from pandasai.helpers.path import find_project_root
+
+    class IsolatedCodeManager(CodeManager):
+        """CodeManager do PandasAI que executa o código limpo em run_isolated."""
+
+        def __init__(self, dfs, config, logger, sources):
+            super().__init__(dfs=dfs, config=config, logger=logger)
+            self.sources = sources
+
+        def execute_code(self, code, context):
+            # Mesma preparação de CodeManager.execute_code
+            self._current_code_executed = code
+            for middleware in self._middlewares:
+                code = middleware(code)
+            if self._config.save_charts:
+                code = add_save_chart(code, logger=self._logger, file_name=str(context.prompt_id),
+                                      save_charts_path_str=self._config.save_charts_path)
+            else:
+                code = add_save_chart(code, logger=self._logger, file_name="temp_chart",
+                                      save_charts_path_str=find_project_root())
+            context.skills_manager.used_skills = []
+            code_to_run = self._clean_code(code, context)
+            self.last_code_executed = code_to_run
+            self._logger.log(f"\nCode running (isolado):\n```\n{code_to_run}\n```")
+
+            # Só os dataframes citados no código são carregados no processo filho
+            dfs = self._required_dfs(code_to_run)
+            sources = [source if df is not None else None for df, source in zip(dfs, self.sources)]
+            return run_isolated(code_to_run, list(self._additional_dependencies), self._get_samples(dfs), sources)
+
+    return IsolatedCodeManager
+
+
+def isolate(context, sources):
+    """
+    Faz o SmartDataframe/SmartDatalake executar o código gerado em processos isolados.
+    sources traz um FrameSource por dataframe do contexto, na mesma ordem.
+    """
+    lake = getattr(context, "lake", context)
+    lake._code_manager = _code_manager_class()(lake._dfs, lake.config, lake.logger, sources)
+    get_pool().fill()
+    return context
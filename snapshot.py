@@ -0,0 +1,265 @@
+"""
+Snapshot colunar (Arrow IPC) do dataframe desnormalizado de alertas.
+
+O resultado de data.get_data é gravado em arquivos Arrow IPC sem compressão, um por mês
+de created_at (partições hive month=AAAA-MM), com as linhas em ordem de alert_id e as
+colunas já nos tipos de data.COLUMN_TYPES. O carregamento abre o dataset com memory-map
+e lê apenas as colunas e os meses pedidos: as colunas numéricas chegam ao pandas quase sem
+cópia, sem reordenação nem conversão, e o join no SQLite deixa de ser feito a cada início
+a frio.
+
+Como em rollup.py, a atualização usa updated_at_epoch como marca d'água e o registro
+alerts_day_changes (meses de onde alertas saíram): apenas os meses com alertas alterados
+são regravados (cada arquivo é substituído de forma atômica). Uma reconstrução completa, em
+um diretório novo, acontece na primeira execução, com --full, quando SNAPSHOT_FORMAT muda ou
+quando uma tabela juntada aos alertas (provedores, pacientes, recomendações, etc.) muda de
+versão em table_versions (migração 9): o nome de um provedor aparece em todos os meses.
+Depois de uma reconstrução os diretórios alerts-* não referenciados pelo manifesto são
+removidos.
+
+Uso:
+    python snapshot.py [--db medical_data.db] [--full]
+"""
+import argparse
+from datetime import datetime
+import json
+import os
+import shutil
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pyarrow import fs
+
+from data import COLUMN_TYPES, convert_column, get_data
+from db import DB_PATH, get_data_version, period_bounds, read_connection
+from rollup import day_changes_since
+
+SNAPSHOT_DIR = "snapshots"
+MANIFEST_NAME = "manifest.json"
+# Prefixo dos diretórios de dataset (um por reconstrução completa)
+DATASET_PREFIX = "alerts-"
+# Incrementar quando o layout ou o schema do snapshot mudar: força reconstrução completa
+SNAPSHOT_FORMAT = 4
+# Partição das linhas sem created_at
+NO_DATE_MONTH = "0000-00"
+
+_refresh_lock = threading.Lock()
+
+
+def _arrow_type(dtype):
+    """Tipo Arrow fixo para cada dtype do schema de data.py (independe do conteúdo do mês)."""
+    if isinstance(dtype, pd.CategoricalDtype):
+        return pa.dictionary(pa.int32(), pa.string())
+    if isinstance(dtype, pd.api.extensions.ExtensionDtype) and hasattr(dtype, "numpy_dtype"):
+        return pa.from_numpy_dtype(dtype.numpy_dtype)
+    if pd.api.types.is_datetime64_dtype(dtype):
+        return pa.timestamp("ns")
+    if dtype == object:
+        return pa.string()
+    return pa.from_numpy_dtype(dtype)
+
+
+def _arrow_schema(df):
+    return pa.schema([pa.field(column, _arrow_type(dtype)) for column, dtype in df.dtypes.items()])
+
+
+def _months(df):
+    return df["created_at"].dt.strftime("%Y-%m").fillna(NO_DATE_MONTH)
+
+
+def read_manifest(snapshot_dir=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(snapshot_dir, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return manifest if manifest.get("format") == SNAPSHOT_FORMAT else None
+
+
+def _write_manifest(snapshot_dir, manifest):
+    path = os.path.join(snapshot_dir, MANIFEST_NAME)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _write_month(dataset_dir, month, df):
+    """Grava (ou substitui atomicamente) o arquivo de um mês."""
+    partition = os.path.join(dataset_dir, f"month={month}")
+    os.makedirs(partition, exist_ok=True)
+    if not df["alert_id"].is_monotonic_increasing:
+        df = df.sort_values("alert_id", ignore_index=True)
+    table = pa.Table.from_pandas(df, schema=_arrow_schema(df), preserve_index=False)
+    path = os.path.join(partition, "part-0.arrow")
+    # Prefixo "." é ignorado pela descoberta do dataset enquanto o arquivo é escrito
+    tmp_path = os.path.join(partition, ".part-0.arrow.tmp")
+    with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def _month_bounds(month):
+    start = datetime.strptime(month, "%Y-%m").date()
+    end = (start.replace(day=28) + pd.Timedelta(days=4)).replace(day=1) - pd.Timedelta(days=1)
+    return start, end
+
+
+def _table_versions(conn):
+    return dict(conn.execute("SELECT name, version FROM table_versions"))
+
+
+def _full_rebuild(conn, snapshot_dir):
+    """Grava todos os meses em um diretório novo; retorna o diretório e as linhas por mês."""
+    dataset_dir = f"{DATASET_PREFIX}{datetime.now():%Y%m%d%H%M%S%f}"
+    target = os.path.join(snapshot_dir, dataset_dir)
+    df = get_data(conn)
+    month_rows = {}
+    for month, part in df.groupby(_months(df), sort=True):
+        _write_month(target, month, part)
+        month_rows[month] = len(part)
+    return dataset_dir, month_rows
+
+
+def _remove_unreferenced(snapshot_dir, dataset_dir):
+    """
+    Remove os diretórios de dataset que o manifesto não referencia (reconstruções anteriores,
+    inclusive de outro SNAPSHOT_FORMAT ou de um manifesto corrompido). Leitores com memory-map
+    aberto continuam válidos até fecharem os arquivos.
+    """
+    for name in os.listdir(snapshot_dir):
+        if name.startswith(DATASET_PREFIX) and name != dataset_dir:
+            shutil.rmtree(os.path.join(snapshot_dir, name), ignore_errors=True)
+
+
+def _incremental(conn, snapshot_dir, manifest, watermark, moved_days):
+    """Regrava os meses alterados; retorna os meses e as linhas por mês atualizadas."""
+    months = {day[:7] if day else NO_DATE_MONTH for day in moved_days}
+    if watermark is not None:
+        months.update(
+            row[0] or NO_DATE_MONTH
+            for row in conn.execute(
+                "SELECT DISTINCT strftime('%Y-%m', created_at) FROM alerts WHERE updated_at_epoch > ?", (watermark,)
+            )
+        )
+    months = sorted(months)
+    target = os.path.join(snapshot_dir, manifest["dataset_dir"])
+    month_rows = dict(manifest["month_rows"])
+    for month in months:
+        if month == NO_DATE_MONTH:
+            df = get_data(conn)
+            df = df[df["created_at"].isna()]
+        else:
+            df = get_data(conn, *_month_bounds(month))
+        _write_month(target, month, df)
+        month_rows[month] = len(df)
+    return months, month_rows
+
+
+def refresh_snapshot(db_path=DB_PATH, snapshot_dir=SNAPSHOT_DIR, full=False):
+    """
+    Deixa o snapshot em dia com o banco e retorna o manifesto.
+    Não faz nada quando a versão do banco é a mesma da última atualização.
+    """
+    with _refresh_lock:
+        data_version = get_data_version(db_path)
+        manifest = read_manifest(snapshot_dir)
+        if not full and manifest is not None and manifest["data_version"] == data_version:
+            return manifest
+
+        with read_connection(db_path) as conn:
+            watermark = conn.execute("SELECT MAX(updated_at_epoch) FROM alerts").fetchone()[0]
+            moved_days, changes_seq = day_changes_since(conn, manifest and manifest.get("changes_seq"))
+            table_versions = _table_versions(conn)
+            os.makedirs(snapshot_dir, exist_ok=True)
+            rebuild = full or manifest is None or manifest["table_versions"] != table_versions
+            if rebuild:
+                dataset_dir, month_rows = _full_rebuild(conn, snapshot_dir)
+                months = None
+            else:
+                dataset_dir, month_rows = manifest["dataset_dir"], manifest["month_rows"]
+                updated = watermark is not None and (manifest["watermark"] is None or watermark > manifest["watermark"])
+                months = []
+                if updated or moved_days:
+                    months, month_rows = _incremental(
+                        conn, snapshot_dir, manifest, (manifest["watermark"] or 0) if updated else None, moved_days
+                    )
+
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "dataset_dir": dataset_dir,
+            "data_version": data_version,
+            "watermark": watermark,
+            "changes_seq": changes_seq,
+            "table_versions": table_versions,
+            "rows": sum(month_rows.values()),
+            "month_rows": month_rows,
+            "refreshed_months": months,
+            "updated_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        _write_manifest(snapshot_dir, manifest)
+        if rebuild:
+            # Só depois que o manifesto aponta para o novo diretório
+            _remove_unreferenced(snapshot_dir, dataset_dir)
+        return manifest
+
+
+def open_dataset(snapshot_dir=SNAPSHOT_DIR):
+    manifest = read_manifest(snapshot_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"snapshot não encontrado em {snapshot_dir}; execute python snapshot.py")
+    return ds.dataset(
+        os.path.join(snapshot_dir, manifest["dataset_dir"]),
+        format="ipc",
+        partitioning="hive",
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+    )
+
+
+def load_alerts(columns=None, start_date=None, end_date=None, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Lê o snapshot como dataframe no schema de data.COLUMN_TYPES, com as linhas ordenadas
+    por mês e, dentro do mês, por alert_id.
+    columns limita as colunas lidas; start_date/end_date (inclusivas) descartam os meses
+    fora do período sem abri-los e filtram created_at dentro dos meses restantes.
+    """
+    dataset = open_dataset(snapshot_dir)
+    if columns is None:
+        columns = [name for name in dataset.schema.names if name != "month"]
+
+    row_filter = None
+    if start_date is not None and end_date is not None:
+        start, end = (pd.Timestamp(bound) for bound in period_bounds(start_date, end_date))
+        row_filter = (
+            (ds.field("month") >= f"{start_date:%Y-%m}")
+            & (ds.field("month") <= f"{end_date:%Y-%m}")
+            & (ds.field("created_at") >= pa.scalar(start, pa.timestamp("ns")))
+            & (ds.field("created_at") < pa.scalar(end, pa.timestamp("ns")))
+        )
+
+    table = dataset.to_table(columns=columns, filter=row_filter)
+    df = table.to_pandas(split_blocks=True, self_destruct=True)
+    del table
+    # Os metadados do pandas gravados no arquivo restauram os tipos (e to_pandas unifica os
+    # dicionários das partições): só uma coluna que ainda difira do schema é convertida,
+    # no próprio dataframe, sem copiar as demais
+    for column, dtype in COLUMN_TYPES.items():
+        if column in df.columns and df[column].dtype != dtype:
+            df[column] = convert_column(df[column], dtype)
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Atualiza o snapshot Arrow do dataframe de alertas")
+    parser.add_argument("--db", default=DB_PATH, help="caminho do banco SQLite")
+    parser.add_argument("--dir", default=SNAPSHOT_DIR, help="diretório do snapshot")
+    parser.add_argument("--full", action="store_true", help="reconstrói todos os meses")
+    args = parser.parse_args()
+
+    manifest = refresh_snapshot(args.db, args.dir, full=args.full)
+    print(json.dumps(manifest, indent=2))
+
+
+if __name__ == "__main__":
+    main()
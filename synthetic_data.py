@@ -0,0 +1,588 @@
+"""
+Gerador de bancos sintéticos compatíveis com medical_data.db, em escala configurável.
+
+As tabelas têm as mesmas colunas do banco real (já na forma da migração 1, com INTEGER
+PRIMARY KEY) e as demais migrações, a tabela alerts_daily e a marca d'água são aplicadas
+depois da carga, como em produção. As distribuições imitam a amostra real: status
+(~52% ativos), ~71% de anomalias, valor em risco log-normal, alguns provedores e pacientes
+concentrando a maior parte dos alertas e menos movimento nos fins de semana.
+
+As referências são consistentes: um alerta de OPME aponta para um material e para o
+procedimento, provedor e paciente desse material; alertas de procedimento, medicamento e
+internação seguem a mesma lógica. Parte das recomendações usa a mesma chave
+(paciente, provedor, hospital) dos alertas, para que o join de data.get_data encontre linhas.
+
+Uso:
+    python synthetic_data.py --alerts 1000000 --out synthetic_data.db
+    python synthetic_data.py --alerts 10000 --days 90 --end-date 2025-03-07 --seed 7
+"""
+import argparse
+from datetime import date, timedelta
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+from db import write_connection
+from migrations import migrate
+from rollup import refresh_alerts_daily
+
+DEFAULT_PATH = "synthetic_data.db"
+CHUNK_SIZE = 100_000
+
+# Linhas de cada tabela por alerta (com um mínimo para bancos pequenos)
+SCALE = {
+    "providers": (0.02, 50),
+    "patients": (0.2, 100),
+    "hospitalizations": (0.25, 100),
+    "procedures": (0.25, 100),
+    "materials": (0.25, 100),
+    "medications": (0.25, 100),
+    "recommendations": (0.5, 100),
+}
+PROTOCOL_COUNT = 200
+
+# Colunas na mesma ordem do banco real
+SCHEMA = {
+    "alerts": [
+        ("alert_id", "INTEGER PRIMARY KEY"), ("alert_type", "TEXT"), ("alert_status", "TEXT"),
+        ("description", "TEXT"), ("created_at", "TEXT"), ("updated_at", "TEXT"), ("risk_value", "REAL"),
+        ("provider_id", "INTEGER"), ("patient_id", "INTEGER"), ("hospital_id", "INTEGER"),
+        ("procedure_id", "INTEGER"), ("material_id", "INTEGER"), ("medication_id", "INTEGER"),
+        ("hospitalization_id", "INTEGER"), ("is_anomaly", "INTEGER"), ("anomaly_percentage", "REAL"),
+    ],
+    "providers": [
+        ("provider_id", "INTEGER PRIMARY KEY"), ("name", "TEXT"), ("type", "TEXT"), ("specialty", "TEXT"),
+        ("contract_id", "INTEGER"), ("active", "INTEGER"), ("historical_alert_count", "INTEGER"),
+    ],
+    "patients": [
+        ("patient_id", "INTEGER PRIMARY KEY"), ("name", "TEXT"), ("age", "INTEGER"), ("gender", "TEXT"),
+        ("plan_type", "TEXT"), ("enrollment_date", "TEXT"), ("risk_score", "REAL"),
+    ],
+    "procedures": [
+        ("procedure_id", "INTEGER PRIMARY KEY"), ("code", "TEXT"), ("name", "TEXT"), ("standard_cost", "REAL"),
+        ("actual_cost", "REAL"), ("protocol_id", "INTEGER"), ("is_within_protocol", "INTEGER"),
+        ("provider_id", "INTEGER"), ("patient_id", "INTEGER"), ("hospitalization_id", "INTEGER"),
+        ("date_performed", "TEXT"), ("authorization_id", "TEXT"), ("is_repeated", "INTEGER"),
+    ],
+    "materials": [
+        ("material_id", "INTEGER PRIMARY KEY"), ("code", "TEXT"), ("name", "TEXT"), ("category", "TEXT"),
+        ("standard_cost", "REAL"), ("actual_cost", "REAL"), ("provider_id", "INTEGER"), ("patient_id", "INTEGER"),
+        ("procedure_id", "INTEGER"), ("date_used", "TEXT"), ("quantity", "INTEGER"), ("batch_number", "TEXT"),
+        ("is_imported", "INTEGER"), ("similar_usage_24h", "INTEGER"),
+    ],
+    "medications": [
+        ("medication_id", "INTEGER PRIMARY KEY"), ("code", "TEXT"), ("name", "TEXT"), ("dosage", "TEXT"),
+        ("standard_cost", "REAL"), ("actual_cost", "REAL"), ("patient_id", "INTEGER"),
+        ("hospitalization_id", "INTEGER"), ("date_administered", "TEXT"), ("quantity", "INTEGER"),
+        ("is_off_label", "INTEGER"), ("is_high_cost", "INTEGER"),
+    ],
+    "hospitalizations": [
+        ("hospitalization_id", "INTEGER PRIMARY KEY"), ("patient_id", "INTEGER"), ("hospital_id", "INTEGER"),
+        ("admission_date", "TEXT"), ("discharge_date", "TEXT"), ("readmission", "INTEGER"),
+        ("days_since_last_discharge", "REAL"), ("department", "TEXT"), ("is_icu", "INTEGER"),
+        ("total_cost", "REAL"), ("expected_cost", "REAL"), ("length_of_stay", "INTEGER"),
+        ("expected_length_of_stay", "INTEGER"),
+    ],
+    "protocols": [
+        ("protocol_id", "INTEGER PRIMARY KEY"), ("name", "TEXT"), ("description", "TEXT"),
+        ("expected_procedures", "TEXT"), ("expected_materials", "TEXT"), ("expected_medications", "TEXT"),
+        ("expected_hospitalization_days", "INTEGER"), ("diagnosis_code", "TEXT"), ("version", "REAL"),
+        ("last_updated", "TEXT"),
+    ],
+    "recommendations": [
+        ("recommendation_id", "INTEGER PRIMARY KEY"), ("patient_id", "INTEGER"), ("provider_id", "INTEGER"),
+        ("hospital_id", "INTEGER"), ("score", "INTEGER"), ("comments", "TEXT"), ("date_submitted", "TEXT"),
+        ("service_type", "TEXT"), ("would_recommend", "INTEGER"),
+    ],
+}
+
+ALERT_DESCRIPTIONS = {
+    "OPME": [
+        "Alto volume de solicitações do mesmo material em 24h",
+        "Material com preço acima da tabela de referência",
+        "Material utilizado fora do protocolo padrão",
+        "Uso de material importado sem justificativa",
+    ],
+    "Procedimento": [
+        "Múltiplos procedimentos similares em curto período",
+        "Procedimento incompatível com diagnóstico",
+        "Procedimento realizado sem autorização prévia",
+        "Repetição de procedimento fora do protocolo",
+    ],
+    "Medicamento": [
+        "Dosagem acima do recomendado",
+        "Medicamento de alto custo sem justificativa",
+        "Medicamento não coberto pelo plano",
+        "Uso off-label não autorizado",
+    ],
+    "Internação": [
+        "Internação com duração acima do esperado",
+        "Internação em UTI sem indicação clara",
+        "Múltiplas transferências entre departamentos",
+        "Paciente que retorna em menos de 30 dias após alta aparente",
+    ],
+}
+ALERT_TYPES = list(ALERT_DESCRIPTIONS)
+ALERT_STATUSES = (["Ativo", "Em análise", "Resolvido"], [0.52, 0.15, 0.33])
+ANOMALY_RATE = 0.715
+# Fração das anomalias cuja descrição traz o desvio em relação à média histórica
+ANOMALY_DESCRIPTION_RATE = 0.3
+# Mediana do valor em risco por tipo (distribuição log-normal)
+RISK_MEDIAN = {"OPME": 22000, "Procedimento": 12000, "Medicamento": 9000, "Internação": 18000}
+
+PROVIDER_TYPES = ["Centro Diagnóstico", "Clínica", "Hospital", "Laboratório", "Médico"]
+SPECIALTIES = ["Cardiologia", "Dermatologia", "Ginecologia", "Neurologia", "Oftalmologia",
+               "Oncologia", "Ortopedia", "Pediatria", "Psiquiatria", "Urologia"]
+PLAN_TYPES = ["Básico", "Empresarial", "Familiar", "Intermediário", "Premium"]
+MATERIAL_CATEGORIES = ["Cateter", "Implante", "Marca-passo", "Material Especial", "Prótese", "Stent", "Órtese"]
+DEPARTMENTS = ["Cardiologia", "Cirurgia Geral", "Clínica Médica", "Ginecologia", "Neurologia",
+               "Oncologia", "Ortopedia", "Pediatria", "UTI", "Urologia"]
+SERVICE_TYPES = ["Atendimento Geral", "Cirurgia", "Consulta", "Emergência", "Exame", "Internação"]
+FIRST_NAMES = ["Ana", "Bruno", "Caio", "Daniel", "Eduarda", "Fernanda", "Gustavo", "Helena", "Igor", "Julia",
+               "Lucas", "Mariana", "Nicolas", "Otávio", "Paula", "Rafael", "Sofia", "Thiago", "Valentina", "Yago"]
+LAST_NAMES = ["Almeida", "Araújo", "Barbosa", "Cavalcanti", "Costa", "da Cunha", "da Mota", "Ferreira",
+              "Gomes", "Lima", "Martins", "Oliveira", "Pereira", "Ribeiro", "Rocha", "Santos", "Silva", "Souza"]
+COMPANY_SUFFIXES = ["e Filhos", "Ltda.", "S.A.", "Saúde", "Diagnósticos"]
+# Menos alertas nos fins de semana (segunda = 0)
+WEEKDAY_WEIGHTS = [1.0, 1.0, 1.0, 1.0, 0.95, 0.55, 0.45]
+
+
+def table_sizes(alert_count):
+    sizes = {table: max(minimum, int(alert_count * ratio)) for table, (ratio, minimum) in SCALE.items()}
+    sizes["protocols"] = PROTOCOL_COUNT
+    sizes["alerts"] = alert_count
+    return sizes
+
+
+def _skewed_cdf(count, exponent=0.8, rng=None):
+    """
+    CDF de uma distribuição tipo Zipf sobre ids 1..count, com a ordem de popularidade
+    embaralhada: poucos ids concentram muitas ocorrências.
+    """
+    weights = 1.0 / np.arange(1, count + 1) ** exponent
+    if rng is not None:
+        rng.shuffle(weights)
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1]
+
+
+def _pick(rng, cdf, size):
+    """Sorteia ids (a partir de 1) segundo a CDF."""
+    return np.minimum(np.searchsorted(cdf, rng.random(size)), len(cdf) - 1) + 1
+
+
+def _choice(rng, values, size, p=None):
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size=size, p=p)]
+
+
+def _random_days(rng, start, days, size):
+    """Datas (datetime64[D]) entre start e start + days, com menos movimento no fim de semana."""
+    offsets = np.arange(days)
+    weekdays = (np.datetime64(start, "D") + offsets).astype("datetime64[D]").view("int64")
+    # 1970-01-01 foi uma quinta-feira (weekday 3)
+    weights = np.asarray(WEEKDAY_WEIGHTS)[(weekdays + 3) % 7]
+    picked = rng.choice(offsets, size=size, p=weights / weights.sum())
+    return np.datetime64(start, "D") + picked
+
+
+def _date_strings(values):
+    return np.datetime_as_string(values, unit="D").tolist()
+
+
+def _timestamp_strings(values):
+    return np.char.replace(np.datetime_as_string(values, unit="s"), "T", " ").tolist()
+
+
+def _nullable(values, present):
+    return [value if keep else None for value, keep in zip(values.tolist(), present.tolist())]
+
+
+def _money(rng, median, sigma, size, low=100.0, high=100_000.0):
+    return np.round(np.clip(rng.lognormal(np.log(median), sigma, size), low, high), 2)
+
+
+def _names(rng, size):
+    first = _choice(rng, FIRST_NAMES, size)
+    last = _choice(rng, LAST_NAMES, size)
+    return [f"{a} {b}" for a, b in zip(first, last)]
+
+
+def _insert(conn, table, columns):
+    """Insere colunas (listas de mesmo tamanho) na ordem de SCHEMA[table]."""
+    names = [name for name, _ in SCHEMA[table]]
+    placeholders = ", ".join("?" * len(names))
+    conn.executemany(
+        f"INSERT INTO {table} ({', '.join(names)}) VALUES ({placeholders})",
+        zip(*(columns[name] for name in names)),
+    )
+
+
+def _chunks(total):
+    for offset in range(0, total, CHUNK_SIZE):
+        yield offset, min(CHUNK_SIZE, total - offset)
+
+
+class SyntheticDatabase:
+    """
+    Gera as tabelas em blocos de CHUNK_SIZE linhas. As colunas de chave de cada entidade
+    ficam em memória (arrays numpy) para que as tabelas seguintes referenciem linhas válidas.
+    """
+
+    def __init__(self, conn, alert_count, days=365, end_date=None, seed=42):
+        self.conn = conn
+        self.sizes = table_sizes(alert_count)
+        self.days = days
+        self.end_date = end_date or date.today()
+        self.start_date = self.end_date - timedelta(days=days - 1)
+        self.rng = np.random.default_rng(seed)
+
+    def create_schema(self):
+        for table, columns in SCHEMA.items():
+            self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+            self.conn.execute(f"CREATE TABLE {table} ({', '.join(f'{n} {t}' for n, t in columns)})")
+        # O schema já está na forma da migração 1; as demais são aplicadas depois da carga
+        self.conn.execute("PRAGMA user_version = 1")
+
+    def _history_days(self, size, years=2):
+        return _random_days(self.rng, self.start_date - timedelta(days=365 * years), 365 * years + self.days, size)
+
+    def generate_providers(self):
+        rng, count = self.rng, self.sizes["providers"]
+        types = _choice(rng, PROVIDER_TYPES, count)
+        types[0] = "Hospital"
+        is_doctor = types == "Médico"
+        names = _names(rng, count)
+        companies = [f"{name.split()[-1]} {suffix}" for name, suffix in zip(names, _choice(rng, COMPANY_SUFFIXES, count))]
+        _insert(self.conn, "providers", {
+            "provider_id": range(1, count + 1),
+            "name": [f"Dr. {n}" if doctor else c for n, c, doctor in zip(names, companies, is_doctor)],
+            "type": types.tolist(),
+            "specialty": _nullable(_choice(rng, SPECIALTIES, count), is_doctor),
+            "contract_id": rng.integers(10_000, 100_000, count).tolist(),
+            "active": (rng.random(count) < 0.9).astype(int).tolist(),
+            "historical_alert_count": rng.poisson(200, count).tolist(),
+        })
+        self.provider_cdf = _skewed_cdf(count, rng=rng)
+        self.hospital_ids = np.flatnonzero(types == "Hospital") + 1
+
+    def generate_patients(self):
+        rng, count = self.rng, self.sizes["patients"]
+        _insert(self.conn, "patients", {
+            "patient_id": range(1, count + 1),
+            "name": _names(rng, count),
+            "age": np.clip(rng.normal(45, 20, count), 0, 100).astype(int).tolist(),
+            "gender": _choice(rng, ["F", "M"], count).tolist(),
+            "plan_type": _choice(rng, PLAN_TYPES, count).tolist(),
+            "enrollment_date": _date_strings(self._history_days(count, years=5)),
+            "risk_score": np.round(np.clip(rng.lognormal(1.0, 0.7, count), 0, 10), 2).tolist(),
+        })
+        self.patient_cdf = _skewed_cdf(count, rng=rng)
+
+    def generate_protocols(self):
+        rng, count = self.rng, self.sizes["protocols"]
+        codes = [f"{chr(65 + i % 26)}{i % 100:02d}" for i in rng.permutation(2600)[:count]]
+        _insert(self.conn, "protocols", {
+            "protocol_id": range(1, count + 1),
+            "name": [f"Protocolo {code}" for code in codes],
+            "description": [f"Protocolo clínico padrão para o diagnóstico {code}" for code in codes],
+            "expected_procedures": ["[]"] * count,
+            "expected_materials": ["[]"] * count,
+            "expected_medications": ["[]"] * count,
+            "expected_hospitalization_days": rng.integers(1, 30, count).tolist(),
+            "diagnosis_code": codes,
+            "version": np.round(rng.uniform(1, 6, count), 1).tolist(),
+            "last_updated": _date_strings(self._history_days(count)),
+        })
+
+    def generate_hospitalizations(self):
+        rng, count = self.rng, self.sizes["hospitalizations"]
+        self.hospitalization_patient = np.empty(count, dtype=np.int64)
+        self.hospitalization_hospital = np.empty(count, dtype=np.int64)
+        for offset, size in _chunks(count):
+            patients = _pick(rng, self.patient_cdf, size)
+            hospitals = rng.choice(self.hospital_ids, size)
+            self.hospitalization_patient[offset:offset + size] = patients
+            self.hospitalization_hospital[offset:offset + size] = hospitals
+            departments = _choice(rng, DEPARTMENTS, size)
+            expected_stay = rng.integers(2, 15, size)
+            stay = np.maximum(1, np.round(expected_stay * rng.lognormal(0, 0.4, size))).astype(int)
+            admission = self._history_days(size, years=1)
+            readmission = rng.random(size) < 0.1
+            expected_cost = _money(rng, 20_000, 0.6, size, high=500_000)
+            _insert(self.conn, "hospitalizations", {
+                "hospitalization_id": range(offset + 1, offset + size + 1),
+                "patient_id": patients.tolist(),
+                "hospital_id": hospitals.tolist(),
+                "admission_date": _date_strings(admission),
+                "discharge_date": _date_strings(admission + stay),
+                "readmission": readmission.astype(int).tolist(),
+                "days_since_last_discharge": _nullable(rng.integers(1, 90, size).astype(float), readmission),
+                "department": departments.tolist(),
+                "is_icu": (departments == "UTI").astype(int).tolist(),
+                "total_cost": np.round(expected_cost * stay / expected_stay, 2).tolist(),
+                "expected_cost": expected_cost.tolist(),
+                "length_of_stay": stay.tolist(),
+                "expected_length_of_stay": expected_stay.tolist(),
+            })
+        self.hospitalization_cdf = _skewed_cdf(count, exponent=0.5, rng=rng)
+
+    def generate_procedures(self):
+        rng, count = self.rng, self.sizes["procedures"]
+        self.procedure_provider = np.empty(count, dtype=np.int64)
+        self.procedure_patient = np.empty(count, dtype=np.int64)
+        self.procedure_hospitalization = np.empty(count, dtype=np.int64)
+        for offset, size in _chunks(count):
+            hospitalizations = _pick(rng, self.hospitalization_cdf, size)
+            providers = _pick(rng, self.provider_cdf, size)
+            patients = self.hospitalization_patient[hospitalizations - 1]
+            self.procedure_provider[offset:offset + size] = providers
+            self.procedure_patient[offset:offset + size] = patients
+            self.procedure_hospitalization[offset:offset + size] = hospitalizations
+            codes = [f"PROC{n}" for n in rng.integers(10_000, 100_000, size)]
+            standard = _money(rng, 5_000, 0.7, size)
+            _insert(self.conn, "procedures", {
+                "procedure_id": range(offset + 1, offset + size + 1),
+                "code": codes,
+                "name": [f"Procedimento {code}" for code in codes],
+                "standard_cost": standard.tolist(),
+                "actual_cost": np.round(standard * rng.lognormal(0, 0.2, size), 2).tolist(),
+                "protocol_id": rng.integers(1, self.sizes["protocols"] + 1, size).tolist(),
+                "is_within_protocol": (rng.random(size) < 0.8).astype(int).tolist(),
+                "provider_id": providers.tolist(),
+                "patient_id": patients.tolist(),
+                "hospitalization_id": hospitalizations.tolist(),
+                "date_performed": _date_strings(self._history_days(size, years=1)),
+                "authorization_id": [f"AUTH{n}" for n in rng.integers(100_000, 1_000_000, size)],
+                "is_repeated": (rng.random(size) < 0.15).astype(int).tolist(),
+            })
+        self.procedure_cdf = _skewed_cdf(count, exponent=0.5, rng=rng)
+
+    def generate_materials(self):
+        rng, count = self.rng, self.sizes["materials"]
+        self.material_procedure = np.empty(count, dtype=np.int64)
+        for offset, size in _chunks(count):
+            procedures = _pick(rng, self.procedure_cdf, size)
+            self.material_procedure[offset:offset + size] = procedures
+            codes = [f"MAT{n}" for n in rng.integers(10_000, 100_000, size)]
+            categories = _choice(rng, MATERIAL_CATEGORIES, size)
+            standard = _money(rng, 15_000, 0.8, size)
+            _insert(self.conn, "materials", {
+                "material_id": range(offset + 1, offset + size + 1),
+                "code": codes,
+                "name": [f"{category} {code}" for category, code in zip(categories, codes)],
+                "category": categories.tolist(),
+                "standard_cost": standard.tolist(),
+                "actual_cost": np.round(standard * rng.lognormal(0, 0.25, size), 2).tolist(),
+                "provider_id": self.procedure_provider[procedures - 1].tolist(),
+                "patient_id": self.procedure_patient[procedures - 1].tolist(),
+                "procedure_id": procedures.tolist(),
+                "date_used": _date_strings(self._history_days(size, years=1)),
+                "quantity": rng.integers(1, 6, size).tolist(),
+                "batch_number": [f"LOT{n}" for n in rng.integers(10_000, 100_000, size)],
+                "is_imported": (rng.random(size) < 0.3).astype(int).tolist(),
+                "similar_usage_24h": rng.poisson(1.5, size).tolist(),
+            })
+        self.material_cdf = _skewed_cdf(count, exponent=0.5, rng=rng)
+
+    def generate_medications(self):
+        rng, count = self.rng, self.sizes["medications"]
+        self.medication_hospitalization = np.empty(count, dtype=np.int64)
+        for offset, size in _chunks(count):
+            hospitalizations = _pick(rng, self.hospitalization_cdf, size)
+            self.medication_hospitalization[offset:offset + size] = hospitalizations
+            codes = [f"MED{n}" for n in rng.integers(10_000, 100_000, size)]
+            standard = _money(rng, 800, 0.9, size, low=5.0, high=50_000)
+            _insert(self.conn, "medications", {
+                "medication_id": range(offset + 1, offset + size + 1),
+                "code": codes,
+                "name": [f"Medicamento {code}" for code in codes],
+                "dosage": [f"{n}{unit}" for n, unit in zip(rng.integers(5, 1000, size), _choice(rng, ["mg", "mcg", "ml"], size))],
+                "standard_cost": standard.tolist(),
+                "actual_cost": np.round(standard * rng.lognormal(0, 0.2, size), 2).tolist(),
+                "patient_id": self.hospitalization_patient[hospitalizations - 1].tolist(),
+                "hospitalization_id": hospitalizations.tolist(),
+                "date_administered": _date_strings(self._history_days(size, years=1)),
+                "quantity": rng.integers(1, 30, size).tolist(),
+                "is_off_label": (rng.random(size) < 0.1).astype(int).tolist(),
+                "is_high_cost": (standard > 5_000).astype(int).tolist(),
+            })
+        self.medication_cdf = _skewed_cdf(count, exponent=0.5, rng=rng)
+
+    def _alert_links(self, alert_types):
+        """Chaves estrangeiras de cada alerta, derivadas da entidade que o originou."""
+        rng, size = self.rng, len(alert_types)
+        links = {name: np.zeros(size, dtype=np.int64) for name in (
+            "provider_id", "patient_id", "hospital_id", "procedure_id",
+            "material_id", "medication_id", "hospitalization_id")}
+
+        opme = alert_types == "OPME"
+        materials = _pick(rng, self.material_cdf, opme.sum())
+        procedures = self.material_procedure[materials - 1]
+        links["material_id"][opme] = materials
+        links["procedure_id"][opme] = procedures
+        links["provider_id"][opme] = self.procedure_provider[procedures - 1]
+        links["patient_id"][opme] = self.procedure_patient[procedures - 1]
+
+        procedure = alert_types == "Procedimento"
+        procedures = _pick(rng, self.procedure_cdf, procedure.sum())
+        links["procedure_id"][procedure] = procedures
+        links["hospitalization_id"][procedure] = self.procedure_hospitalization[procedures - 1]
+        links["provider_id"][procedure] = self.procedure_provider[procedures - 1]
+        links["patient_id"][procedure] = self.procedure_patient[procedures - 1]
+
+        medication = alert_types == "Medicamento"
+        medications = _pick(rng, self.medication_cdf, medication.sum())
+        links["medication_id"][medication] = medications
+        links["hospitalization_id"][medication] = self.medication_hospitalization[medications - 1]
+
+        hospitalization = alert_types == "Internação"
+        links["hospitalization_id"][hospitalization] = _pick(rng, self.hospitalization_cdf, hospitalization.sum())
+
+        # Medicamento e internação: paciente e hospital vêm da internação, provedor é o responsável
+        from_stay = medication | hospitalization
+        stays = links["hospitalization_id"][from_stay]
+        links["patient_id"][from_stay] = self.hospitalization_patient[stays - 1]
+        links["provider_id"][from_stay] = _pick(rng, self.provider_cdf, from_stay.sum())
+
+        has_stay = links["hospitalization_id"] > 0
+        links["hospital_id"][has_stay] = self.hospitalization_hospital[links["hospitalization_id"][has_stay] - 1]
+        links["hospital_id"][~has_stay] = rng.choice(self.hospital_ids, (~has_stay).sum())
+        return links
+
+    def generate_alerts(self):
+        rng, count = self.rng, self.sizes["alerts"]
+        recommendation_count = self.sizes["recommendations"]
+        recommendations_per_alert = recommendation_count / count
+        next_recommendation = 1
+        for offset, size in _chunks(count):
+            alert_types = _choice(rng, ALERT_TYPES, size)
+            statuses = _choice(rng, ALERT_STATUSES[0], size, p=ALERT_STATUSES[1])
+            is_anomaly = rng.random(size) < ANOMALY_RATE
+            anomaly_percentage = np.where(is_anomaly, np.round(rng.uniform(10, 100, size), 2), 0.0)
+            with_deviation = is_anomaly & (rng.random(size) < ANOMALY_DESCRIPTION_RATE)
+            choices = rng.integers(0, 4, size)
+            descriptions = [
+                (f"Valor {pct:g}% acima da média histórica: " if deviation else "") + ALERT_DESCRIPTIONS[t][c]
+                for t, c, pct, deviation in zip(alert_types, choices, anomaly_percentage, with_deviation)
+            ]
+            medians = np.asarray([RISK_MEDIAN[t] for t in alert_types])
+            risk = np.round(np.clip(medians * rng.lognormal(0, 0.8, size), 500, 100_000), 2)
+
+            created = (
+                _random_days(rng, self.start_date, self.days, size).astype("datetime64[s]")
+                + rng.integers(6 * 3600, 22 * 3600, size).astype("timedelta64[s]")
+            )
+            updated = created + np.minimum(rng.exponential(6 * 3600, size), 30 * 86400).astype("timedelta64[s]")
+            links = self._alert_links(alert_types)
+
+            columns = {
+                "alert_id": range(offset + 1, offset + size + 1),
+                "alert_type": alert_types.tolist(),
+                "alert_status": statuses.tolist(),
+                "description": descriptions,
+                "created_at": _timestamp_strings(created),
+                "updated_at": _timestamp_strings(updated),
+                "risk_value": risk.tolist(),
+                "is_anomaly": is_anomaly.astype(int).tolist(),
+                "anomaly_percentage": anomaly_percentage.tolist(),
+            }
+            for name, values in links.items():
+                columns[name] = _nullable(values, values > 0)
+            _insert(self.conn, "alerts", columns)
+
+            # Recomendações: 70% com a mesma chave de algum alerta do bloco, o restante aleatório
+            target = min(recommendation_count, round((offset + size) * recommendations_per_alert)) - next_recommendation + 1
+            if target > 0:
+                self._insert_recommendations(next_recommendation, target, links)
+                next_recommendation += target
+
+    def _insert_recommendations(self, first_id, size, links):
+        rng = self.rng
+        from_alert = rng.random(size) < 0.7
+        rows = rng.integers(0, len(links["patient_id"]), size)
+        patients = np.where(from_alert, links["patient_id"][rows], _pick(rng, self.patient_cdf, size))
+        providers = np.where(from_alert, links["provider_id"][rows], _pick(rng, self.provider_cdf, size))
+        hospitals = np.where(from_alert, links["hospital_id"][rows], rng.choice(self.hospital_ids, size))
+        scores = rng.integers(0, 11, size)
+        _insert(self.conn, "recommendations", {
+            "recommendation_id": range(first_id, first_id + size),
+            "patient_id": patients.tolist(),
+            "provider_id": providers.tolist(),
+            "hospital_id": hospitals.tolist(),
+            "score": scores.tolist(),
+            "comments": _choice(rng, ["Atendimento adequado.", "Demora no atendimento.", "Equipe atenciosa.",
+                                      "Cobrança questionada.", "Sem observações."], size).tolist(),
+            "date_submitted": _date_strings(_random_days(rng, self.start_date, self.days, size)),
+            "service_type": _choice(rng, SERVICE_TYPES, size).tolist(),
+            "would_recommend": (scores >= 7).astype(int).tolist(),
+        })
+
+    def generate(self, verbose=False):
+        steps = [
+            ("providers", self.generate_providers),
+            ("patients", self.generate_patients),
+            ("protocols", self.generate_protocols),
+            ("hospitalizations", self.generate_hospitalizations),
+            ("procedures", self.generate_procedures),
+            ("materials", self.generate_materials),
+            ("medications", self.generate_medications),
+            ("alerts", self.generate_alerts),
+        ]
+        self.create_schema()
+        for table, step in steps:
+            started = time.perf_counter()
+            with self.conn:
+                step()
+            if verbose:
+                print(f"{table}: {self.sizes[table]} linhas em {time.perf_counter() - started:.1f}s")
+
+
+def build_database(path, alert_count, days=365, end_date=None, seed=42, verbose=False):
+    """
+    Cria (ou substitui) o banco em path, aplica as migrações e preenche alerts_daily.
+    Retorna o número de linhas de cada tabela.
+    """
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    conn = sqlite3.connect(path)
+    try:
+        # Carga em lote: sem journal nem fsync; o banco é descartável até o fim da geração
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        generator = SyntheticDatabase(conn, alert_count, days=days, end_date=end_date, seed=seed)
+        generator.generate(verbose=verbose)
+    finally:
+        conn.close()
+
+    # Índices depois da carga (bem mais rápido) e tabela agregada
+    migrate(path, verbose=verbose)
+    conn = write_connection(path)
+    try:
+        refresh_alerts_daily(conn)
+    finally:
+        conn.close()
+    return generator.sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um banco sintético compatível com medical_data.db")
+    parser.add_argument("--alerts", type=int, default=10_000, help="quantidade de alertas (ex.: 10000, 1000000)")
+    parser.add_argument("--out", default=DEFAULT_PATH, help="arquivo SQLite de saída (é sobrescrito)")
+    parser.add_argument("--days", type=int, default=365, help="dias de histórico de alertas")
+    parser.add_argument("--end-date", type=date.fromisoformat, default=None, help="último dia dos alertas (AAAA-MM-DD)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    sizes = build_database(args.out, args.alerts, days=args.days, end_date=args.end_date, seed=args.seed, verbose=True)
+    print(json.dumps(sizes, indent=2))
+    print(f"Banco gerado em {args.out} ({os.path.getsize(args.out) / 1024 ** 2:.1f} MB) em {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
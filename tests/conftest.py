@@ -0,0 +1,51 @@
+"""
+Fixtures compartilhadas: bancos SQLite pequenos no schema de synthetic_data.py, com todas as
+migrações aplicadas, como os bancos reais.
+"""
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migrations import migrate  # noqa: E402
+from synthetic_data import SCHEMA  # noqa: E402
+
+# Valores das colunas de alerts que os testes não informam
+ALERT_DEFAULTS = {"alert_type": "OPME", "alert_status": "Ativo", "risk_value": 100.0, "is_anomaly": 0}
+
+
+def _insert(conn, table, rows):
+    for row in rows:
+        columns = ", ".join(row)
+        placeholders = ", ".join("?" for _ in row)
+        conn.execute(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", tuple(row.values()))
+
+
+def create_database(path, **tables):
+    """
+    Cria o banco em path com as linhas de cada tabela (listas de dicionários coluna -> valor;
+    as colunas omitidas ficam NULL) e aplica as migrações. Alertas recebem ALERT_DEFAULTS e,
+    sem updated_at, o próprio created_at.
+    """
+    conn = sqlite3.connect(path)
+    try:
+        for table, columns in SCHEMA.items():
+            conn.execute(f"CREATE TABLE {table} ({', '.join(f'{name} {kind}' for name, kind in columns)})")
+        for table, rows in tables.items():
+            if table == "alerts":
+                rows = [{**ALERT_DEFAULTS, "updated_at": row.get("created_at"), **row} for row in rows]
+            _insert(conn, table, rows)
+        conn.commit()
+    finally:
+        conn.close()
+    migrate(path)
+    return path
+
+
+@pytest.fixture
+def make_db(tmp_path):
+    """Fábrica de bancos: make_db(alerts=[...], recommendations=[...]) -> caminho."""
+    return lambda **tables: create_database(str(tmp_path / "medical_data.db"), **tables)
@@ -0,0 +1,98 @@
+"""
+Testes de data.get_data: uma linha por alerta, com as recomendações agregadas por
+(paciente, provedor, hospital).
+"""
+from datetime import date
+import os
+import sqlite3
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data import get_data  # noqa: E402
+from migrations import migrate  # noqa: E402
+from synthetic_data import SCHEMA  # noqa: E402
+
+ALERTS = [
+    # alert_id, created_at, patient_id, provider_id, hospital_id
+    (1, "2025-03-01 10:00:00", 10, 20, 30),
+    (2, "2025-03-02 11:00:00", 10, 20, 30),
+    (3, "2025-03-07 09:30:00", 11, 20, 30),
+    (4, "2025-03-08 08:00:00", 12, 21, 31),
+]
+
+RECOMMENDATIONS = [
+    # recommendation_id, patient_id, provider_id, hospital_id, score, date_submitted
+    (1, 10, 20, 30, 2, "2025-01-01"),
+    (2, 10, 20, 30, 4, "2025-03-05"),
+    (3, 10, 20, 30, 9, "2025-02-01"),
+    (4, 11, 20, 30, 7, "2025-02-10"),
+    (5, 11, 20, 30, 8, "2025-02-11"),
+    # Mesmo paciente e provedor, outro hospital: não pode entrar na chave (10, 20, 30)
+    (6, 10, 20, 99, 1, "2025-04-01"),
+]
+
+
+@pytest.fixture
+def conn(tmp_path):
+    path = str(tmp_path / "medical_data.db")
+    db = sqlite3.connect(path)
+    for table, columns in SCHEMA.items():
+        db.execute(f"CREATE TABLE {table} ({', '.join(f'{name} {kind}' for name, kind in columns)})")
+    db.executemany(
+        "INSERT INTO alerts (alert_id, alert_type, alert_status, created_at, updated_at, risk_value, "
+        "patient_id, provider_id, hospital_id, is_anomaly) VALUES (?, 'OPME', 'Ativo', ?, ?, 100.0, ?, ?, ?, 0)",
+        [(alert_id, created_at, created_at, *key) for alert_id, created_at, *key in ALERTS],
+    )
+    db.executemany(
+        "INSERT INTO recommendations (recommendation_id, patient_id, provider_id, hospital_id, score, date_submitted) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        RECOMMENDATIONS,
+    )
+    db.commit()
+    db.close()
+    migrate(path)
+
+    db = sqlite3.connect(path)
+    yield db
+    db.close()
+
+
+def test_uma_linha_por_alerta(conn):
+    df = get_data(conn)
+
+    assert len(df) == len(ALERTS)
+    assert df["alert_id"].is_unique
+    assert sorted(df["alert_id"]) == [alert_id for alert_id, *_ in ALERTS]
+
+
+def test_recomendacoes_agregadas_por_chave(conn):
+    df = get_data(conn).set_index("alert_id")
+
+    for alert_id in (1, 2):
+        assert df.loc[alert_id, "recommendation_score"] == pytest.approx(5.0)
+        assert df.loc[alert_id, "recommendation_count"] == 3
+        assert df.loc[alert_id, "last_recommendation_date"] == pd.Timestamp("2025-03-05")
+
+    assert df.loc[3, "recommendation_score"] == pytest.approx(7.5)
+    assert df.loc[3, "recommendation_count"] == 2
+    assert df.loc[3, "last_recommendation_date"] == pd.Timestamp("2025-02-11")
+
+    # Alerta sem recomendações para a chave
+    assert pd.isna(df.loc[4, "recommendation_score"])
+    assert pd.isna(df.loc[4, "recommendation_count"])
+    assert pd.isna(df.loc[4, "last_recommendation_date"])
+
+
+def test_periodo_inclusivo(conn):
+    df = get_data(conn, date(2025, 3, 2), date(2025, 3, 7))
+
+    assert sorted(df["alert_id"]) == [2, 3]
+    assert df["alert_id"].is_unique
+    # Recomendações agregadas só para as chaves dos alertas do período, com os mesmos valores
+    df = df.set_index("alert_id")
+    assert df.loc[2, "recommendation_count"] == 3
+    assert df.loc[3, "recommendation_score"] == pytest.approx(7.5)
@@ -0,0 +1,65 @@
+"""
+Testes de db.to_epoch e db.epoch_bounds: mesma convenção de strftime('%s') das colunas
+<coluna>_epoch, com o dia final inclusivo.
+"""
+from datetime import date, datetime
+import sqlite3
+import time
+
+import pytest
+
+from db import epoch_bounds, to_epoch
+
+ALERTS = [
+    {"alert_id": 1, "created_at": "2025-02-28 23:59:59"},
+    {"alert_id": 2, "created_at": "2025-03-01 00:00:00"},
+    {"alert_id": 3, "created_at": "2025-03-07 23:59:59"},
+    {"alert_id": 4, "created_at": "2025-03-08 00:00:00"},
+]
+
+
+@pytest.mark.parametrize("value", [
+    "2025-03-01 00:00:00",
+    # Horário que não existe nos fusos com horário de verão (EUA): sem fuso, não há lacuna
+    "2025-03-09 02:30:15",
+    "2024-02-29 12:00:00",
+])
+def test_to_epoch_igual_ao_sqlite(value):
+    expected = sqlite3.connect(":memory:").execute("SELECT CAST(strftime('%s', ?) AS INTEGER)", (value,)).fetchone()[0]
+
+    assert to_epoch(datetime.fromisoformat(value)) == expected
+
+
+def test_to_epoch_de_date():
+    assert to_epoch(date(1970, 1, 2)) == 86400
+    assert to_epoch(date(2025, 3, 1)) == to_epoch(datetime(2025, 3, 1, 0, 0))
+
+
+def test_to_epoch_independe_do_fuso_local(monkeypatch):
+    expected = to_epoch(datetime(2025, 3, 1, 12, 0))
+    monkeypatch.setenv("TZ", "America/Sao_Paulo")
+    time.tzset()
+    try:
+        assert to_epoch(datetime(2025, 3, 1, 12, 0)) == expected
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+
+def test_epoch_bounds_dia_final_inclusivo(make_db):
+    conn = sqlite3.connect(make_db(alerts=ALERTS))
+    try:
+        rows = conn.execute(
+            "SELECT alert_id FROM alerts WHERE created_at_epoch >= ? AND created_at_epoch < ? ORDER BY alert_id",
+            epoch_bounds(date(2025, 3, 1), date(2025, 3, 7)),
+        ).fetchall()
+    finally:
+        conn.close()
+
+    assert [row[0] for row in rows] == [2, 3]
+
+
+def test_epoch_bounds_um_dia():
+    start, end = epoch_bounds(date(2025, 3, 1), date(2025, 3, 1))
+
+    assert end - start == 86400
@@ -0,0 +1,78 @@
+"""
+Testes do roteador de intenções: só perguntas consumidas inteiramente por uma expressão são
+roteadas, com top-N e período extraídos; o resto segue para o PandasAI.
+"""
+from datetime import date
+import sqlite3
+
+import pytest
+
+from intents import route_question, run_intent
+
+TODAY = date(2025, 3, 8)
+
+
+@pytest.mark.parametrize("question, name, slots", [
+    # Exemplos da tela inicial
+    ("Me mostre onde eu estou perdendo mais receita", "perda_receita", {"top_n": 10}),
+    ("Liste os usuários que geram alertas de maior valor", "usuarios_maior_valor", {"top_n": 10}),
+    ("Faça um gráfico com os 5 provedores com mais alertas", "top_provedores_grafico", {"top_n": 5}),
+    ("Quais os 3 provedores com mais alertas?", "top_provedores", {"top_n": 3}),
+    ("Top 20 pacientes mais caros", "usuarios_maior_valor", {"top_n": 20}),
+    ("Quais provedores têm mais alertas nos últimos 30 dias?", "top_provedores",
+     {"top_n": 10, "start": date(2025, 2, 6), "end": TODAY}),
+    ("Onde estamos perdendo receita este mês", "perda_receita",
+     {"top_n": 10, "start": date(2025, 3, 1), "end": TODAY}),
+])
+def test_perguntas_roteadas(question, name, slots):
+    routed = route_question(question, today=TODAY)
+
+    assert routed is not None
+    assert routed.intent.name == name
+    assert routed.slots == slots
+
+
+@pytest.mark.parametrize("question", [
+    # Qualificadores que as consultas pré-compiladas ignorariam
+    "Quais provedores do tipo Hospital têm mais alertas de OPME?",
+    "gráfico de pizza com a especialidade dos provedores",
+    "receita perdida pelo paciente João em 2024",
+    "pacientes com menor valor e não com maior valor",
+    "Quais os 5 provedores com mais alertas resolvidos?",
+    "Me mostre onde eu estou perdendo mais receita com medicamentos",
+    "Liste os 6 principais insights sobre os dados",
+])
+def test_perguntas_nao_roteadas(question):
+    assert route_question(question, today=TODAY) is None
+
+
+def test_periodo_do_painel_e_padrao():
+    routed = route_question("Quais provedores com mais alertas", period_start=date(2025, 1, 1), period_end=date(2025, 1, 31))
+    assert (routed.slots["start"], routed.slots["end"]) == (date(2025, 1, 1), date(2025, 1, 31))
+
+    # O período citado na pergunta tem precedência
+    routed = route_question("Quais provedores com mais alertas este mês", today=TODAY,
+                            period_start=date(2025, 1, 1), period_end=date(2025, 1, 31))
+    assert (routed.slots["start"], routed.slots["end"]) == (date(2025, 3, 1), TODAY)
+
+
+def test_run_intent_filtra_periodo(make_db):
+    path = make_db(
+        alerts=[
+            {"alert_id": 1, "created_at": "2025-03-01 10:00:00", "provider_id": 1},
+            {"alert_id": 2, "created_at": "2025-03-07 23:59:59", "provider_id": 1},
+            {"alert_id": 3, "created_at": "2025-03-07 09:00:00", "provider_id": 2},
+            {"alert_id": 4, "created_at": "2025-03-08 00:00:00", "provider_id": 2},
+            {"alert_id": 5, "created_at": "2025-02-28 23:59:59", "provider_id": 2},
+        ],
+        providers=[{"provider_id": 1, "name": "Hospital A"}, {"provider_id": 2, "name": "Clínica B"}],
+    )
+    routed = route_question("Quais os 5 provedores com mais alertas", period_start=date(2025, 3, 1), period_end=date(2025, 3, 7))
+    conn = sqlite3.connect(path)
+    try:
+        result = run_intent(routed, conn)
+    finally:
+        conn.close()
+
+    assert result["type"] == "dataframe"
+    assert result["value"][["Provedor", "Alertas"]].values.tolist() == [["Hospital A", 2], ["Clínica B", 1]]
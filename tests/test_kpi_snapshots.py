@@ -0,0 +1,91 @@
+"""
+Testes de kpi_snapshots: o snapshot de um preset acompanha alterações, exclusões e mudanças
+de created_at dos alertas.
+"""
+from datetime import date
+import sqlite3
+
+import pytest
+
+from kpi_snapshots import PRESETS, refresh_kpi_snapshots, snapshot_kpis
+from kpis import compute_kpis, previous_period
+from rollup import refresh_alerts_daily
+
+TODAY = date(2025, 3, 8)
+# Últimos 7 dias: 2025-03-01 a 2025-03-08
+PERIOD = PRESETS[0].period(TODAY)
+
+ALERTS = [
+    {"alert_id": 1, "created_at": "2025-03-05 10:00:00", "risk_value": 1000.0, "is_anomaly": 1},
+    {"alert_id": 2, "created_at": "2025-03-06 11:00:00", "risk_value": 250.5},
+    {"alert_id": 3, "created_at": "2025-03-07 09:30:00", "risk_value": 80.25, "is_anomaly": 1},
+    {"alert_id": 4, "created_at": "2025-03-07 12:00:00", "risk_value": 500.0, "alert_status": "Resolvido"},
+    {"alert_id": 5, "created_at": "2025-02-25 08:00:00", "risk_value": 40.0},
+]
+
+
+@pytest.fixture
+def conn(make_db):
+    db = sqlite3.connect(make_db(alerts=ALERTS))
+    refresh_alerts_daily(db)
+    refresh_kpi_snapshots(db, today=TODAY)
+    yield db
+    db.close()
+
+
+def _refresh(conn):
+    refresh_alerts_daily(conn)
+    return refresh_kpi_snapshots(conn, today=TODAY)
+
+
+def _live(conn):
+    return compute_kpis(conn, PERIOD, previous_period(*PERIOD))
+
+
+def test_snapshot_igual_ao_calculo(conn):
+    kpis = snapshot_kpis(conn, *PERIOD)
+
+    assert kpis == _live(conn)
+    assert kpis["alertas_ativos"].current == 3
+    assert kpis["alertas_ativos"].previous == 1
+    assert kpis["risco_total"].current == pytest.approx(1330.75)
+
+
+def test_sem_alteracoes_nao_recalcula(conn):
+    assert _refresh(conn) == 0
+
+
+def test_alteracao_recalcula(conn):
+    conn.execute("UPDATE alerts SET risk_value = 2000.0, updated_at = '2025-03-08 10:00:00' WHERE alert_id = 1")
+    conn.commit()
+
+    assert _refresh(conn) == len(PRESETS)
+    assert snapshot_kpis(conn, *PERIOD)["risco_total"].current == pytest.approx(2330.75)
+
+
+def test_exclusao_recalcula(conn):
+    # A exclusão não move a marca d'água de updated_at: só alerts_day_changes registra o dia
+    conn.execute("DELETE FROM alerts WHERE alert_id = 1")
+    conn.commit()
+
+    assert _refresh(conn) == len(PRESETS)
+    kpis = snapshot_kpis(conn, *PERIOD)
+    assert kpis == _live(conn)
+    assert kpis["alertas_ativos"].current == 2
+    assert kpis["risco_total"].current == pytest.approx(330.75)
+
+
+def test_created_at_movido_recalcula(conn):
+    # Mesmo updated_at: apenas o dia do alerta muda, para o período anterior
+    conn.execute("UPDATE alerts SET created_at = '2025-02-22 10:00:00' WHERE alert_id = 2")
+    conn.commit()
+
+    assert _refresh(conn) == len(PRESETS)
+    kpis = snapshot_kpis(conn, *PERIOD)
+    assert kpis == _live(conn)
+    assert kpis["alertas_ativos"].current == 2
+    assert kpis["alertas_ativos"].previous == 2
+
+
+def test_periodo_sem_snapshot(conn):
+    assert snapshot_kpis(conn, date(2025, 3, 2), date(2025, 3, 5)) is None
@@ -0,0 +1,108 @@
+"""
+Testes do cache de respostas: expiração por TTL e remoção das entradas menos usadas
+quando o cache passa do limite de entradas ou de bytes.
+"""
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import llm_cache
+from llm_cache import AnswerCache, serialize_result
+
+
+class Clock:
+    """Substitui o módulo time em llm_cache: cada chamada avança um segundo."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        self.now += 1
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache, "time", clock)
+    return clock
+
+
+def _answer(text):
+    return {"type": "string", "value": text}
+
+
+def _keys(cache):
+    conn = sqlite3.connect(cache.path)
+    try:
+        return sorted(row[0] for row in conn.execute("SELECT key FROM answers"))
+    finally:
+        conn.close()
+
+
+def test_ida_e_volta(tmp_path, clock):
+    cache = AnswerCache(str(tmp_path / "llm_cache.db"))
+    df = pd.DataFrame({"Provedor": ["Hospital A"], "Alertas": [3]})
+
+    assert cache.set("texto", _answer("R$ 1.000,00"))
+    assert cache.set("tabela", {"type": "dataframe", "value": df})
+
+    assert cache.get("texto") == _answer("R$ 1.000,00")
+    pd.testing.assert_frame_equal(cache.get("tabela")["value"], df)
+    assert cache.get("ausente") is None
+
+
+def test_nao_serializavel(tmp_path, clock):
+    cache = AnswerCache(str(tmp_path / "llm_cache.db"))
+
+    assert not cache.set("objeto", {"type": "string", "value": object()})
+    assert _keys(cache) == []
+
+
+def test_ttl(tmp_path, clock):
+    cache = AnswerCache(str(tmp_path / "llm_cache.db"), ttl=60)
+    cache.set("a", _answer("a"))
+
+    clock.now += 30
+    assert cache.get("a") == _answer("a")
+
+    # Expirada: removida na leitura, mesmo com acesso recente
+    clock.now += 60
+    assert cache.get("a") is None
+    assert _keys(cache) == []
+
+
+def test_ttl_removido_na_escrita(tmp_path, clock):
+    cache = AnswerCache(str(tmp_path / "llm_cache.db"), ttl=60)
+    cache.set("a", _answer("a"))
+    clock.now += 120
+
+    cache.set("b", _answer("b"))
+
+    assert _keys(cache) == ["b"]
+
+
+def test_limite_de_entradas_remove_menos_usada(tmp_path, clock):
+    cache = AnswerCache(str(tmp_path / "llm_cache.db"), max_entries=2)
+    cache.set("a", _answer("a"))
+    cache.set("b", _answer("b"))
+    # "a" passa a ser a mais recente; "b" é a menos usada
+    cache.get("a")
+
+    cache.set("c", _answer("c"))
+
+    assert _keys(cache) == ["a", "c"]
+
+
+def test_limite_de_bytes_remove_menos_usada(tmp_path, clock):
+    size = len(serialize_result(_answer("x" * 100)))
+    cache = AnswerCache(str(tmp_path / "llm_cache.db"), max_bytes=2 * size)
+    for key in ("a", "b", "c"):
+        cache.set(key, _answer("x" * 100))
+
+    assert _keys(cache) == ["b", "c"]
+
+    # Uma entrada maior que o limite inteiro não fica no cache
+    cache.set("grande", _answer("x" * 1000))
+    assert "grande" not in _keys(cache)
@@ -0,0 +1,102 @@
+"""
+Testes de rollup: a atualização incremental de alerts_daily chega ao mesmo resultado de uma
+reconstrução completa depois de alterações, inserções, exclusões e mudanças de created_at.
+"""
+from datetime import date
+import sqlite3
+
+import pytest
+
+from rollup import CHANGES_NAME, ROLLUP_NAME, alert_type_counts, get_watermark, refresh_alerts_daily
+
+ALERTS = [
+    {"alert_id": 1, "created_at": "2025-03-05 10:00:00", "provider_id": 1, "risk_value": 1000.0, "is_anomaly": 1},
+    {"alert_id": 2, "created_at": "2025-03-05 11:00:00", "provider_id": 1, "risk_value": 250.5},
+    {"alert_id": 3, "created_at": "2025-03-06 09:30:00", "provider_id": 2, "alert_type": "Medicamento"},
+    {"alert_id": 4, "created_at": "2025-03-07 12:00:00", "provider_id": 2, "alert_status": "Resolvido"},
+    {"alert_id": 5, "created_at": None, "updated_at": "2025-03-07 12:30:00", "provider_id": 3},
+]
+
+_ROWS = (
+    "SELECT day, alert_status, alert_type, provider_id, alert_count, ROUND(risk_sum, 2), anomaly_sum "
+    "FROM alerts_daily ORDER BY day, alert_status, alert_type, provider_id"
+)
+
+
+@pytest.fixture
+def conn(make_db):
+    db = sqlite3.connect(make_db(alerts=ALERTS))
+    refresh_alerts_daily(db)
+    yield db
+    db.close()
+
+
+def _rebuilt(conn):
+    """Linhas de alerts_daily reconstruídas do zero, sem alterar a tabela do teste."""
+    incremental = conn.execute(_ROWS).fetchall()
+    with conn:
+        conn.execute("DELETE FROM rollup_state WHERE name = ?", (ROLLUP_NAME,))
+    refresh_alerts_daily(conn)
+    return incremental, conn.execute(_ROWS).fetchall()
+
+
+def test_primeira_execucao(conn):
+    rows = conn.execute(_ROWS).fetchall()
+
+    assert ("2025-03-05", "Ativo", "OPME", 1, 2, 1250.5, 1) in rows
+    # O alerta sem created_at não pertence a nenhum dia
+    assert sum(row[4] for row in rows) == 4
+    assert get_watermark(conn) is not None
+
+
+def test_sem_alteracoes(conn):
+    assert refresh_alerts_daily(conn) == 0
+
+
+def test_alteracao_recalcula_so_o_dia(conn):
+    conn.execute("UPDATE alerts SET alert_status = 'Resolvido', updated_at = '2025-03-08 10:00:00' WHERE alert_id = 2")
+    conn.commit()
+
+    assert refresh_alerts_daily(conn) == 1
+    incremental, rebuilt = _rebuilt(conn)
+    assert incremental == rebuilt
+
+
+def test_insercao(conn):
+    conn.execute(
+        "INSERT INTO alerts (alert_id, alert_type, alert_status, created_at, updated_at, risk_value, provider_id, is_anomaly) "
+        "VALUES (6, 'OPME', 'Ativo', '2025-03-09 08:00:00', '2025-03-09 08:00:00', 10.0, 1, 1)"
+    )
+    conn.commit()
+
+    assert refresh_alerts_daily(conn) == 1
+    incremental, rebuilt = _rebuilt(conn)
+    assert incremental == rebuilt
+
+
+def test_exclusao(conn):
+    conn.execute("DELETE FROM alerts WHERE alert_id = 3")
+    conn.commit()
+
+    assert refresh_alerts_daily(conn) == 1
+    incremental, rebuilt = _rebuilt(conn)
+    assert incremental == rebuilt
+    assert not any(row[0] == "2025-03-06" for row in incremental)
+
+
+def test_created_at_movido_sem_mudar_updated_at(conn):
+    conn.execute("UPDATE alerts SET created_at = '2025-03-07 08:00:00' WHERE alert_id = 1")
+    conn.execute("UPDATE alerts SET created_at = '2025-03-07 09:00:00' WHERE alert_id = 5")
+    conn.commit()
+
+    # Dias de origem (2025-03-05 e sem data) e de destino
+    assert refresh_alerts_daily(conn) == 3
+    incremental, rebuilt = _rebuilt(conn)
+    assert incremental == rebuilt
+    assert int(get_watermark(conn, CHANGES_NAME)) > 0
+
+
+def test_alert_type_counts(conn):
+    assert alert_type_counts(conn) == [("OPME", 3), ("Medicamento", 1)]
+    # Empate: a ordem entre os tipos não é definida
+    assert dict(alert_type_counts(conn, date(2025, 3, 6), date(2025, 3, 7))) == {"Medicamento": 1, "OPME": 1}
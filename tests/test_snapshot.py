@@ -0,0 +1,134 @@
+"""
+Testes de snapshot: a atualização incremental do snapshot Arrow serve os mesmos dados que
+data.get_data depois de alterações em alerts e nas tabelas juntadas a eles.
+"""
+import json
+import os
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from data import get_data
+import snapshot
+from snapshot import MANIFEST_NAME, load_alerts, read_manifest, refresh_snapshot
+
+ALERTS = [
+    {"alert_id": 1, "created_at": "2025-01-15 10:00:00", "provider_id": 1, "patient_id": 1, "hospital_id": 1},
+    {"alert_id": 2, "created_at": "2025-02-10 11:00:00", "provider_id": 2, "patient_id": 1, "hospital_id": 1},
+    {"alert_id": 3, "created_at": "2025-03-07 09:30:00", "provider_id": 1, "patient_id": 2, "hospital_id": 1},
+    {"alert_id": 4, "created_at": "2025-03-07 12:00:00", "provider_id": 2, "patient_id": 2, "hospital_id": 1},
+]
+PROVIDERS = [{"provider_id": 1, "name": "Hospital A", "type": "Hospital"}, {"provider_id": 2, "name": "Clínica B", "type": "Clínica"}]
+RECOMMENDATIONS = [{"recommendation_id": 1, "patient_id": 1, "provider_id": 1, "hospital_id": 1, "score": 8}]
+
+
+@pytest.fixture
+def db(make_db, tmp_path):
+    path = make_db(alerts=ALERTS, providers=PROVIDERS, recommendations=RECOMMENDATIONS)
+    snapshot_dir = str(tmp_path / "snapshots")
+    refresh_snapshot(path, snapshot_dir)
+    return path, snapshot_dir
+
+
+def _write(path, *statements):
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            for statement in statements:
+                conn.execute(statement)
+    finally:
+        conn.close()
+
+
+def _assert_current(path, snapshot_dir):
+    """O snapshot tem as mesmas linhas de get_data e o manifesto conta as linhas certas."""
+    conn = sqlite3.connect(path)
+    try:
+        expected = get_data(conn)
+    finally:
+        conn.close()
+    loaded = load_alerts(snapshot_dir=snapshot_dir)
+    pd.testing.assert_frame_equal(
+        loaded.sort_values("alert_id", ignore_index=True),
+        expected.sort_values("alert_id", ignore_index=True),
+        check_categorical=False,
+    )
+    assert read_manifest(snapshot_dir)["rows"] == len(expected)
+    return loaded
+
+
+def test_construcao_inicial(db):
+    path, snapshot_dir = db
+    loaded = _assert_current(path, snapshot_dir)
+
+    assert read_manifest(snapshot_dir)["month_rows"] == {"2025-01": 1, "2025-02": 1, "2025-03": 2}
+    # Dentro de cada mês as linhas ficam em ordem de alert_id
+    assert loaded["alert_id"].tolist() == [1, 2, 3, 4]
+
+
+def test_alteracao_regrava_so_o_mes(db):
+    path, snapshot_dir = db
+    _write(path, "UPDATE alerts SET alert_status = 'Resolvido', updated_at = '2025-03-08 10:00:00' WHERE alert_id = 3")
+
+    assert refresh_snapshot(path, snapshot_dir)["refreshed_months"] == ["2025-03"]
+    loaded = _assert_current(path, snapshot_dir)
+    assert loaded.set_index("alert_id").loc[3, "alert_status"] == "Resolvido"
+
+
+def test_insercao_e_exclusao_atualizam_contagem(db):
+    path, snapshot_dir = db
+    _write(
+        path,
+        "INSERT INTO alerts (alert_id, alert_type, alert_status, created_at, updated_at, risk_value) "
+        "VALUES (5, 'OPME', 'Ativo', '2025-04-01 08:00:00', '2025-04-01 08:00:00', 10.0)",
+    )
+    assert refresh_snapshot(path, snapshot_dir)["rows"] == 5
+
+    _write(path, "DELETE FROM alerts WHERE alert_id IN (1, 3)")
+    manifest = refresh_snapshot(path, snapshot_dir)
+
+    assert manifest["refreshed_months"] == ["2025-01", "2025-03"]
+    assert manifest["rows"] == 3
+    _assert_current(path, snapshot_dir)
+
+
+def test_created_at_movido_entre_meses(db):
+    path, snapshot_dir = db
+    _write(path, "UPDATE alerts SET created_at = '2025-02-20 10:00:00' WHERE alert_id = 4")
+
+    assert refresh_snapshot(path, snapshot_dir)["refreshed_months"] == ["2025-02", "2025-03"]
+    _assert_current(path, snapshot_dir)
+
+
+@pytest.mark.parametrize("statement", [
+    "UPDATE providers SET name = 'Hospital Z' WHERE provider_id = 1",
+    "INSERT INTO recommendations (recommendation_id, patient_id, provider_id, hospital_id, score) VALUES (2, 2, 1, 1, 4)",
+    "DELETE FROM recommendations",
+])
+def test_tabela_juntada_reconstroi(db, statement):
+    path, snapshot_dir = db
+    previous = read_manifest(snapshot_dir)["dataset_dir"]
+    _write(path, statement)
+
+    manifest = refresh_snapshot(path, snapshot_dir)
+
+    assert manifest["refreshed_months"] is None
+    assert manifest["dataset_dir"] != previous
+    _assert_current(path, snapshot_dir)
+
+
+def test_reconstrucao_remove_diretorios_antigos(db, monkeypatch):
+    path, snapshot_dir = db
+    # Manifesto de outro formato (ou corrompido): read_manifest o ignora
+    manifest_path = os.path.join(snapshot_dir, MANIFEST_NAME)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    monkeypatch.setattr(snapshot, "SNAPSHOT_FORMAT", manifest["format"] + 1)
+    os.makedirs(os.path.join(snapshot_dir, "alerts-00000000000000000000", "month=2024-01"))
+
+    manifest = refresh_snapshot(path, snapshot_dir)
+
+    datasets = [name for name in os.listdir(snapshot_dir) if name.startswith("alerts-")]
+    assert datasets == [manifest["dataset_dir"]]
+    _assert_current(path, snapshot_dir)
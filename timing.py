@@ -0,0 +1,213 @@
+"""
+Medição de tempo por seção da página.
+
+Cada execução do script (ou de um fragmento com run_every) abre um trace; dentro dele,
+timed("fase") mede o tempo de parede de cada seção e registra as linhas tocadas e se o
+resultado veio do cache. Ao final, o trace é gravado como uma linha JSON em um log
+rotativo (TIMING_LOG_PATH) e guardado em memória para o painel de desempenho.
+
+    start_trace("pagina")
+    with timed("carga_dados", cached=True) as span:
+        df = load_shared_data(...)
+        span.rows = len(df)
+    finish_trace()
+
+Funções em cache chamam cache_miss() no corpo: como o corpo só roda quando o cache falha,
+a fase aberta passa de "hit" para "miss".
+"""
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+import functools
+import json
+import logging
+from logging.handlers import RotatingFileHandler
+import os
+import threading
+import time
+
+import pandas as pd
+
+TIMING_LOG_PATH = os.environ.get("DASHBOARD_TIMING_LOG", "timings.log")
+TIMING_LOG_MAX_BYTES = 5 * 1024 * 1024
+TIMING_LOG_BACKUPS = 3
+# Traces mantidos em memória (todas as sessões do processo) para o painel
+HISTORY_SIZE = 200
+ADMIN_ENV = "DASHBOARD_ADMIN"
+
+_local = threading.local()
+_history = deque(maxlen=HISTORY_SIZE)
+_history_lock = threading.Lock()
+_logger_lock = threading.Lock()
+
+
+@dataclass
+class Span:
+    phase: str
+    wall_ms: float = 0.0
+    rows: int = None
+    cache: str = None
+
+
+@dataclass
+class Trace:
+    name: str
+    started_at: str
+    spans: list = field(default_factory=list)
+    total_ms: float = 0.0
+    interrupted: bool = False
+
+
+def is_admin():
+    """O painel de desempenho só aparece com DASHBOARD_ADMIN=1."""
+    return os.environ.get(ADMIN_ENV) == "1"
+
+
+def _get_logger():
+    logger = logging.getLogger("dashboard.timing")
+    with _logger_lock:
+        if not logger.handlers:
+            handler = RotatingFileHandler(
+                TIMING_LOG_PATH, maxBytes=TIMING_LOG_MAX_BYTES, backupCount=TIMING_LOG_BACKUPS, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+    return logger
+
+
+def current_trace():
+    return getattr(_local, "trace", None)
+
+
+def start_trace(name):
+    """Abre o trace da execução atual. Um trace anterior não finalizado (st.rerun, st.stop) é gravado como interrompido."""
+    if current_trace() is not None:
+        finish_trace(interrupted=True)
+    _local.trace = Trace(name, datetime.now().isoformat(timespec="seconds"))
+    _local.trace_started = time.perf_counter()
+    _local.open_spans = []
+    return _local.trace
+
+
+def finish_trace(interrupted=False):
+    trace = current_trace()
+    if trace is None:
+        return None
+    trace.total_ms = round((time.perf_counter() - _local.trace_started) * 1000, 2)
+    trace.interrupted = interrupted
+    _local.trace = None
+    with _history_lock:
+        _history.append(trace)
+    try:
+        _get_logger().info(json.dumps(asdict(trace), ensure_ascii=False))
+    except OSError:
+        # Sistema de arquivos somente leitura: o trace continua disponível no painel
+        pass
+    return trace
+
+
+class timed:
+    """
+    Mede uma fase como gerenciador de contexto (with timed("grafico") as span) ou
+    decorador (@timed("grafico")). Fora de um trace a medição é descartada.
+    Com cached=True a fase começa como "hit" e cache_miss() a marca como "miss".
+    No decorador, rows é preenchido com len() do resultado quando possível.
+    """
+
+    def __init__(self, phase, cached=False):
+        self.phase = phase
+        self.cached = cached
+
+    def __enter__(self):
+        self.span = Span(self.phase, cache="hit" if self.cached else None)
+        self._started = time.perf_counter()
+        if current_trace() is not None:
+            _local.open_spans.append(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.wall_ms = round((time.perf_counter() - self._started) * 1000, 2)
+        trace = current_trace()
+        if trace is not None and self.span in _local.open_spans:
+            _local.open_spans.remove(self.span)
+            trace.spans.append(self.span)
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(self.phase, self.cached) as span:
+                result = func(*args, **kwargs)
+                counted = result[0] if isinstance(result, tuple) and result else result
+                if hasattr(counted, "__len__") and not isinstance(counted, str):
+                    span.rows = len(counted)
+            return result
+        return wrapper
+
+
+def cache_miss():
+    """Chamada no corpo de uma função em cache: marca a fase aberta mais interna como "miss"."""
+    spans = getattr(_local, "open_spans", None) if current_trace() is not None else None
+    if spans:
+        spans[-1].cache = "miss"
+
+
+def traced_rerun(name):
+    """
+    Decorador para fragmentos: quando o fragmento roda sozinho (run_every ou interação),
+    abre e grava um trace próprio; dentro da execução da página usa o trace da página.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if current_trace() is not None:
+                return func(*args, **kwargs)
+            start_trace(name)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                finish_trace()
+        return wrapper
+    return decorator
+
+
+def recent_traces(limit=HISTORY_SIZE):
+    with _history_lock:
+        return list(_history)[-limit:]
+
+
+def summarize(traces):
+    """p50/p95 do tempo de cada fase e taxa de acerto de cache nos traces dados."""
+    rows = [
+        {"Fase": span.phase, "ms": span.wall_ms, "cache": span.cache}
+        for trace in traces
+        for span in trace.spans
+    ]
+    if not rows:
+        return pd.DataFrame(columns=["Fase", "Execuções", "p50 (ms)", "p95 (ms)", "Acertos de cache"])
+    df = pd.DataFrame(rows)
+    grouped = df.groupby("Fase")
+    summary = pd.DataFrame({
+        "Execuções": grouped.size(),
+        "p50 (ms)": grouped["ms"].quantile(0.5).round(1),
+        "p95 (ms)": grouped["ms"].quantile(0.95).round(1),
+        "Acertos de cache": grouped["cache"].apply(
+            lambda values: f"{(values == 'hit').sum()}/{values.notna().sum()}" if values.notna().any() else "-"
+        ),
+    })
+    return summary.sort_values("p95 (ms)", ascending=False).reset_index()
+
+
+def traces_table(traces):
+    """Uma linha por execução, com o tempo total e o de cada fase."""
+    return pd.DataFrame([
+        {
+            "Início": trace.started_at,
+            "Execução": trace.name + (" (interrompida)" if trace.interrupted else ""),
+            "Total (ms)": trace.total_ms,
+            **{span.phase: span.wall_ms for span in trace.spans},
+        }
+        for trace in reversed(traces)
+    ])